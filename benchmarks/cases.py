@@ -0,0 +1,250 @@
+import os
+
+import pandas as pd
+
+from benchmarks.generators import ais_tracks, ers_arrivals, ers_dca, ers_departures, fangstdata, write_csv
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+
+# Year written into the generated catch and ERS files
+YEAR = 2024
+
+
+class Case:
+    """
+    One benchmarked hot path.
+
+    :param name: dotted name, the part before the dot groups cases in the report
+    :param setup: function of (BenchmarkData, rows) doing all preparation and returning the callable to time
+    :param max_rows: largest scale the case runs at, for row-wise code that would take hours beyond it
+    """
+
+    def __init__(self, name: str, setup, max_rows: int = None):
+        self.name = name
+        self.setup = setup
+        self.max_rows = max_rows
+
+
+CASES = {}
+
+
+def case(name: str, max_rows: int = None):
+    """Register a setup function as a benchmark case."""
+    def decorator(setup):
+        CASES[name] = Case(name, setup, max_rows)
+        return setup
+    return decorator
+
+
+class BenchmarkData:
+    """
+    Synthetic inputs shared by the cases of one run.
+
+    AIS frames are kept in memory per size, CSV files are written once to data_dir and reused by later runs with the
+    same seed.
+    """
+
+    def __init__(self, seed: int = 0, data_dir: str = DATA_DIR):
+        self.seed = seed
+        self.data_dir = data_dir
+        self._frames = {}
+
+    def ais(self, rows: int, n_vessels: int = None) -> pd.DataFrame:
+        """Return the AIS tracks of the given size, generated on first use. Cases must not modify the frame."""
+        key = (rows, n_vessels)
+        if key not in self._frames:
+            self._frames[key] = ais_tracks(rows, n_vessels, seed=self.seed)
+        return self._frames[key]
+
+    def csv(self, kind: str, rows: int) -> str:
+        """Return the path of a generated 'fangstdata', 'dca', 'por' or 'dep' file, writing it on first use."""
+        generators = {'fangstdata': fangstdata, 'dca': ers_dca, 'por': ers_arrivals, 'dep': ers_departures}
+        path = os.path.join(self.data_dir, f'{kind}_{YEAR}_{rows}_{self.seed}.csv')
+        if not os.path.exists(path):
+            os.makedirs(self.data_dir, exist_ok=True)
+            # Arrivals and departures must not share a seed, or every departure would coincide with an arrival
+            seed = self.seed + 1 if kind == 'dep' else self.seed
+            write_csv(generators[kind](rows, YEAR, seed=seed), path)
+        return path
+
+    def clear(self):
+        """Forget the frames held in memory."""
+        self._frames.clear()
+
+
+def _warm_kernels(function, dataframe: pd.DataFrame):
+    """Call a function on the first rows of its input, so numba kernels are compiled outside the timed runs."""
+    function(dataframe.head(1000))
+
+
+# Zoning
+
+@case('zoning.assign_zones')
+def _assign_zones(data: BenchmarkData, rows: int):
+    from zoning.zoning import ZoneAssigner
+    assigner = ZoneAssigner(data.ais(rows), 'eez_zones')
+    assigner.get_layer().index
+    return assigner.assign_zones
+
+
+@case('zoning.assign_zones_track')
+def _assign_zones_track(data: BenchmarkData, rows: int):
+    from zoning.zoning import ZoneAssigner
+    assigner = ZoneAssigner(data.ais(rows), 'eez_zones')
+    layer = assigner.get_layer()
+    layer.grid(0.1), layer.adjacency
+    _warm_kernels(lambda df: ZoneAssigner(df, 'eez_zones').assign_zones(track=True), data.ais(rows))
+    return lambda: assigner.assign_zones(track=True)
+
+
+@case('zoning.assign_zones_simplified')
+def _assign_zones_simplified(data: BenchmarkData, rows: int):
+    from zoning.zoning import ZoneAssigner
+    assigner = ZoneAssigner(data.ais(rows), 'eez_zones')
+    assigner.get_layer().simplified(1000)
+    return lambda: assigner.assign_zones(tolerance=1000)
+
+
+@case('zoning.zone_events')
+def _zone_events(data: BenchmarkData, rows: int):
+    from utils.area_entries import get_zone_events
+    dataframe = data.ais(rows)
+    return lambda: get_zone_events(dataframe, crossing_times=True)
+
+
+# Interpolation
+
+@case('interpolation.interpolate_dataframe')
+def _interpolate_dataframe(data: BenchmarkData, rows: int):
+    from interpolating.interpolate import interpolate_dataframe
+    dataframe = data.ais(rows, n_vessels=1)
+    return lambda: interpolate_dataframe(dataframe)
+
+
+@case('interpolation.interpolate_vessels')
+def _interpolate_vessels(data: BenchmarkData, rows: int):
+    from interpolating.interpolate import interpolate_vessels
+    dataframe = data.ais(rows)
+    return lambda: interpolate_vessels(dataframe)
+
+
+# Distances and kinematics
+
+@case('distances.calculate_distance')
+def _calculate_distance(data: BenchmarkData, rows: int):
+    from utils.distance import calculate_distance
+    dataframe = data.ais(rows)
+    return lambda: calculate_distance(dataframe)
+
+
+@case('distances.kinematics')
+def _kinematics(data: BenchmarkData, rows: int):
+    from utils.kinematics import calculate_kinematics
+    dataframe = data.ais(rows)
+    return lambda: calculate_kinematics(dataframe)
+
+
+@case('distances.distance_to_coast')
+def _distance_to_coast(data: BenchmarkData, rows: int):
+    from utils.zone_distance import distance_to_coast
+    from zoning.catalog import get_catalog
+    dataframe = data.ais(rows)
+    get_catalog().layer('close_land_geofencing').proximity
+    return lambda: distance_to_coast(dataframe)
+
+
+# Per-position derived columns
+
+@case('headings.replace_heading_error')
+def _replace_heading_error(data: BenchmarkData, rows: int):
+    from utils.replace_missing_headings import replace_heading_error
+    dataframe = data.ais(rows)
+    _warm_kernels(lambda df: replace_heading_error(df['heading'], df['latitude'], df['longitude'], df['vessel_name']),
+                  dataframe)
+    return lambda: replace_heading_error(dataframe['heading'], dataframe['latitude'], dataframe['longitude'],
+                                         dataframe['vessel_name'])
+
+
+@case('daylight.daylight_period')
+def _daylight_period(data: BenchmarkData, rows: int):
+    from utils.daylight import calculate_daylight_period
+    dataframe = data.ais(rows)
+    return lambda: calculate_daylight_period(dataframe)
+
+
+@case('speed.speed_profiles')
+def _speed_profiles(data: BenchmarkData, rows: int):
+    from utils.speed_groups import speed_profiles
+    dataframe = data.ais(rows)
+    return lambda: speed_profiles(dataframe, 0.5)
+
+
+# Stops and encounters
+
+@case('stops.find_stops')
+def _find_stops(data: BenchmarkData, rows: int):
+    from utils.find_individual_stops import find_stops
+    from zoning.catalog import get_catalog
+    dataframe = data.ais(rows)
+    get_catalog().layer('harbors').proximity
+    get_catalog().layer('factories').proximity
+    _warm_kernels(lambda df: find_stops(df, 30), dataframe)
+    return lambda: find_stops(dataframe, 30)
+
+
+@case('encounters.find_close_encounters')
+def _find_close_encounters(data: BenchmarkData, rows: int):
+    from vessels_close.vessels_meeting import find_close_encounters
+    dataframe = data.ais(rows, n_vessels=2)
+    first = dataframe[dataframe['vessel_name'] == dataframe['vessel_name'].iloc[0]]
+
+    # A pair trawling partner 100 to 500 m away, drifting off now and then
+    second = first.copy()
+    second['latitude'] += 0.0009 + 0.0036 * (pd.Series(range(len(first)), index=first.index) // 500 % 2)
+    second['timestamp'] += pd.Timedelta(seconds=20)
+    return lambda: find_close_encounters(first, second)
+
+
+# ERS and catch files
+
+@case('trips.find_trips_nor', max_rows=1_000_000)
+def _find_trips_nor(data: BenchmarkData, rows: int):
+    from trip_finder.nor_ers import find_trips_nor
+    arrivals, departures = data.csv('por', rows), data.csv('dep', rows)
+    vessels = [f'SYNTHETIC {k:03d}' for k in range(200)]
+    return lambda: find_trips_nor(YEAR, vessels, arrivals, departures)
+
+
+@case('catches.read_fangstdata', max_rows=1_000_000)
+def _read_fangstdata(data: BenchmarkData, rows: int):
+    from catches.nor_catch_functions import read_fangstdata
+    path = data.csv('fangstdata', rows)
+    return lambda: read_fangstdata(YEAR, path=path)
+
+
+@case('catches.read_dca', max_rows=1_000_000)
+def _read_dca(data: BenchmarkData, rows: int):
+    from catches.nor_catch_functions import read_dca
+    path = data.csv('dca', rows)
+    return lambda: read_dca(YEAR, path=path)
+
+
+# Oil consumption
+
+@case('oil.calculate_oil_consumption')
+def _calculate_oil_consumption(data: BenchmarkData, rows: int):
+    from oil_calculation.oil_calculation import calculate_oil_consumption, wind_index
+    dataframe = wind_index(data.ais(rows, n_vessels=1).copy())
+    ship_dimensions = {'gr_ton': 2250, 'build_year': 1997, 'me_pwr': 7380, 'len_overall': 71}
+    exponents = [0.583, 42.2, 0.1334, 0.5498, 0.4, 0.12, 0, 0.96]
+    _warm_kernels(lambda df: calculate_oil_consumption(df, ship_dimensions, exponents), dataframe)
+    return lambda: calculate_oil_consumption(dataframe, ship_dimensions, exponents)
+
+
+# Plotting, row-wise and kept to the smallest scale
+
+@case('plotting.plot_vessel_track', max_rows=10_000)
+def _plot_vessel_track(data: BenchmarkData, rows: int):
+    from plotting.plot import plot_vessel_track
+    dataframe = data.ais(rows, n_vessels=1).copy()
+    return lambda: plot_vessel_track(dataframe)
@@ -0,0 +1,237 @@
+import numpy as np
+import pandas as pd
+
+from utils.geodesy import initial_bearing
+
+# Sea area the synthetic tracks stay in, around the Faroe Islands and across the Icelandic, British and Norwegian
+# EEZ boundaries (latitude, longitude)
+AREA = ((57.0, 68.0), (-18.0, 8.0))
+
+# Speed regimes (knots) a vessel switches between: stopped, fishing and steaming
+_REGIMES = ((0.0, 0.05), (3.5, 1.0), (11.0, 1.5))
+_REGIME_PROBABILITIES = (0.15, 0.45, 0.4)
+_REGIME_LENGTH = 240
+
+SPECIES = ['Makrell', 'Sild', 'Kolmule', 'Lodde', 'Torsk', 'Hyse', 'Sei', 'Øyepål', 'Tobis']
+NATIONALITIES = ['NORGE', 'FÆRØYENE', 'ISLAND', 'RUSSLAND', 'DANMARK']
+AREA_GROUPS = ['Nordsjøen', 'Norskehavet', 'Barentshavet', 'Vest av Skottland', 'Færøyane']
+GEAR = ['Not', 'Flytetrål', 'Bunntrål', 'Line', 'Garn']
+
+
+def ais_tracks(n_rows: int, n_vessels: int = None, seed: int = 0, start: str = '2024-01-01') -> pd.DataFrame:
+    """
+    Generate AIS tracks of several vessels, one position roughly every minute.
+
+    Vessels switch between stopping, fishing and steaming every few hours and drift in heading, folded back into AREA
+    so they keep crossing the real zone boundaries. About 0.5% of the time steps are gaps of 30 minutes to 2 hours and
+    2% of the headings are 511 (not available).
+
+    :param n_rows: total number of positions
+    :param n_vessels: number of vessels, one per 50,000 positions (at least 2) by default
+    :param seed: seed of the random generator, the same arguments always give the same frame
+    :param start: time of the first position of every vessel
+    :return: DataFrame sorted by vessel and time with columns 'vessel_name', 'radio_callsign', 'timestamp',
+             'latitude', 'longitude', 'speed', 'heading', 'wind_speed' and 'wind_dir'
+    """
+    rng = np.random.default_rng(seed)
+    n_vessels = n_vessels or max(2, n_rows // 50_000)
+    n_vessels = min(n_vessels, n_rows)
+    lengths = np.full(n_vessels, n_rows // n_vessels)
+    lengths[:n_rows % n_vessels] += 1
+    vessel = np.repeat(np.arange(n_vessels), lengths)
+    first = np.append(0, np.cumsum(lengths)[:-1])
+
+    # Speed regime of every block of positions
+    n_blocks = n_rows // _REGIME_LENGTH + 1
+    regimes = rng.choice(len(_REGIMES), size=n_blocks, p=_REGIME_PROBABILITIES)
+    means, deviations = np.array(_REGIMES).T
+    regime = regimes[np.arange(n_rows) // _REGIME_LENGTH]
+    speed = np.maximum(means[regime] + deviations[regime] * rng.standard_normal(n_rows), 0)
+
+    # Time steps of about a minute with the occasional gap
+    steps = rng.uniform(50, 70, n_rows)
+    gaps = rng.random(n_rows) < 0.005
+    steps[gaps] = rng.uniform(1800, 7200, gaps.sum())
+    steps[first] = 0
+    seconds = np.cumsum(steps)
+    seconds -= np.repeat(seconds[first], lengths)
+    timestamp = pd.Timestamp(start) + pd.to_timedelta(np.round(seconds), unit='s')
+
+    # Dead reckoning on a flat local grid, then folded into the area
+    course = np.radians(rng.uniform(0, 360, n_vessels)[vessel] + np.cumsum(rng.normal(0, 4, n_rows)))
+    distance = np.where(gaps, 0, speed * steps / 3600) / 60
+    (lat_low, lat_high), (lon_low, lon_high) = AREA
+    start_latitude = rng.uniform(lat_low, lat_high, n_vessels)[vessel]
+    start_longitude = rng.uniform(lon_low, lon_high, n_vessels)[vessel]
+    latitude = _fold(start_latitude + _cumsum_by_vessel(distance * np.cos(course), first, lengths),
+                     lat_low, lat_high)
+    longitude = _fold(start_longitude + _cumsum_by_vessel(distance * np.sin(course) / np.cos(np.radians(latitude)),
+                                                          first, lengths), lon_low, lon_high)
+
+    # Heading along the track, the previous one while stopped
+    heading = np.zeros(n_rows)
+    heading[1:] = initial_bearing(latitude[:-1], longitude[:-1], latitude[1:], longitude[1:])
+    heading[first] = heading[np.minimum(first + 1, n_rows - 1)]
+    heading = np.round(heading).astype(np.int64) % 360
+    heading[rng.random(n_rows) < 0.02] = 511
+
+    names = np.array([f'SYNTHETIC {k:03d}' for k in range(n_vessels)])
+    callsigns = np.array([f'LK{k:04d}' for k in range(n_vessels)])
+
+    return pd.DataFrame({
+        'vessel_name': names[vessel],
+        'radio_callsign': callsigns[vessel],
+        'timestamp': timestamp,
+        'latitude': latitude,
+        'longitude': longitude,
+        'speed': np.round(speed, 1),
+        'heading': heading,
+        'wind_speed': np.round(rng.uniform(0, 20, n_rows), 1),
+        'wind_dir': rng.integers(0, 360, n_rows),
+    })
+
+
+def fangstdata(n_rows: int, year: int = 2024, seed: int = 0, n_vessels: int = 200) -> pd.DataFrame:
+    """
+    Generate landing notes with the column names and formats of the Norwegian Directorate of Fisheries'
+    fangstdata_{year}.csv, as read by catches.nor_catch_functions.read_fangstdata.
+
+    :param n_rows: number of landing note lines
+    :param year: year of the landings
+    :param seed: seed of the random generator
+    :param n_vessels: number of vessels landing
+    :return: DataFrame of strings and numbers, write it with write_csv
+    """
+    rng = np.random.default_rng(seed)
+    vessel = rng.integers(0, n_vessels, n_rows)
+    landing = _random_times(rng, year, n_rows, seconds=True)
+
+    return pd.DataFrame({
+        'Fangstår': year,
+        'Landingsdato': landing.strftime('%d.%m.%Y'),
+        'Landingsklokkeslett': landing.strftime('%H:%M:%S'),
+        'Fartøynavn': np.array([f'SYNTHETIC {k:03d}' for k in range(n_vessels)])[vessel],
+        'Radiokallesignal (seddel)': np.array([f'LK{k:04d}' for k in range(n_vessels)])[vessel],
+        'Registreringsmerke (seddel)': np.array([f'M {k:04d} AV' for k in range(n_vessels)])[vessel],
+        'Største lengde': np.round(rng.uniform(20, 90, n_vessels), 2)[vessel],
+        'Redskap - hovedgruppe': rng.choice(GEAR, n_rows),
+        'Hovedområde (kode)': rng.integers(0, 50, n_rows),
+        'Områdegruppering': rng.choice(AREA_GROUPS, n_rows),
+        'Art - FDIR': rng.choice(SPECIES, n_rows),
+        'Produktvekt': np.round(rng.gamma(1.5, 8000, n_rows), 1),
+        'Rundvekt': np.round(rng.gamma(1.5, 10000, n_rows), 1),
+        'Fiskernasjonalitet': rng.choice(NATIONALITIES, n_rows, p=[0.8, 0.05, 0.05, 0.05, 0.05]),
+        'Mottakernasjonalitet': rng.choice(NATIONALITIES, n_rows, p=[0.9, 0.04, 0.02, 0.02, 0.02]),
+    })
+
+
+def ers_dca(n_rows: int, year: int = 2024, seed: int = 0, n_vessels: int = 200) -> pd.DataFrame:
+    """
+    Generate ERS catch reports (DCA) with the columns and formats of the elektronisk-rapportering-ers-{year}-
+    fangstmelding-dca.csv files, as read by catches.nor_catch_functions.read_dca.
+
+    :param n_rows: number of catch report lines
+    :param year: year of the catches
+    :param seed: seed of the random generator
+    :param n_vessels: number of vessels reporting
+    :return: DataFrame of strings and numbers, write it with write_csv
+    """
+    rng = np.random.default_rng(seed)
+    vessel = rng.integers(0, n_vessels, n_rows)
+    start = _random_times(rng, year, n_rows)
+    duration = rng.integers(30, 720, n_rows)
+    stop = start + pd.to_timedelta(duration, unit='min')
+    (lat_low, lat_high), (lon_low, lon_high) = AREA
+    start_latitude, start_longitude = rng.uniform(lat_low, lat_high, n_rows), rng.uniform(lon_low, lon_high, n_rows)
+
+    return pd.DataFrame({
+        'Melding ID': np.arange(n_rows) + 1_000_000,
+        'Radiokallesignal (ERS)': np.array([f'LK{k:04d}' for k in range(n_vessels)])[vessel],
+        'Fartøynavn (ERS)': np.array([f'SYNTHETIC {k:03d}' for k in range(n_vessels)])[vessel],
+        'Startdato': start.strftime('%d.%m.%Y'),
+        'Startklokkeslett': start.strftime('%H:%M'),
+        'Startposisjon bredde': np.round(start_latitude, 3),
+        'Startposisjon lengde': np.round(start_longitude, 3),
+        'Stoppdato': stop.strftime('%d.%m.%Y'),
+        'Stoppklokkeslett': stop.strftime('%H:%M'),
+        'Stopposisjon bredde': np.round(start_latitude + rng.normal(0, 0.1, n_rows), 3),
+        'Stopposisjon lengde': np.round(start_longitude + rng.normal(0, 0.2, n_rows), 3),
+        'Varighet': duration,
+        'Redskap FAO': rng.choice(['PS', 'OTM', 'OTB', 'LLS', 'GN'], n_rows),
+        'Art - FDIR': rng.choice(SPECIES, n_rows),
+        'Rundvekt': np.round(rng.gamma(1.5, 20000, n_rows)),
+    })
+
+
+def ers_arrivals(n_rows: int, year: int = 2024, seed: int = 0, n_vessels: int = 200) -> pd.DataFrame:
+    """
+    Generate ERS arrival reports (POR) with the columns and formats of the elektronisk-rapportering-ers-{year}-
+    ankomstmelding-por.csv files, as read by trip_finder.nor_ers.find_trips_nor.
+
+    :param n_rows: number of arrival report lines
+    :param year: year of the arrivals
+    :param seed: seed of the random generator
+    :param n_vessels: number of vessels reporting
+    :return: DataFrame of strings and numbers, write it with write_csv
+    """
+    return _port_reports(n_rows, year, seed, n_vessels, 'Ankomst', ['Fangst overført', 'Fangst ombord'])
+
+
+def ers_departures(n_rows: int, year: int = 2024, seed: int = 0, n_vessels: int = 200) -> pd.DataFrame:
+    """
+    Generate ERS departure reports (DEP) with the columns and formats of the elektronisk-rapportering-ers-{year}-
+    avgangsmelding-dep.csv files, as read by trip_finder.nor_ers.find_trips_nor.
+
+    :param n_rows: number of departure report lines
+    :param year: year of the departures
+    :param seed: seed of the random generator, use another one than for the arrivals
+    :param n_vessels: number of vessels reporting
+    :return: DataFrame of strings and numbers, write it with write_csv
+    """
+    return _port_reports(n_rows, year, seed, n_vessels, 'Avgangs', [None, 'Fangst ombord'])
+
+
+def write_csv(dataframe: pd.DataFrame, path: str) -> str:
+    """Write a generated frame like the Norwegian files are published: ';' delimited with ',' as decimal mark."""
+    dataframe.to_csv(path, sep=';', decimal=',', index=False, encoding='utf-8')
+    return path
+
+
+def _port_reports(n_rows: int, year: int, seed: int, n_vessels: int, prefix: str, quantity_types: list) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    vessel = rng.integers(0, n_vessels, n_rows)
+    times = _random_times(rng, year, n_rows)
+
+    return pd.DataFrame({
+        'Melding ID': np.arange(n_rows) + 2_000_000,
+        'Radiokallesignal': np.array([f'LK{k:04d}' for k in range(n_vessels)])[vessel],
+        'Fartøynavn': np.array([f'SYNTHETIC {k:03d}' for k in range(n_vessels)])[vessel],
+        f'{prefix}dato': times.strftime('%d.%m.%Y'),
+        f'{prefix}klokkeslett': times.strftime('%H:%M'),
+        f'{prefix}havn (kode)': rng.choice(['NOALF', 'NOBGO', 'NOMAY', 'NOTOS', 'FOKLA'], n_rows),
+        'Kvantum type': rng.choice(np.array(quantity_types, dtype=object), n_rows),
+        'Art - FDIR': rng.choice(SPECIES, n_rows),
+        'Rundvekt': np.round(rng.gamma(1.5, 50000, n_rows)),
+    })
+
+
+def _random_times(rng: np.random.Generator, year: int, n: int, seconds: bool = False) -> pd.DatetimeIndex:
+    """Sorted uniformly random times within the year, whole minutes unless seconds."""
+    offsets = np.sort(rng.integers(0, 365 * 24 * 3600, n))
+    if not seconds:
+        offsets -= offsets % 60
+    return pd.Timestamp(year=year, month=1, day=1) + pd.to_timedelta(offsets, unit='s')
+
+
+def _cumsum_by_vessel(values: np.ndarray, first: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+    """Cumulative sum restarting at the first row of every vessel."""
+    total = np.cumsum(values)
+    offset = total[first] - values[first]
+    return total - np.repeat(offset, lengths)
+
+
+def _fold(values: np.ndarray, low: float, high: float) -> np.ndarray:
+    """Reflect values into [low, high] like a track bouncing off the edges of the area."""
+    width = high - low
+    wrapped = (values - low) % (2 * width)
+    return low + np.where(wrapped > width, 2 * width - wrapped, wrapped)
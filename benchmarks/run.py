@@ -0,0 +1,168 @@
+import argparse
+import fnmatch
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import traceback
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import shapely
+
+from benchmarks.cases import CASES, BenchmarkData
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+
+SCALES = {'10k': 10_000, '100k': 100_000, '1M': 1_000_000, '10M': 10_000_000}
+
+
+def run(case_patterns: list[str] = None, scales: list[str] = ('10k', '1M'), repeat: int = 3, seed: int = 0) -> dict:
+    """
+    Run the benchmark cases and return the results.
+
+    Every case is set up once per scale (generating data, warming caches) and its callable timed repeat times. A
+    case that fails or needs a package that is not installed is recorded as such and the run goes on.
+
+    :param case_patterns: shell-style patterns of case names to run, e.g. ['zoning.*'], all cases by default
+    :param scales: keys of SCALES, the number of rows of the generated inputs
+    :param repeat: number of timed runs per case and scale
+    :param seed: seed of the data generators
+    :return: dict with the environment and one result per case and scale
+    """
+    names = [name for name in CASES if not case_patterns or any(fnmatch.fnmatch(name, p) for p in case_patterns)]
+    data = BenchmarkData(seed)
+    results = []
+
+    for scale in scales:
+        rows = SCALES[scale]
+        for name in names:
+            result = {'case': name, 'scale': scale, 'rows': rows}
+            results.append(result)
+
+            if CASES[name].max_rows is not None and rows > CASES[name].max_rows:
+                result['status'] = 'skipped'
+                result['reason'] = f'runs up to {CASES[name].max_rows} rows'
+                continue
+
+            try:
+                func = CASES[name].setup(data, rows)
+                times = []
+                for _ in range(repeat):
+                    start = time.perf_counter()
+                    func()
+                    times.append(time.perf_counter() - start)
+            except ImportError as e:
+                result['status'] = 'skipped'
+                result['reason'] = f'missing dependency: {e}'
+            except Exception as e:
+                result['status'] = 'error'
+                result['reason'] = f'{type(e).__name__}: {e}'
+                result['traceback'] = traceback.format_exc()
+            else:
+                result['status'] = 'ok'
+                result['times'] = times
+                result['best'] = min(times)
+                result['median'] = statistics.median(times)
+                result['rows_per_second'] = rows / result['best'] if result['best'] > 0 else None
+
+            print(_format_result(result), flush=True)
+
+        # The next scale generates its own frames
+        data.clear()
+
+    return {'created': datetime.now().isoformat(timespec='seconds'), 'seed': seed, 'repeat': repeat,
+            'environment': _environment(), 'results': results}
+
+
+def compare(results: dict, baseline: dict, threshold: float = 0.1) -> list[dict]:
+    """
+    Compare the best times of two runs.
+
+    :param results: results of run
+    :param baseline: earlier results of run, e.g. loaded from the JSON file
+    :param threshold: relative slowdown counted as a regression
+    :return: one entry per case and scale in both runs with the ratio of the best times and whether it regressed
+    """
+    previous = {(r['case'], r['scale']): r for r in baseline['results'] if r.get('status') == 'ok'}
+    comparison = []
+    for result in results['results']:
+        before = previous.get((result['case'], result['scale']))
+        if result.get('status') != 'ok' or before is None:
+            continue
+        ratio = result['best'] / before['best']
+        comparison.append({'case': result['case'], 'scale': result['scale'], 'before': before['best'],
+                           'after': result['best'], 'ratio': ratio, 'regression': ratio > 1 + threshold})
+    return comparison
+
+
+def save(results: dict, path: str = None) -> str:
+    """Write results to path, by default a new timestamped file in RESULTS_DIR, and return the path."""
+    if path is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        path = os.path.join(RESULTS_DIR, f'{datetime.now().strftime("%Y%m%dT%H%M%S")}.json')
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2, ensure_ascii=False)
+    return path
+
+
+def _format_result(result: dict) -> str:
+    label = f'{result["case"]:<40} {result["scale"]:>5}'
+    if result['status'] != 'ok':
+        return f'{label}  {result["status"]}: {result["reason"]}'
+    return f'{label}  best {result["best"]:9.4f} s  median {result["median"]:9.4f} s  ' \
+           f'{result["rows_per_second"]:14,.0f} rows/s'
+
+
+def _environment() -> dict:
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+
+    return {'python': sys.version.split()[0], 'platform': platform.platform(), 'processor': platform.processor(),
+            'cpu_count': os.cpu_count(), 'numpy': np.__version__, 'pandas': pd.__version__,
+            'shapely': shapely.__version__, 'commit': commit}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the benchmark cases on synthetic data and store the results.')
+    parser.add_argument('cases', nargs='*', help='patterns of case names to run, e.g. "zoning.*" (default: all)')
+    parser.add_argument('--scales', nargs='+', default=['10k', '1M'], choices=list(SCALES))
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='JSON file to write (default: a timestamped file in benchmarks/results)')
+    parser.add_argument('--compare', help='earlier results JSON to compare against')
+    parser.add_argument('--threshold', type=float, default=0.1, help='relative slowdown reported as regression')
+    parser.add_argument('--list', action='store_true', help='list the cases and exit')
+    args = parser.parse_args()
+
+    if args.list:
+        for name, benchmark_case in CASES.items():
+            print(f'{name:<40} up to {benchmark_case.max_rows or "any number of"} rows')
+        return 0
+
+    results = run(args.cases, args.scales, args.repeat, args.seed)
+    print(f'Results written to {save(results, args.output)}')
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            comparison = compare(results, json.load(f), args.threshold)
+        for entry in comparison:
+            flag = '  REGRESSION' if entry['regression'] else ''
+            print(f'{entry["case"]:<40} {entry["scale"]:>5}  {entry["before"]:9.4f} s -> {entry["after"]:9.4f} s  '
+                  f'x{entry["ratio"]:.2f}{flag}')
+        if any(entry['regression'] for entry in comparison):
+            return 1
+
+    return 0
+
+
+# Run from the repository root: python -m benchmarks.run "zoning.*" --scales 10k 1M
+if __name__ == '__main__':
+    sys.exit(main())
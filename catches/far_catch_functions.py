@@ -17,6 +17,8 @@ import pandas as pd
 import requests
 from bs4 import BeautifulSoup
 
+from utils.execution_timer import profiler
+
 pd.set_option('display.width', None)
 pd.set_option('display.max_rows', None)
 
@@ -128,6 +130,7 @@ def read_vorn_table(url: str, remove_empty_rows: bool = False) -> pd.DataFrame |
         return df_columns  # return full data frame
 
 
+@profiler.profile()
 def scrape_vorn(vessel_group: int or list[int], start: datetime, end: datetime, mode: str):
     """
     Function to scrape catch data from Vorn.fo.
@@ -156,7 +159,8 @@ def scrape_vorn(vessel_group: int or list[int], start: datetime, end: datetime,
             for date in (pbar := tqdm(dates, total=len(dates))):
                 pbar.set_description(f'Processing: {date} - {group_name}')
                 url = generate_vorn_url(group_num, date, mode)
-                data = read_vorn_table(url, remove_empty_rows=True)
+                with profiler.span('read_vorn_table'):
+                    data = read_vorn_table(url, remove_empty_rows=True)
                 if data is not None:
                     data = data.drop('Tils. (kg)', axis=1)
                     data = data[data['species'] != 'Tils.']
@@ -186,6 +190,7 @@ def scrape_vorn(vessel_group: int or list[int], start: datetime, end: datetime,
                     data_melted = data_melted[['date', 'vessel_name', 'radio_callsign', 'vessel_type', 'species', 'value (kg)']]
 
                     dfs.append(data_melted)
+                    profiler.count(len(data_melted))
 
                 sleep(2)
 
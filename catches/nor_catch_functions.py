@@ -7,17 +7,21 @@ from zipfile import ZipFile
 from io import BytesIO
 from tqdm import tqdm
 
+from utils.execution_timer import profiler
 
-def read_fangstdata(year: int, use_specific_cols: list[str] | bool = None) -> pd.DataFrame:
+
+@profiler.profile(rows=len)
+def read_fangstdata(year: int, use_specific_cols: list[str] | bool = None, path: str = None) -> pd.DataFrame:
     """
         Read FDIR catch sheet and add time column for landing timestamp.
 
         :param year: year to select for DCA CSV-file
         :param use_specific_cols: list of columns to use
+        :param path: CSV file to read instead of the year's file in the Fishfacts catch folder
         :return: Pandas data frame of Norwegian catches containing custom "landing_time" columns as datetime object.
     """
 
-    path = fr"C:\Program Files (x86)\Fishfacts\catch\norway\catch\fangstdata_{year}.csv"
+    path = path or fr"C:\Program Files (x86)\Fishfacts\catch\norway\catch\fangstdata_{year}.csv"
 
     # Use specific columns that have been specified to minimize memory usage
 
@@ -38,23 +42,27 @@ def read_fangstdata(year: int, use_specific_cols: list[str] | bool = None) -> pd
     else:
         raise ValueError("use_specific_cols must be a list of strings, True, or None.")
 
-    dataframe = pd.read_csv(path, usecols=use_specific_cols, delimiter=';', decimal=',')
+    with profiler.span('read_csv'):
+        dataframe = pd.read_csv(path, usecols=use_specific_cols, delimiter=';', decimal=',')
 
     # Create landing_time column that contains datetime objects
-    dataframe['landing_time'] = dataframe['Landingsdato'] + ' ' + dataframe['Landingsklokkeslett']
-    dataframe['landing_time'] = pd.to_datetime(dataframe['landing_time'], format='%d.%m.%Y %H:%M:%S')
+    with profiler.span('parse_times'):
+        dataframe['landing_time'] = dataframe['Landingsdato'] + ' ' + dataframe['Landingsklokkeslett']
+        dataframe['landing_time'] = pd.to_datetime(dataframe['landing_time'], format='%d.%m.%Y %H:%M:%S')
 
     dataframe.drop(columns=['Landingsdato', 'Landingsklokkeslett'], inplace=True)
 
     return dataframe
 
 
-def read_dca(year: int, use_specific_cols: list[str] | bool = None) -> pd.DataFrame:
+@profiler.profile(rows=len)
+def read_dca(year: int, use_specific_cols: list[str] | bool = None, path: str = None) -> pd.DataFrame:
     """
     Read ERS-DCA sheet and add time columns such as start and stop times for fishing activities.
 
     :param year: year to select for DCA CSV-file
     :param use_specific_cols: list of columns to use
+    :param path: CSV file to read instead of the year's file in the Fishfacts ERS folder
     :return: Pandas data frame that contains Norwegian catch operations with columns "Start tid" and "Stopp tid"
             as datetime objects.
     """
@@ -63,23 +71,26 @@ def read_dca(year: int, use_specific_cols: list[str] | bool = None) -> pd.DataFr
                            'Startposisjon lengde', 'Stopposisjon bredde', 'Stopposisjon lengde', 'Art - FDIR',
                            'Rundvekt']
 
-    path = fr"C:\Program Files (x86)\Fishfacts\catch\norway\ers\elektronisk-rapportering-ers-{year}-fangstmelding-dca.csv"
+    path = path or fr"C:\Program Files (x86)\Fishfacts\catch\norway\ers\elektronisk-rapportering-ers-{year}-fangstmelding-dca.csv"
     if use_specific_cols:
         use_specific_cols = use_specific_cols + always_include_cols
 
-    dataframe = pd.read_csv(path, usecols=use_specific_cols, delimiter=';', decimal=',', low_memory=False)
+    with profiler.span('read_csv'):
+        dataframe = pd.read_csv(path, usecols=use_specific_cols, delimiter=';', decimal=',', low_memory=False)
 
     # Create necessary time columns from different time columns
-    dataframe['start_time'] = dataframe['Startdato'] + ' ' + dataframe['Startklokkeslett']
-    dataframe['stop_time'] = dataframe['Stoppdato'] + ' ' + dataframe['Stoppklokkeslett']
-    dataframe['start_time'] = pd.to_datetime(dataframe['start_time'], format='%d.%m.%Y %H:%M')
-    dataframe['stop_time'] = pd.to_datetime(dataframe['stop_time'], format='%d.%m.%Y %H:%M')
+    with profiler.span('parse_times'):
+        dataframe['start_time'] = dataframe['Startdato'] + ' ' + dataframe['Startklokkeslett']
+        dataframe['stop_time'] = dataframe['Stoppdato'] + ' ' + dataframe['Stoppklokkeslett']
+        dataframe['start_time'] = pd.to_datetime(dataframe['start_time'], format='%d.%m.%Y %H:%M')
+        dataframe['stop_time'] = pd.to_datetime(dataframe['stop_time'], format='%d.%m.%Y %H:%M')
 
     # Create shapely Points for start and stop positions
-    dataframe['start_position'] = dataframe.apply(
-        lambda row: Point(row['Startposisjon lengde'], row['Startposisjon bredde']), axis=1)
-    dataframe['stop_position'] = dataframe.apply(
-        lambda row: Point(row['Stopposisjon lengde'], row['Stopposisjon bredde']), axis=1)
+    with profiler.span('positions'):
+        dataframe['start_position'] = dataframe.apply(
+            lambda row: Point(row['Startposisjon lengde'], row['Startposisjon bredde']), axis=1)
+        dataframe['stop_position'] = dataframe.apply(
+            lambda row: Point(row['Stopposisjon lengde'], row['Stopposisjon bredde']), axis=1)
 
     dataframe.drop(columns=['Startdato', 'Startklokkeslett', 'Stoppdato', 'Stoppklokkeslett', 'Startposisjon lengde',
                             'Startposisjon bredde', 'Stopposisjon lengde', 'Stopposisjon bredde'], inplace=True)
@@ -216,4 +227,6 @@ def file_age(file_name: str, hrs: int = 12) -> bool or None:
     # If file is older than threshold return True
     return datetime.now() - time > timedelta(hours=hrs)
 
-file_age('fangst', hrs=12)
+
+if __name__ == '__main__':
+    file_age('fangst', hrs=12)
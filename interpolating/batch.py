@@ -0,0 +1,232 @@
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from interpolating.interpolate import GAP_HANDLING, interpolate_dataframe
+from utils.ingest import read_ais
+from zoning.catalog import get_catalog
+from zoning.zoning import ZoneAssigner
+
+# Output formats, written next to each other when both are chosen
+FORMATS = ('xlsx', 'parquet')
+
+# Record of the processed inputs, kept in the output folder
+MANIFEST_NAME = 'manifest.json'
+
+# AIS exports picked up from the input folder, Excel's lock files (~$...) excluded
+_EXTENSIONS = ('.xlsx', '.xls')
+
+_HASH_BLOCK_SIZE = 1 << 20
+
+
+def interpolate_folder(input_dir: str, output_dir: str, jobs: int = None, interval: int = 15,
+                       formats: tuple[str, ...] = ('xlsx',), zones: str = 'eez_zones', force: bool = False,
+                       max_gap: float = 60, gaps: str = 'drop') -> dict:
+    """
+    Interpolate every AIS export in a folder and assign its zones, writing one output per export.
+
+    Files run in a pool of worker processes, each loading the zone layer once. The manifest in the output folder
+    keeps the hash of every processed input together with the options and the signature of the zone layer, so a
+    rerun skips the files that did not change and still have their outputs, and an interrupted run resumes where it
+    stopped. Editing the zone files or changing an option reprocesses every file. Outputs and manifest are
+    written to a temporary file first and then renamed, so they are never left half written.
+
+    :param input_dir: folder of AIS exports with 'timestamp', 'latitude', 'longitude', 'speed' and 'heading'
+    :param output_dir: folder for the outputs, interpolated_<export name>.xlsx and/or .parquet
+    :param jobs: number of worker processes, the number of CPUs by default, 1 runs in this process
+    :param interval: minutes between interpolated positions
+    :param formats: output formats from FORMATS, parquet needs pyarrow or fastparquet
+    :param zones: zone layer key from zoning.catalog.LAYERS or a directory of polygon CSV files, assigned to the
+                  'eez zone' column
+    :param force: process every file, whether it changed or not
+    :param max_gap: longest time in minutes between two positions that is interpolated across, None for no limit
+    :param gaps: 'drop' or 'flag' the grid points inside longer gaps, see interpolating.interpolate.GAP_HANDLING
+    :return: dict with the lists of 'processed', 'skipped' and 'failed' file names and the 'errors' by file name
+    """
+    formats = tuple(dict.fromkeys(formats))
+    unknown = set(formats) - set(FORMATS)
+    if unknown or not formats:
+        raise ValueError(f'Unknown output formats {sorted(unknown)}, expected some of {FORMATS}.')
+
+    os.makedirs(output_dir, exist_ok=True)
+    manifest_path = os.path.join(output_dir, MANIFEST_NAME)
+    manifest = _read_manifest(manifest_path)
+    # The zone signature changes with the size or modification time of any of the layer's files
+    options = {'interval': interval, 'max_gap': max_gap, 'gaps': gaps, 'formats': list(formats), 'zones': zones,
+               'zones_signature': get_catalog().layer(zones).signature}
+
+    files = sorted(file for file in os.listdir(input_dir)
+                   if file.lower().endswith(_EXTENSIONS) and not file.startswith('~$'))
+    summary = {'processed': [], 'skipped': [], 'failed': [], 'errors': {}}
+
+    pending, touched = [], False
+    for file in files:
+        input_path = os.path.join(input_dir, file)
+        entry = manifest['files'].get(file)
+        stat = os.stat(input_path)
+
+        # The size and modification time spare hashing the files that were not touched since the last run
+        if entry is not None and (entry['size'], entry['mtime_ns']) == (stat.st_size, stat.st_mtime_ns):
+            digest = entry['sha1']
+        else:
+            digest = _file_hash(input_path)
+
+        outputs = _output_paths(output_dir, file, formats)
+        done = (entry is not None and entry['sha1'] == digest and entry['options'] == options
+                and all(os.path.exists(path) for path in outputs))
+        if done and not force:
+            summary['skipped'].append(file)
+            if (entry['size'], entry['mtime_ns']) != (stat.st_size, stat.st_mtime_ns):
+                entry.update(size=stat.st_size, mtime_ns=stat.st_mtime_ns)
+                touched = True
+        else:
+            pending.append((file, input_path, outputs, digest, stat))
+
+    # Files saved again with the same content are not hashed again next time
+    if touched:
+        _write_json(manifest_path, manifest)
+
+    def record(file, digest, stat, outputs, seconds):
+        summary['processed'].append(file)
+        manifest['files'][file] = {'sha1': digest, 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns,
+                                   'options': options, 'outputs': [os.path.basename(path) for path in outputs],
+                                   'seconds': round(seconds, 3)}
+        # Written after every file, so an interrupted run keeps what it finished
+        _write_json(manifest_path, manifest)
+        print(f'{file}: {seconds:.1f} s', flush=True)
+
+    def fail(file, error):
+        summary['failed'].append(file)
+        summary['errors'][file] = f'{type(error).__name__}: {error}'
+        print(f'{file}: failed, {summary["errors"][file]}', file=sys.stderr, flush=True)
+
+    jobs = min(jobs or os.cpu_count() or 1, max(len(pending), 1))
+    if jobs == 1:
+        _load_zones(zones)
+        for file, input_path, outputs, digest, stat in pending:
+            try:
+                seconds = process_file(input_path, outputs, interval, zones, max_gap, gaps)
+            except Exception as e:
+                fail(file, e)
+            else:
+                record(file, digest, stat, outputs, seconds)
+    else:
+        with ProcessPoolExecutor(jobs, initializer=_load_zones, initargs=(zones,)) as executor:
+            futures = {}
+            for file, input_path, outputs, digest, stat in pending:
+                future = executor.submit(process_file, input_path, outputs, interval, zones, max_gap, gaps)
+                futures[future] = file, digest, stat, outputs
+            for future in as_completed(futures):
+                file, digest, stat, outputs = futures[future]
+                try:
+                    seconds = future.result()
+                except Exception as e:
+                    fail(file, e)
+                else:
+                    record(file, digest, stat, outputs, seconds)
+
+    return summary
+
+
+def process_file(input_path: str, outputs: list[str], interval: int = 15, zones: str = 'eez_zones',
+                 max_gap: float = 60, gaps: str = 'drop') -> float:
+    """
+    Interpolate one AIS export, assign its zones and write the outputs.
+
+    :param input_path: AIS export
+    :param outputs: paths to write, the format taken from the extension
+    :param interval: minutes between interpolated positions
+    :param zones: zone layer key or directory assigned to the 'eez zone' column
+    :param max_gap: longest time in minutes between two positions that is interpolated across
+    :param gaps: 'drop' or 'flag' the grid points inside longer gaps
+    :return: seconds taken
+    """
+    start = time.perf_counter()
+
+    df = read_ais(input_path)
+    int_df = interpolate_dataframe(df, interval, max_gap, gaps)
+    int_df['eez zone'] = ZoneAssigner(int_df, zones).assign_zones()
+
+    for path in outputs:
+        # The temporary file keeps the extension, which pandas checks when writing Excel files
+        root, extension = os.path.splitext(path)
+        tmp_path = f'{root}.{os.getpid()}.tmp{extension}'
+        try:
+            if path.endswith('.parquet'):
+                int_df.to_parquet(tmp_path, index=False)
+            else:
+                int_df.to_excel(tmp_path, index=False, engine='openpyxl')
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    return time.perf_counter() - start
+
+
+def _load_zones(zones: str):
+    # Compiled once per worker process and kept by the process-wide catalog for all its files
+    get_catalog().layer(zones).index
+
+
+def _output_paths(output_dir: str, file: str, formats: tuple[str, ...]) -> list[str]:
+    name = 'interpolated_' + os.path.splitext(file)[0]
+    return [os.path.join(output_dir, f'{name}.{extension}') for extension in formats]
+
+
+def _file_hash(path: str) -> str:
+    digest = hashlib.sha1()
+    with open(path, 'rb') as file:
+        while block := file.read(_HASH_BLOCK_SIZE):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _read_manifest(path: str) -> dict:
+    try:
+        with open(path, encoding='utf-8') as file:
+            manifest = json.load(file)
+    except (OSError, ValueError):
+        return {'files': {}}
+    return manifest if isinstance(manifest.get('files'), dict) else {'files': {}}
+
+
+def _write_json(path: str, data: dict):
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as file:
+        json.dump(data, file, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def main(argv: list[str] = None) -> int:
+    parser = argparse.ArgumentParser(description='Interpolate a folder of AIS exports and assign their EEZ zones.')
+    parser.add_argument('input_dir', help='folder of AIS exports (.xlsx)')
+    parser.add_argument('output_dir', help='folder for the interpolated files and the manifest')
+    parser.add_argument('--jobs', type=int, default=None, help='worker processes (default: number of CPUs)')
+    parser.add_argument('--interval', type=int, default=15, help='minutes between interpolated positions')
+    parser.add_argument('--format', nargs='+', default=['xlsx'], choices=FORMATS, dest='formats',
+                        help='output formats, e.g. --format xlsx parquet')
+    parser.add_argument('--zones', default='eez_zones', help='zone layer key or directory of polygon CSV files')
+    parser.add_argument('--max-gap', type=float, default=60,
+                        help='longest time in minutes between two positions that is interpolated across')
+    parser.add_argument('--gaps', default='drop', choices=GAP_HANDLING,
+                        help='drop the grid points inside longer gaps or flag them in a gap column')
+    parser.add_argument('--force', action='store_true', help='reprocess files that did not change')
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    summary = interpolate_folder(args.input_dir, args.output_dir, args.jobs, args.interval, tuple(args.formats),
+                                 args.zones, args.force, args.max_gap, args.gaps)
+    print(f'{len(summary["processed"])} processed, {len(summary["skipped"])} unchanged, '
+          f'{len(summary["failed"])} failed in {time.perf_counter() - start:.1f} s')
+
+    return 1 if summary['failed'] else 0
+
+
+# Run from the repository root: python -m interpolating.batch <input folder> <output folder> --jobs 8
+if __name__ == '__main__':
+    sys.exit(main())
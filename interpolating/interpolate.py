@@ -1,24 +1,425 @@
+import numpy as np
 import pandas as pd
-from scipy.interpolate import interp1d
 
+from utils.execution_timer import profiler
+from utils.geodesy import intermediate_point
 
-def interpolate_dataframe(input_df: pd.DataFrame, interval: int = 15) -> pd.DataFrame:
-    # Create data range based on input data frame
-    start_time = input_df['timestamp'].iloc[0].replace(minute=0, second=0, microsecond=0)
-    end_time = input_df['timestamp'].iloc[-1]
-    new_timestamp = pd.date_range(start=start_time, end=end_time, freq=f'{interval}T')
+# Ways of placing the first grid point of a vessel
+ALIGNMENTS = ('hour', 'interval', 'first')
 
-    # Create a function for interpolation
-    interp_func = interp1d(input_df['timestamp'].astype('int64'), input_df['speed'], kind='linear', fill_value='extrapolate')
+# What happens to grid points inside a gap in the AIS data
+GAP_HANDLING = ('drop', 'flag')
 
-    # Create new data frame to merge with input data frame
-    interpolated_data = {
-        'timestamp': new_timestamp,
-        'speed': interp_func(new_timestamp.astype('int64'))
-    }
+# Columns resampled besides the timestamp
+_COLUMNS = ('latitude', 'longitude', 'speed', 'heading')
 
-    # Merge the two data frames and remove the old speed column
-    interpolated_df = pd.DataFrame(interpolated_data)
-    interpolated_df = pd.merge_asof(interpolated_df, input_df.drop(columns=['speed']), on='timestamp', direction='nearest')
+# AIS heading meaning not available
+_HEADING_NOT_AVAILABLE = 511
 
-    return interpolated_df[['timestamp', 'latitude', 'longitude', 'speed', 'heading']]
+# Number of grid points processed at a time, bounding the temporaries whatever the size of the input
+_BLOCK_SIZE = 65_536
+
+_NS_PER_MINUTE = 60_000_000_000
+_NS_PER_HOUR = 60 * _NS_PER_MINUTE
+
+
+@profiler.profile(rows=len)
+def interpolate_dataframe(input_df: pd.DataFrame, interval: int = 15, max_gap: float = 60,
+                          gaps: str = 'drop') -> pd.DataFrame:
+    """
+    Resample the track of one vessel to a fixed time interval, see interpolate_vessels.
+
+    :param input_df: DataFrame with 'timestamp', 'latitude', 'longitude', 'speed' and 'heading' of one vessel
+    :param interval: minutes between resampled positions
+    :param max_gap: longest time in minutes between two positions that is interpolated across, None for no limit
+    :param gaps: 'drop' or 'flag' the grid points inside longer gaps
+    :return: DataFrame with the columns 'timestamp', 'latitude', 'longitude', 'speed' and 'heading', and 'gap' when
+             gaps are flagged
+    """
+    return interpolate_vessels(input_df, interval, vessel_column=None, max_gap=max_gap, gaps=gaps)
+
+
+@profiler.profile(rows=len)
+def interpolate_vessels(dataframe: pd.DataFrame, interval: int = 15, vessel_column: str = 'vessel_name',
+                        align: str = 'hour', max_gap: float = 60, gaps: str = 'drop') -> pd.DataFrame:
+    """
+    Resample the tracks of all vessels to a fixed time interval in one call.
+
+    Every vessel gets grid points from its first to its last position. Between two positions, latitude and longitude
+    are interpolated along the great circle, heading along the shorter arc and speed linearly, all in proportion to
+    time. Grid points before the first or after the last position of a vessel hold that position. A heading of 511
+    (not available) or NaN is not interpolated, the heading of the nearer position is taken instead.
+
+    No positions are invented across outages: grid points between two positions more than max_gap apart are dropped
+    or flagged. Rows with a missing timestamp or vessel are ignored.
+
+    The columns are read as NumPy arrays and the grid filled block by block into preallocated result columns. Apart
+    from the result, only the vessel codes, the times as int64 nanoseconds and block-sized temporaries are allocated,
+    plus an ordering array when the rows are not sorted by time within each vessel or a vessel's rows are not
+    contiguous.
+
+    :param dataframe: DataFrame with 'timestamp', 'latitude', 'longitude', 'speed' and 'heading'
+    :param interval: minutes between resampled positions
+    :param vessel_column: column identifying the vessel, the whole frame is one vessel when it is None or missing
+    :param align: where the grid of each vessel starts
+                  'hour': on the hour before its first position, so all vessels share the grid when the interval
+                  divides an hour (the behaviour of interpolate_dataframe)
+                  'interval': on the multiple of the interval (counted from midnight 1970-01-01) before its first
+                  position, so all vessels share the grid for any interval
+                  'first': on its first position
+    :param max_gap: longest time in minutes between two positions that is interpolated across, None for no limit
+    :param gaps: what to do with the grid points inside longer gaps
+                 'drop': leave them out
+                 'flag': keep them, interpolated all the same, and mark them True in a 'gap' column
+    :return: DataFrame with the vessel column, if any, 'timestamp', 'latitude', 'longitude', 'speed', 'heading' and
+             'gap' when gaps are flagged, vessels in order of first appearance and sorted by time within each vessel
+    """
+    step, gap_limit = _check_options(interval, align, max_gap, gaps)
+    timestamps, codes, vessels = _read_keys(dataframe, vessel_column)
+
+    # Rows without a timestamp or vessel take no part
+    rows, times, codes = _sorted_rows(timestamps.asi8, np.asarray(timestamps.isna()) | (codes < 0), codes)
+    starts, ends = _runs(codes)
+
+    origins = _origins(times[starts], align, step)
+    counts = (times[ends - 1] - origins) // step + 1
+    grid, in_gap, result = _resample(times, rows, _read_columns(dataframe), starts, ends, origins,
+                                     np.zeros_like(counts), counts, step, gap_limit)
+
+    labels = None if vessels is None else vessels.take(np.repeat(codes[starts], counts))
+    return _result_frame(grid, timestamps.tz, result, in_gap, gaps, vessel_column, labels)
+
+
+def interpolate_stream(chunks, interval: int = 15, vessel_column: str = 'vessel_name', align: str = 'hour',
+                       max_gap: float = 60, gaps: str = 'drop', contiguous: bool = False):
+    """
+    Resample AIS data too large to hold in memory, chunk by chunk, see interpolate_vessels.
+
+    Each vessel's positions must come in time order across the chunks, though one chunk may hold any number of
+    vessels in any order. Only the last position and the next grid point of every vessel are kept between chunks, so
+    memory depends on the size of the chunks and the number of vessels but not on the total size of the input.
+
+    A grid point is resampled once a later position of its vessel has arrived (or the input has ended), with the
+    same arithmetic as interpolate_vessels, so the values are bit-identical. With contiguous=True the rows of the
+    chunks concatenated with pd.concat(..., ignore_index=True) equal interpolate_vessels of all input at once.
+    Otherwise the rows of a vessel come in time order but interleaved with those of other vessels, and sorting the
+    concatenation by vessel (in order of first appearance) and time gives the same frame.
+
+    :param chunks: iterable of DataFrames, e.g. pd.read_csv(..., chunksize=1_000_000)
+    :param interval: minutes between resampled positions
+    :param vessel_column: column identifying the vessel, all input is one vessel when it is None or missing
+    :param align: where the grid of each vessel starts, see interpolate_vessels
+    :param max_gap: longest time in minutes between two positions that is interpolated across, None for no limit
+    :param gaps: 'drop' or 'flag' the grid points inside longer gaps
+    :param contiguous: whether each vessel's rows are contiguous in the input, so a vessel is finished as soon as the
+                       next one starts
+    :return: iterator of resampled DataFrames with the columns of interpolate_vessels
+    """
+    step, gap_limit = _check_options(interval, align, max_gap, gaps)
+
+    # Last position and grid of every vessel with grid points left, in order of first appearance
+    tails = {}
+    finished = set()
+    tz, label_dtype = None, None
+
+    for chunk in chunks:
+        timestamps, codes, vessels = _read_keys(chunk, vessel_column)
+        rows, times, codes = _sorted_rows(timestamps.asi8, np.asarray(timestamps.isna()) | (codes < 0), codes)
+        if len(times) == 0:
+            continue
+        tz = timestamps.tz
+        starts, ends = _runs(codes)
+        keys = [None] if vessels is None else list(vessels[codes[starts]])
+        if vessels is not None:
+            label_dtype = vessels.dtype
+
+        # A finished vessel, or one before the chunk that is not the first of it, would have to be resampled again
+        reappearing = finished.intersection(keys)
+        if contiguous:
+            reappearing |= tails.keys() & set(keys[1:])
+        if reappearing:
+            raise ValueError(f'Rows of {reappearing.pop()!r} are not contiguous in the input.')
+
+        final = np.zeros(len(keys), dtype=bool)
+        if contiguous:
+            # Every vessel but the last of the chunk is complete, and so are the ones before the chunk
+            final[:-1] = True
+            done = [key for key in tails if key != keys[0]]
+            finished.update(done)
+            finished.update(keys[:-1])
+            empty = np.zeros(len(done), dtype=np.intp)
+            keys, starts, ends = done + keys, np.append(empty, starts), np.append(empty, ends)
+            final = np.append(np.ones(len(done), dtype=bool), final)
+
+        frame = _advance(tails, keys, starts, ends, final, times, rows, _read_columns(chunk), step, align,
+                         gap_limit, tz, gaps, vessel_column, label_dtype)
+        if len(frame):
+            yield frame
+
+    # The last grid points of every vessel, up to its last position
+    if tails:
+        keys = list(tails)
+        empty = np.zeros(len(keys), dtype=np.intp)
+        columns = {name: np.empty(0) for name in _COLUMNS}
+        frame = _advance(tails, keys, empty, empty, np.ones(len(keys), dtype=bool), np.empty(0, dtype=np.int64),
+                         None, columns, step, align, gap_limit, tz, gaps, vessel_column, label_dtype)
+        if len(frame):
+            yield frame
+
+
+def _advance(tails: dict, keys: list, starts: np.ndarray, ends: np.ndarray, final: np.ndarray, times: np.ndarray,
+             rows: np.ndarray | None, columns: dict, step: int, align: str, gap_limit: int, tz, gaps: str,
+             vessel_column: str, label_dtype) -> pd.DataFrame:
+    """
+    Resample the grid points of a chunk that are settled and update the tails of the vessels.
+
+    :param tails: vessel -> (origin, next grid point, time and values of the last position), updated in place
+    :param keys: vessel of every run of the chunk's sorted rows
+    :param starts: first sorted row of every run, runs may be empty for vessels that only have a tail
+    :param ends: end of every run
+    :param final: whether every run is the end of its vessel, so its grid points up to the last position are settled
+    :return: DataFrame of the settled grid points
+    """
+    # The tail of a vessel goes in front of its run as an extra row after the rows of the chunk
+    carried = np.array([key in tails for key in keys], dtype=bool)
+    extra = carried.astype(np.intp)
+    shift = np.cumsum(extra)
+    lengths = ends - starts
+    n_rows = len(next(iter(columns.values())))
+
+    positions = np.arange(len(times)) + np.repeat(shift, lengths)
+    new_starts, new_ends = starts + shift - extra, ends + shift
+    extended_times = np.empty(len(times) + shift[-1], dtype=np.int64)
+    extended_rows = np.empty(len(extended_times), dtype=np.intp)
+    extended_times[positions] = times
+    extended_rows[positions] = np.arange(len(times)) if rows is None else rows
+
+    carried_keys = [key for key, has_tail in zip(keys, carried) if has_tail]
+    carried_positions = new_starts[carried]
+    extended_times[carried_positions] = [tails[key][2] for key in carried_keys]
+    extended_rows[carried_positions] = n_rows + np.arange(len(carried_keys))
+    extended_columns = {name: np.append(values, [tails[key][3][name] for key in carried_keys])
+                        for name, values in columns.items()}
+
+    # Positions must not go back in time from one chunk to the next
+    following = np.minimum(carried_positions + 1, new_ends[carried] - 1)
+    behind = extended_times[following] < extended_times[carried_positions]
+    if behind.any():
+        raise ValueError(f'Positions of {carried_keys[np.argmax(behind)]!r} are not in time order across chunks.')
+
+    new = ~carried
+    origins = np.empty(len(keys), dtype=np.int64)
+    next_points = np.zeros(len(keys), dtype=np.int64)
+    origins[carried] = [tails[key][0] for key in carried_keys]
+    next_points[carried] = [tails[key][1] for key in carried_keys]
+    origins[new] = _origins(extended_times[new_starts[new]], align, step)
+
+    # Grid points before the last position are settled, the one on it only when no position can follow
+    last = extended_times[new_ends - 1]
+    ends_before = np.where(final, (last - origins) // step + 1, (last - origins - 1) // step + 1)
+    counts = np.maximum(ends_before - next_points, 0)
+
+    grid, in_gap, result = _resample(extended_times, extended_rows, extended_columns, new_starts, new_ends, origins,
+                                     next_points, counts, step, gap_limit)
+
+    for k, key in enumerate(keys):
+        if final[k]:
+            tails.pop(key, None)
+        else:
+            row = extended_rows[new_ends[k] - 1]
+            tails[key] = (origins[k], next_points[k] + counts[k], last[k],
+                          {name: values[row] for name, values in extended_columns.items()})
+
+    labels = None
+    if keys and keys[0] is not None:
+        labels = pd.Index(keys, dtype=label_dtype).take(np.repeat(np.arange(len(keys)), counts))
+    return _result_frame(grid, tz, result, in_gap, gaps, vessel_column, labels)
+
+
+def _check_options(interval: float, align: str, max_gap: float | None, gaps: str) -> tuple[int, int]:
+    """Validate the options and return the interval and the longest gap in nanoseconds."""
+    step = int(round(interval * _NS_PER_MINUTE))
+    if step <= 0:
+        raise ValueError(f'The interval must be positive, got {interval}.')
+    if align not in ALIGNMENTS:
+        raise ValueError(f'Unknown alignment {align!r}, expected one of {ALIGNMENTS}.')
+    if gaps not in GAP_HANDLING:
+        raise ValueError(f'Unknown gap handling {gaps!r}, expected one of {GAP_HANDLING}.')
+    gap_limit = np.iinfo(np.int64).max if max_gap is None else int(round(max_gap * _NS_PER_MINUTE))
+    return step, gap_limit
+
+
+def _read_keys(dataframe: pd.DataFrame, vessel_column: str | None) -> tuple:
+    """Return the timestamps in nanoseconds, the vessel code of every row and the vessels (None without a column)."""
+    timestamps = pd.DatetimeIndex(pd.to_datetime(dataframe['timestamp'])).as_unit('ns')
+    if vessel_column is not None and vessel_column in dataframe.columns:
+        codes, vessels = pd.factorize(dataframe[vessel_column])
+    else:
+        codes, vessels = np.zeros(len(dataframe), dtype=np.intp), None
+    return timestamps, codes, vessels
+
+
+def _read_columns(dataframe: pd.DataFrame) -> dict:
+    return {name: dataframe[name].to_numpy(dtype=np.float64) for name in _COLUMNS}
+
+
+def _runs(codes: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Return the start and end of every run of one vessel in the sorted rows."""
+    if len(codes) == 0:
+        return np.zeros(0, dtype=np.intp), np.zeros(0, dtype=np.intp)
+    boundaries = np.flatnonzero(codes[1:] != codes[:-1]) + 1
+    return np.append(0, boundaries), np.append(boundaries, len(codes))
+
+
+def _origins(first: np.ndarray, align: str, step: int) -> np.ndarray:
+    """Return the first grid point of vessels with the given first position times."""
+    if align == 'hour':
+        return first // _NS_PER_HOUR * _NS_PER_HOUR
+    if align == 'interval':
+        return first // step * step
+    return first
+
+
+def _resample(times: np.ndarray, rows: np.ndarray | None, columns: dict, starts: np.ndarray, ends: np.ndarray,
+              origins: np.ndarray, first_points: np.ndarray, counts: np.ndarray, step: int,
+              gap_limit: int) -> tuple[np.ndarray, np.ndarray, dict]:
+    """
+    Resample runs of sorted rows on their grids.
+
+    :param times: sorted times in nanoseconds
+    :param rows: row of columns at every sorted position, None when that is the identity
+    :param columns: 'latitude', 'longitude', 'speed' and 'heading' of the rows
+    :param starts: first sorted position of every run
+    :param ends: end of every run
+    :param origins: time of grid point 0 of every run
+    :param first_points: number of the first grid point to resample of every run
+    :param counts: number of grid points to resample of every run
+    :param step: time between grid points in nanoseconds
+    :param gap_limit: longest time between two positions that is interpolated across in nanoseconds
+    :return: grid times, whether each grid point is inside a gap and the resampled columns
+    """
+    offsets = np.append(0, np.cumsum(counts))
+    grid = np.empty(offsets[-1], dtype=np.int64)
+    in_gap = np.empty(offsets[-1], dtype=bool)
+    result = {name: np.empty(offsets[-1]) for name in columns}
+
+    for start, end, origin, first_point, count, offset in zip(starts, ends, origins, first_points, counts, offsets):
+        vessel_times = times[start:end]
+        for block in range(0, count, _BLOCK_SIZE):
+            out = slice(offset + block, offset + min(block + _BLOCK_SIZE, count))
+            points = origin + np.arange(first_point + block, first_point + out.stop - offset, dtype=np.int64) * step
+            grid[out] = points
+
+            # Positions on either side of every grid point, the same one at both ends of the track
+            after = np.searchsorted(vessel_times, points, side='right')
+            before = np.maximum(after - 1, 0)
+            after = np.minimum(after, end - start - 1)
+            time_before, time_after = vessel_times[before], vessel_times[after]
+
+            # Integer differences keep the weights exact whatever the epoch, which float times would not
+            span = time_after - time_before
+            weight = np.where(span > 0, (points - time_before) / np.where(span > 0, span, 1), 0.0)
+            nearest = np.where(points - time_before <= time_after - points, before, after)
+            # A grid point on a position is observed, only points strictly inside a long span are gaps
+            in_gap[out] = (span > gap_limit) & (points > time_before)
+
+            before, after, nearest = before + start, after + start, nearest + start
+            if rows is not None:
+                before, after, nearest = rows[before], rows[after], rows[nearest]
+
+            _interpolate_block(columns, before, after, nearest, weight,
+                               {name: values[out] for name, values in result.items()})
+
+    return grid, in_gap, result
+
+
+def _result_frame(grid: np.ndarray, tz, result: dict, in_gap: np.ndarray, gaps: str, vessel_column: str | None,
+                  labels) -> pd.DataFrame:
+    """Build the resampled DataFrame, with the vessel column when labels are given."""
+    new_timestamp = pd.DatetimeIndex(grid.view('datetime64[ns]'))
+    if tz is not None:
+        new_timestamp = new_timestamp.tz_localize('UTC').tz_convert(tz)
+
+    interpolated = {'timestamp': new_timestamp, 'latitude': result['latitude'], 'longitude': result['longitude'],
+                    'speed': result['speed'], 'heading': result['heading']}
+    if labels is not None:
+        interpolated = {vessel_column: labels, **interpolated}
+
+    if gaps == 'flag':
+        interpolated['gap'] = in_gap
+    elif in_gap.any():
+        keep = ~in_gap
+        interpolated = {name: values[keep] for name, values in interpolated.items()}
+
+    return pd.DataFrame(interpolated, copy=False)
+
+
+def _interpolate_block(columns: dict, before: np.ndarray, after: np.ndarray, nearest: np.ndarray,
+                       weight: np.ndarray, out: dict):
+    """
+    Interpolate a block of grid points between the rows before and after them and write the result into out.
+
+    :param columns: 'latitude', 'longitude', 'speed' and 'heading' of all input rows
+    :param before: input row at or before every grid point
+    :param after: input row after every grid point
+    :param nearest: the nearer of the two
+    :param weight: fraction of the time from before to after passed at every grid point, 0 at before
+    :param out: arrays of the block to write the result columns into
+    """
+    # Grid points on a position take its values as they are
+    exact = weight == 0
+
+    latitude_before, longitude_before = columns['latitude'][before], columns['longitude'][before]
+    latitude, longitude = intermediate_point(latitude_before, longitude_before, columns['latitude'][after],
+                                             columns['longitude'][after], weight)
+    out['latitude'][:] = np.where(exact, latitude_before, latitude)
+    out['longitude'][:] = np.where(exact, longitude_before, longitude)
+
+    speed_before = columns['speed'][before]
+    out['speed'][:] = np.where(exact, speed_before, speed_before + weight * (columns['speed'][after] - speed_before))
+
+    heading_before, heading_after = columns['heading'][before], columns['heading'][after]
+    turn = (heading_after - heading_before + 180) % 360 - 180
+    known = (heading_before != _HEADING_NOT_AVAILABLE) & (heading_after != _HEADING_NOT_AVAILABLE)
+    out['heading'][:] = np.where(exact | ~known | np.isnan(turn), columns['heading'][nearest],
+                                 (heading_before + weight * turn) % 360)
+
+
+def _sorted_rows(nanoseconds: np.ndarray, missing: np.ndarray, codes: np.ndarray):
+    """
+    Order the rows with a timestamp by vessel and time.
+
+    :return: the row of the input at every sorted position (None when that is the identity), and the times and vessel
+             codes in sorted order
+    """
+    rows = np.flatnonzero(~missing) if missing.any() else None
+    times = nanoseconds if rows is None else nanoseconds[rows]
+    sorted_codes = codes if rows is None else codes[rows]
+
+    same_vessel = sorted_codes[1:] == sorted_codes[:-1]
+    if np.all(sorted_codes[1:] >= sorted_codes[:-1]) and np.all(~same_vessel | (times[1:] >= times[:-1])):
+        return rows, times, sorted_codes
+
+    # Two stable sorts, by time and then by vessel, are faster than one lexsort
+    order = np.argsort(times, kind='stable')
+    order = order[np.argsort(sorted_codes[order], kind='stable')]
+    rows = order if rows is None else rows[order]
+    return rows, nanoseconds[rows], codes[rows]
+
+
+r"""
+# EXAMPLE
+if __name__ == '__main__':
+    import os
+    from utils.ingest import read_ais
+    path = r"C:\Users\tokit\OneDrive\Desktop\Sild_23_24\AIS\Faroe Islands\Raw"
+    df = pd.concat([read_ais(os.path.join(path, file)) for file in os.listdir(path) if file.endswith('.xlsx')])
+    interpolated = interpolate_vessels(df, 15, align='interval')
+    print(interpolated.groupby('vessel_name').size())
+
+    # A season export too large for memory, read and resampled a million rows at a time
+    chunks = pd.read_csv(r"C:\Users\tokit\OneDrive\Desktop\Sild_23_24\AIS\season.csv", parse_dates=['timestamp'],
+                         chunksize=1_000_000)
+    for i, frame in enumerate(interpolate_stream(chunks, 15, align='interval')):
+        frame.to_csv(f'interpolated_{i:03d}.csv', index=False)
+"""
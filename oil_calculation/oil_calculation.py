@@ -1,6 +1,8 @@
 import pandas as pd
 import numpy as np
-from get_exponents import get_exponents
+from oil_calculation.get_exponents import get_exponents
+from utils.execution_timer import profiler
+from utils.kernels import jitable, kernel
 
 pd.set_option('display.width', None)
 
@@ -36,6 +38,7 @@ def wind_index(wi_df: pd.DataFrame) -> pd.DataFrame:
     return wi_df
 
 
+@profiler.profile(rows=len)
 def calculate_oil_consumption(input_df: pd.DataFrame, ship_dimensions: dict, c_exponents: list) -> pd.DataFrame:
     # Exponents
     m, n, o, p, q, r, boost, lf = c_exponents
@@ -51,63 +54,143 @@ def calculate_oil_consumption(input_df: pd.DataFrame, ship_dimensions: dict, c_e
     c2 = (((gr_ton * 70 / (len_overall * 2538)) ** q) * ((2014 / build_year) ** n) * (
             (me_pwr / (4000 + boost)) ** r)) * lf
 
-    formulas = {
-        'f1': lambda v, wi: 152.148641822216 * v + 34.9100089057054 * wi + 86.1234932728002,
-        'f2': lambda v: 156.23 + 120.77 * v,
-        'f3': lambda v, u, hf: 2.76103347155361 * v + 57.7767237861278 * u + 104.711251206601 * hf + 114.922736669769,
-        'f4': lambda v, wi: 63.9672412288041 * v + 10.689266333751 * wi + 340.738581364124,
-        'f5': lambda v: 198.4 + 135.43 * v,
-        'f6': lambda v, wi: -155.341163478944 * v ** 2 - 24.2969886960548 * wi * v + 1583.44666304855 * v + 1.62359341206797 * wi ** 2 + 80.7101007829525 * wi - 2937.34177867731,
-        'f7': lambda v: 622.04 + 70.59 * v,
-        'f8': lambda v, wi: 2.68851515895423 * v ** 3 - 6.33754710698395 * wi * v ** 2 - 82.0934140487749 * v ** 2 + 13.1835243251615 * wi ** 2 * v + 75.4987641439067 * wi * v + 902.097506066174 * v + 0.390636638455049 * wi ** 3 - 173.4547124061 * wi ** 2 + 49.9828397981443 * wi - 3006.74441010485,
-        'f9': lambda v, wi: 2.68851515895423 * v ** 3 - 6.33754710698395 * wi * v ** 2 - 82.0934140487749 * v ** 2 + 13.1835243251615 * wi ** 2 * v + 75.4987641439067 * wi * v + 902.097506066174 * v + 0.390636638455049 * wi ** 3 - 173.4547124061 * wi ** 2 + 49.9828397981443 * wi - 3006.74441010485,
-        'f10': lambda v, u, hf: 60.16707947782 * v + 21.878464140581 * u - 135.68751476082 * hf - 250.326709876776,
-        'f11': lambda v: 273.56 + 11.29 * v,
-        'f12': lambda v: 426.52 + 12.17 * v,
-    }
+    # Hourly consumption from the piecewise speed formulas, scaled by c1 or c2 and converted to 15 minutes
+    input_df['consumption l'] = oil_consumption(input_df['speed'].to_numpy(dtype=np.float64),
+                                                input_df['wind_index'].to_numpy(dtype=np.float64),
+                                                input_df['wind_speed'].to_numpy(dtype=np.float64),
+                                                input_df['head_on_factor'].to_numpy(dtype=np.float64), c1, c2)
+
+    return input_df
+
+
+# Consumption formulas of speed v, wind index wi, wind speed u and head on factor hf, in litres per hour. Powers are
+# written as products so both kernel backends round them the same way.
+@jitable
+def _f1(v, wi):
+    return 152.148641822216 * v + 34.9100089057054 * wi + 86.1234932728002
+
+
+@jitable
+def _f2(v):
+    return 156.23 + 120.77 * v
+
+
+@jitable
+def _f3(v, u, hf):
+    return 2.76103347155361 * v + 57.7767237861278 * u + 104.711251206601 * hf + 114.922736669769
+
+
+@jitable
+def _f4(v, wi):
+    return 63.9672412288041 * v + 10.689266333751 * wi + 340.738581364124
+
+
+@jitable
+def _f5(v):
+    return 198.4 + 135.43 * v
+
+
+@jitable
+def _f6(v, wi):
+    return (-155.341163478944 * (v * v) - 24.2969886960548 * wi * v + 1583.44666304855 * v
+            + 1.62359341206797 * (wi * wi) + 80.7101007829525 * wi - 2937.34177867731)
+
 
-    for index, row in input_df.iterrows():
-        v = row['speed']
-        wi = row['wind_index']
-        u = row['wind_speed']
-        hf = row['head_on_factor']
+@jitable
+def _f7(v):
+    return 622.04 + 70.59 * v
+
+
+# f9 is the same polynomial, used above 11 knots
+@jitable
+def _f8(v, wi):
+    return (2.68851515895423 * (v * v * v) - 6.33754710698395 * wi * (v * v) - 82.0934140487749 * (v * v)
+            + 13.1835243251615 * (wi * wi) * v + 75.4987641439067 * wi * v + 902.097506066174 * v
+            + 0.390636638455049 * (wi * wi * wi) - 173.4547124061 * (wi * wi) + 49.9828397981443 * wi
+            - 3006.74441010485)
+
+
+@jitable
+def _f10(v, u, hf):
+    return 60.16707947782 * v + 21.878464140581 * u - 135.68751476082 * hf - 250.326709876776
+
+
+@jitable
+def _f11(v):
+    return 273.56 + 11.29 * v
+
+
+@jitable
+def _f12(v):
+    return 426.52 + 12.17 * v
+
+
+def _oil_consumption_loop(speed, wind_index, wind_speed, head_on_factor, c1, c2):
+    consumption = np.empty(len(speed))
+    for i in range(len(speed)):
+        v, wi, u, hf = speed[i], wind_index[i], wind_speed[i], head_on_factor[i]
 
         if v < 0.3:
             c = 67.71
         elif 0.3 <= v < 1.1:
-            f1 = formulas['f1'](v, wi)
-            c = f1 if 50 < f1 < 500 else formulas['f2'](v)
+            f1 = _f1(v, wi)
+            c = f1 if 50 < f1 < 500 else _f2(v)
         elif 1.1 <= v < 3.5:
-            f3 = formulas['f3'](v, u, hf)
-            f4 = formulas['f4'](v, wi)
-            c = f3 if 250 < f3 < 800 else (f4 if 250 < f4 < 800 else formulas['f5'](v))
+            f3 = _f3(v, u, hf)
+            f4 = _f4(v, wi)
+            c = f3 if 250 < f3 < 800 else (f4 if 250 < f4 < 800 else _f5(v))
         elif 3.5 <= v < 6:
-            f6 = formulas['f6'](v, wi)
-            c = f6 if 500 < f6 < 1400 else formulas['f7'](v)
+            f6 = _f6(v, wi)
+            c = f6 if 500 < f6 < 1400 else _f7(v)
         else:
+            f8 = _f8(v, wi)
+            f10 = _f10(v, u, hf)
             if v < 11:
-                f8 = formulas['f8'](v, wi)
-                f10 = formulas['f10'](v, u, hf)
-                c = f8 if 250 < f8 < 950 else (
-                    f10 if 250 < f10 < 950 else formulas['f11'](v) if v < 10 else formulas['f12'](v))
+                c = f8 if 250 < f8 < 950 else (f10 if 250 < f10 < 950 else _f11(v) if v < 10 else _f12(v))
             else:
-                f9 = formulas['f9'](v, wi)
-                f10 = formulas['f10'](v, u, hf)
-                c = f9 if 250 < f9 < 950 else (f10 if 250 < f10 < 950 else formulas['f12'](v))
-
-        # multiply by constant c1 or c2 depending on vessel speed
-        if v <= 6:
-            c = c * c1
-        else:
-            c = c * c2
-
-        # convert hourly consumption to quarterly (15 min) (if dataframe is in 15 minute intervals)
-        c /= 4
-
-        # multiply by 0.25 (4 data points per hour)
-        input_df.at[index, 'consumption l'] = c
-
-    return input_df
+                c = f8 if 250 < f8 < 950 else (f10 if 250 < f10 < 950 else _f12(v))
+
+        # multiply by constant c1 or c2 depending on vessel speed, then convert hourly consumption to quarterly
+        c = c * c1 if v <= 6 else c * c2
+        consumption[i] = c / 4
+
+    return consumption
+
+
+@kernel(_oil_consumption_loop)
+def oil_consumption(speed: np.ndarray, wind_index: np.ndarray, wind_speed: np.ndarray, head_on_factor: np.ndarray,
+                    c1: float, c2: float) -> np.ndarray:
+    """
+    Oil consumption in litres per 15 minutes of every position.
+
+    Each speed range has its own formula, falling back to the next one when the result is outside the range the
+    formula is valid for. The hourly consumption is multiplied by c1 up to 6 knots and by c2 above.
+
+    :param speed: float64 array of speeds in knots
+    :param wind_index: float64 array of wind speed times head on factor
+    :param wind_speed: float64 array of wind speeds
+    :param head_on_factor: float64 array of head on factors
+    :param c1: vessel constant for speeds up to 6 knots
+    :param c2: vessel constant for higher speeds
+    :return: float64 array of consumption, NaN where the speed is missing
+    """
+    v, wi, u, hf = speed, wind_index, wind_speed, head_on_factor
+
+    with np.errstate(invalid='ignore'):
+        f1, f3, f4, f6, f8, f10 = _f1(v, wi), _f3(v, u, hf), _f4(v, wi), _f6(v, wi), _f8(v, wi), _f10(v, u, hf)
+
+        # The formula of every speed range with its fallbacks, the last one for 11 knots and above (and NaN)
+        c = np.select(
+            [v < 0.3, v < 1.1, v < 3.5, v < 6, v < 11],
+            [np.full(len(v), 67.71),
+             np.where((50 < f1) & (f1 < 500), f1, _f2(v)),
+             np.where((250 < f3) & (f3 < 800), f3, np.where((250 < f4) & (f4 < 800), f4, _f5(v))),
+             np.where((500 < f6) & (f6 < 1400), f6, _f7(v)),
+             np.where((250 < f8) & (f8 < 950), f8,
+                      np.where((250 < f10) & (f10 < 950), f10, np.where(v < 10, _f11(v), _f12(v))))],
+            default=np.where((250 < f8) & (f8 < 950), f8, np.where((250 < f10) & (f10 < 950), f10, _f12(v))))
+
+        return np.where(v <= 6, c * c1, c * c2) / 4
 
 
 if __name__ == '__main__':
@@ -1,9 +1,10 @@
 import geopandas as gpd
 from pandas import DataFrame
 from plotting.utils import get_speed_color
-import pandas as pd
+from shapely.geometry import Polygon
+from zoning.catalog import get_catalog
+import shapely
 import folium
-import os
 
 
 # Make a function that takes a dataframe and plots a speed track of the track line
@@ -51,23 +52,21 @@ def plot_vessel_track(input_df: DataFrame, m: folium.Map = None, vessel_name: st
 
 
 # Create plot function that plots eez zones as layer on top of folium map. Extra layers need to be each its own layer.
-def plot_eez_zones(m: folium.Map = None) -> folium.Map:
+def plot_eez_zones(m: folium.Map = None, tolerance: float = None) -> folium.Map:
     # If m argument is not passed, create new map object based on mean coordinates of input dataframe
     if m is None:
         m = initialize_map()
 
-    # Get path of EEZ zones
-    cur_file_path = os.path.abspath(__file__)
-    par_file_dir = os.path.dirname(cur_file_path)
-    eez_zones_path = os.path.join(par_file_dir, '../zones/eez_zones')
-    eez_zones_folder = os.listdir(eez_zones_path)
+    # Get compiled EEZ zones, simplified to the given tolerance in metres for lighter maps
+    eez_zones = get_catalog().layer('eez_zones')
+    geometries = eez_zones.geometries if tolerance is None else eez_zones.simplified(tolerance).simplified
 
     # Plot EEZ zones
     polygon_group_line = folium.FeatureGroup(name='EEZ zones (lines)')
     polygon_group_fill = folium.FeatureGroup(name='EEZ zones (fill)', show=False)
 
-    for zone in eez_zones_folder:
-        polygon_df = pd.read_csv(os.path.join(eez_zones_path, zone))
+    for zone, geometry in zip(eez_zones.names, geometries):
+        polygon_df = polygon_to_dataframe(geometry)
         if zone.split('_')[0] == 'neafc':
             polygon_line = plot_polygon(polygon_df)
             polygon_fill = plot_polygon(polygon_df, weight=0.05, fill=True, fill_opacity=0.1, fill_color='white')
@@ -142,30 +141,32 @@ def plot_eez_zones_w_shorelines(m: folium.Map) -> folium.Map:
     return m
 
 
-def plot_other_zones(m: folium.Map = None) -> folium.Map:
+def plot_other_zones(m: folium.Map = None, tolerance: float = None) -> folium.Map:
     # If m argument is not passed, create new map object based on mean coordinates of input dataframe
     if m is None:
         m = initialize_map()
 
-    # Get path of other zones
-    cur_file_path = os.path.abspath(__file__)
-    par_file_dir = os.path.dirname(cur_file_path)
-    other_zones_path = os.path.join(par_file_dir, '../zones/other_zones')
-    other_zones_folder = os.listdir(other_zones_path)
+    # Get compiled other zones, simplified to the given tolerance in metres for lighter maps
+    other_zones = get_catalog().layer('other_zones')
+    geometries = other_zones.geometries if tolerance is None else other_zones.simplified(tolerance).simplified
 
     # Plot other zones in a layer each
-    for zone in other_zones_folder:
-        if zone.endswith('.csv'):  # in case there are non-csv files in directory
-            group_name = get_zone_name(zone)
-            polygon_group = folium.FeatureGroup(name=group_name, show=False)
-            polygon_df = pd.read_csv(os.path.join(other_zones_path, zone))
-            polygon = plot_polygon(polygon_df, color='yellow', fill=True, fill_opacity=0.2, fill_color='yellow')
-            polygon.add_to(polygon_group)
-            polygon_group.add_to(m)
+    for zone, geometry in zip(other_zones.names, geometries):
+        group_name = get_zone_name(f'{zone}.csv')
+        polygon_group = folium.FeatureGroup(name=group_name, show=False)
+        polygon_df = polygon_to_dataframe(geometry)
+        polygon = plot_polygon(polygon_df, color='yellow', fill=True, fill_opacity=0.2, fill_color='yellow')
+        polygon.add_to(polygon_group)
+        polygon_group.add_to(m)
 
     return m
 
 
+# Convert polygon from zone catalog to a data frame with latitude and longitude columns
+def polygon_to_dataframe(polygon: Polygon) -> DataFrame:
+    return DataFrame(shapely.get_coordinates(polygon.exterior), columns=['latitude', 'longitude'])
+
+
 # Plot single polygon
 def plot_polygon(input_df: DataFrame, color: str = 'grey', **kwargs) -> folium.Polygon:
     # Default parameters for polygon
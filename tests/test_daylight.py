@@ -0,0 +1,37 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.daylight import SolarElevationCache, solar_elevation
+
+# Largest difference to astral the daylight functions are allowed
+MAX_ERROR_DEGREES = 0.1
+
+
+@pytest.fixture(scope='module')
+def astral_elevations():
+    """Random positions and times over 15 years with their elevations from astral."""
+    astral = pytest.importorskip('astral')
+    from astral.sun import elevation
+
+    rng = np.random.default_rng(0)
+    n = 200_000
+    latitudes = rng.uniform(-80, 80, n)
+    longitudes = rng.uniform(-180, 180, n)
+    timestamps = pd.Timestamp('2015-01-01') + pd.to_timedelta(rng.uniform(0, 15 * 365 * 86400, n), unit='s')
+
+    expected = np.array([elevation(astral.Observer(latitude, longitude), timestamp.to_pydatetime(warn=False))
+                         for latitude, longitude, timestamp in zip(latitudes, longitudes, timestamps)])
+    return latitudes, longitudes, timestamps, expected
+
+
+def test_solar_elevation_matches_astral(astral_elevations):
+    latitudes, longitudes, timestamps, expected = astral_elevations
+    difference = np.abs(solar_elevation(latitudes, longitudes, timestamps) - expected)
+    assert difference.max() < MAX_ERROR_DEGREES
+
+
+def test_cached_elevation_matches_astral(astral_elevations):
+    latitudes, longitudes, timestamps, expected = astral_elevations
+    difference = np.abs(SolarElevationCache().elevation(latitudes, longitudes, timestamps) - expected)
+    assert difference.max() < MAX_ERROR_DEGREES
@@ -0,0 +1,27 @@
+import tracemalloc
+
+from utils.execution_timer import Profiler
+
+
+def test_disable_stops_tracing_it_started():
+    profiler = Profiler()
+    profiler.enable(memory=True)
+    assert tracemalloc.is_tracing()
+
+    profiler.disable()
+    assert not tracemalloc.is_tracing()
+
+
+def test_disable_leaves_callers_tracing_running():
+    tracemalloc.start()
+    try:
+        profiler = Profiler()
+        profiler.enable(memory=True)
+        with profiler.span('work') as span:
+            span.count(1)
+            bytearray(1 << 20)
+        profiler.disable()
+
+        assert tracemalloc.is_tracing()
+    finally:
+        tracemalloc.stop()
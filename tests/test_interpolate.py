@@ -0,0 +1,40 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from interpolating.interpolate import interpolate_dataframe, interpolate_stream
+
+
+@pytest.fixture
+def track_with_gap():
+    """Positions at 00:00 and 00:15, then nothing until 03:00 and 03:15."""
+    return pd.DataFrame({
+        'timestamp': pd.to_datetime(['2024-01-01 00:00', '2024-01-01 00:15', '2024-01-01 03:00',
+                                     '2024-01-01 03:15']),
+        'latitude': [62.0, 62.1, 62.2, 62.3],
+        'longitude': [-7.0, -7.1, -7.2, -7.3],
+        'speed': [10.0, 10.0, 10.0, 10.0],
+        'heading': [0, 90, 180, 270],
+    })
+
+
+def test_observed_position_before_gap_is_kept(track_with_gap):
+    result = interpolate_dataframe(track_with_gap)
+
+    assert list(result['timestamp']) == list(track_with_gap['timestamp'])
+    np.testing.assert_allclose(result['latitude'], track_with_gap['latitude'])
+
+
+def test_only_points_inside_gap_are_flagged(track_with_gap):
+    result = interpolate_dataframe(track_with_gap, gaps='flag')
+
+    inside = (result['timestamp'] > '2024-01-01 00:15') & (result['timestamp'] < '2024-01-01 03:00')
+    assert len(result) == 14
+    assert (result['gap'] == inside).all()
+
+
+def test_stream_keeps_observed_position_before_gap(track_with_gap):
+    chunks = [track_with_gap.iloc[:2], track_with_gap.iloc[2:]]
+    result = pd.concat(interpolate_stream(chunks, vessel_column=None), ignore_index=True)
+
+    pd.testing.assert_frame_equal(result, interpolate_dataframe(track_with_gap))
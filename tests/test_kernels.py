@@ -0,0 +1,78 @@
+import numpy as np
+import pytest
+
+from oil_calculation.oil_calculation import oil_consumption
+from utils import kernels
+from utils.find_individual_stops import stop_runs
+from utils.replace_missing_headings import fill_heading_gaps
+from zoning.track import anchor_discs
+
+
+def _cases(n: int) -> dict:
+    """Kernels with random input of n positions, including missing values and runs of stopped positions."""
+    rng = np.random.default_rng(0)
+
+    groups = np.repeat(np.arange(100), n // 100)
+    headings = rng.integers(0, 360, n).astype(np.float64)
+    missing = rng.random(n) < 0.3
+    missing[:5] = True
+
+    times = np.cumsum(rng.integers(20, 90, n)).astype(np.int64) * 1_000_000
+    speeds = np.where(rng.random(n) < 0.3, 0.0, rng.uniform(0, 12, n))
+    speeds[rng.random(n) < 0.01] = np.nan
+
+    speed, wind_speed, heading_factor = rng.uniform(0, 14, n), rng.uniform(0, 20, n), rng.uniform(0, 1, n)
+    speed[rng.random(n) < 0.01] = np.nan
+
+    latitudes = 62 + np.cumsum(rng.normal(0, 0.002, n))
+    longitudes = -7 + np.cumsum(rng.normal(0, 0.004, n))
+    anchors = np.append(np.arange(0, n, 32), n - 1)
+    anchor_radius = np.where(rng.random(len(anchors)) < 0.2, 0, rng.uniform(0, 0.05, len(anchors)))
+    anchor_codes = rng.integers(-1, 20, len(anchors)).astype(np.int32)
+
+    return {
+        'fill_heading_gaps': (fill_heading_gaps, (headings, missing, groups)),
+        'stop_runs': (stop_runs, (speeds, times, groups, 300_000_000, 0.1)),
+        'oil_consumption': (oil_consumption, (speed, wind_speed * heading_factor, wind_speed, heading_factor,
+                                              1.3, 0.9)),
+        'anchor_discs': (anchor_discs, (latitudes, longitudes, latitudes[anchors], longitudes[anchors],
+                                        anchor_radius ** 2, anchor_codes, 32)),
+    }
+
+
+def _assert_identical(expected, result):
+    if not isinstance(expected, tuple):
+        expected, result = (expected,), (result,)
+    assert len(expected) == len(result)
+    for a, b in zip(expected, result):
+        np.testing.assert_array_equal(a, b)
+
+
+@pytest.fixture
+def backend():
+    """Restore the kernel backend after the test."""
+    previous = kernels.get_backend()
+    yield kernels.set_backend
+    kernels.set_backend(previous)
+
+
+@pytest.mark.parametrize('name', list(_cases(100)))
+def test_loop_matches_vectorized(name):
+    # The loops as plain Python, so the check runs without numba, on a size they finish quickly at
+    function, args = _cases(2_000)[name]
+    expected = function.vectorized(*args)
+    # Windows without a valid speed divide 0 by 0, which compiled loops do silently
+    with np.errstate(invalid='ignore', divide='ignore'):
+        _assert_identical(expected, function.loop(*args))
+
+
+@pytest.mark.parametrize('name', list(_cases(100)))
+def test_numba_matches_numpy(name, backend):
+    if not kernels.numba_available():
+        pytest.skip('numba is not installed')
+    function, args = _cases(200_000)[name]
+
+    backend('numpy')
+    expected = function(*args)
+    backend('numba')
+    _assert_identical(expected, function(*args))
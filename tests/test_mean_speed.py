@@ -0,0 +1,38 @@
+import numpy as np
+import pandas as pd
+
+from utils.distance import calculate_distance
+from utils.mean_speed import calculate_mean_speed_between_points
+
+
+def _positions() -> pd.DataFrame:
+    return pd.DataFrame({
+        'timestamp': pd.to_datetime(['2024-01-01 00:00', '2024-01-01 00:30', None, '2024-01-01 01:30',
+                                     '2024-01-01 01:30']),
+        'latitude': [62.0, 62.1, 62.2, 62.3, 62.3],
+        'longitude': [-7.0, -7.0, -7.0, -7.0, -7.1],
+    })
+
+
+def test_mean_speed_is_distance_over_time():
+    dataframe = _positions()
+    hours = dataframe['timestamp'].diff().dt.total_seconds().to_numpy() / 3600
+    with np.errstate(divide='ignore'):
+        expected = calculate_distance(dataframe).to_numpy() / hours
+
+    result = calculate_mean_speed_between_points(dataframe)
+
+    assert result.name == 'mean_speed'
+    np.testing.assert_allclose(result, expected, rtol=1e-12)
+    # First position, next to a missing timestamp, and no time passed
+    assert np.isnan(result.iloc[[0, 2, 3]]).all() and np.isinf(result.iloc[4])
+    assert abs(result.iloc[1] - 12.0) < 0.1
+
+
+def test_mean_speed_uses_timedelta_and_distance_columns():
+    dataframe = _positions()
+    dataframe['timedelta'] = dataframe['timestamp'].diff()
+    dataframe['distance'] = calculate_distance(dataframe)
+
+    np.testing.assert_allclose(calculate_mean_speed_between_points(dataframe),
+                               calculate_mean_speed_between_points(_positions()), rtol=1e-12)
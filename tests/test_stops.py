@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+
+from utils.find_individual_stops import _rolling_mean
+
+
+def _reference_rolling_mean(values, times, groups, window):
+    """Mean over the trailing window (t - window, t] of each group, one group at a time."""
+    means = np.empty(len(values))
+    for group in np.unique(groups):
+        rows = np.flatnonzero(groups == group)
+        starts = np.searchsorted(times[rows], times[rows] - window, side='right')
+        for row, start in zip(rows, rows[0] + starts):
+            window_values = values[start:row + 1]
+            window_values = window_values[~np.isnan(window_values)]
+            means[row] = window_values.mean() if len(window_values) else np.nan
+    return means
+
+
+@pytest.mark.parametrize('time_scale, group_codes', [
+    # Seconds apart, keyed directly
+    (1_000_000_000, np.arange(20)),
+    # A time span that would overflow a key of group and time
+    (10 ** 13, np.arange(20)),
+    # Group codes that would overflow it
+    (1_000_000_000, np.arange(20, dtype=np.int64) * 999_999_999_989),
+])
+def test_rolling_mean_keeps_groups_apart(time_scale, group_codes):
+    rng = np.random.default_rng(0)
+    n = 4_000
+    groups = np.repeat(group_codes, n // len(group_codes))
+    steps = rng.integers(0, 90, n).astype(np.int64)
+    steps[np.r_[0, np.flatnonzero(np.diff(groups)) + 1]] = 0
+    times = np.cumsum(steps) * time_scale
+    values = np.where(rng.random(n) < 0.3, 0.0, rng.uniform(0, 12, n))
+    values[rng.random(n) < 0.05] = np.nan
+
+    window = 300 * time_scale // 60
+    expected = _reference_rolling_mean(values, times, groups, window)
+    np.testing.assert_allclose(_rolling_mean(values, times, groups, window), expected, rtol=1e-9, atol=1e-9)
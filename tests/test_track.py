@@ -0,0 +1,89 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.distance import calculate_distance
+from utils.mean_speed import calculate_mean_speed_between_points
+from utils.track import Track
+
+
+def _positions(n: int = 500, seed: int = 0) -> pd.DataFrame:
+    """Positions of one vessel every 30 to 90 seconds, with speeds read as float32 as in utils.ingest.read_ais."""
+    rng = np.random.default_rng(seed)
+    seconds = np.cumsum(rng.integers(30, 90, n))
+    return pd.DataFrame({
+        'timestamp': pd.Timestamp('2024-01-01', tz='Atlantic/Faroe') + pd.to_timedelta(seconds, unit='s'),
+        'latitude': 62 + np.cumsum(rng.normal(0, 0.002, n)),
+        'longitude': -7 + np.cumsum(rng.normal(0, 0.004, n)),
+        'speed': rng.uniform(0, 12, n).astype(np.float32),
+    })
+
+
+def _arrays(track: Track) -> list:
+    return [track.times, track.latitudes, track.longitudes, track.speeds]
+
+
+def test_slices_and_windows_are_views():
+    track = Track.from_dataframe(_positions(), 'Vessel')
+
+    part = track[100:200]
+    assert len(part) == 100 and part.vessel == 'Vessel' and part.tz == track.tz
+    assert all(np.shares_memory(sliced, array) for sliced, array in zip(_arrays(part), _arrays(track)))
+    np.testing.assert_array_equal(part.latitudes, track.latitudes[100:200])
+
+    start, end = track.timestamps[100], track.timestamps[200]
+    window = track.window(start, end)
+    np.testing.assert_array_equal(window.times, part.times)
+    assert all(np.shares_memory(sliced, array) for sliced, array in zip(_arrays(window), _arrays(track)))
+
+    # Naive times are in the time zone of the track
+    naive = track.window(start.tz_localize(None), end.tz_localize(None))
+    np.testing.assert_array_equal(naive.times, part.times)
+
+
+def test_slice_with_step_is_a_contiguous_copy():
+    track = Track.from_dataframe(_positions(), 'Vessel')
+
+    part = track[10:400:3]
+    np.testing.assert_array_equal(part.times, track.times[10:400:3])
+    np.testing.assert_array_equal(part.speeds, track.speeds[10:400:3])
+    for sliced, array in zip(_arrays(part), _arrays(track)):
+        assert sliced.flags['C_CONTIGUOUS'] and not np.shares_memory(sliced, array)
+
+
+def test_slices_must_keep_time_order():
+    track = Track.from_dataframe(_positions(10))
+    with pytest.raises(TypeError):
+        track[3]
+    with pytest.raises(ValueError):
+        track[::-1]
+
+
+def test_distances_match_calculate_distance():
+    dataframe = _positions()
+    track = Track.from_dataframe(dataframe)
+
+    np.testing.assert_allclose(track.distances(), calculate_distance(dataframe).to_numpy(), rtol=1e-12)
+    np.testing.assert_allclose(track[50:150].distances()[1:], track.distances()[51:150], rtol=1e-12)
+    assert np.isnan(track[50:150].distances()[0])
+
+
+def test_mean_speeds_match_calculate_mean_speed():
+    dataframe = _positions()
+    # Two positions at the same time give an infinite speed
+    dataframe.loc[20, 'timestamp'] = dataframe.loc[19, 'timestamp']
+    track = Track.from_dataframe(dataframe)
+
+    result = track.mean_speeds()
+    np.testing.assert_allclose(result, calculate_mean_speed_between_points(dataframe).to_numpy(), rtol=1e-12)
+    assert np.isnan(result[0]) and np.isinf(result[20])
+
+
+def test_speed_methods_need_speeds():
+    track = Track.from_dataframe(_positions().drop(columns='speed'))
+    assert track.speeds is None
+
+    with pytest.raises(ValueError, match='Track has no speeds'):
+        track.stop_runs()
+    with pytest.raises(ValueError, match='Track has no speeds'):
+        track.speed_group_hours(np.arange(0.5, 15, 0.5))
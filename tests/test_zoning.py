@@ -0,0 +1,182 @@
+import numpy as np
+import pandas as pd
+import pytest
+import shapely
+from shapely.geometry import Point
+
+from zoning import catalog
+from zoning.grid import BOUNDARY, OUTSIDE
+from zoning.track import classify_track
+from zoning.zoning import ZoneAssigner
+
+# Squares a and b overlap in [61, 62] x [-7, -6], where a comes first, and triangle c has a diagonal edge.
+# Coordinates are (latitude, longitude) as in the zone files.
+_POLYGONS = {
+    'a': [(60, -8), (62, -8), (62, -6), (60, -6)],
+    'b': [(61, -7), (63, -7), (63, -5), (61, -5)],
+    'c': [(58, -4), (60, -4), (58, -2)],
+}
+
+# Points inside, in the overlap, exactly on edges and vertices, outside and missing, with the zone they are in
+_EDGE_POINTS = [
+    ((60.5, -7.5), 'a'),
+    ((61.5, -6.5), 'a'),   # overlap, the first polygon wins
+    ((62.5, -5.5), 'b'),
+    ((62.0, -6.5), 'b'),   # on the edge of a, inside b
+    ((61.0, -6.5), 'a'),   # on the edge of b, inside a
+    ((62.0, -6.0), 'b'),   # vertex of a, inside b
+    ((61.0, -7.0), 'a'),   # vertex of b, inside a
+    ((60.0, -7.0), None),  # outer edge of a
+    ((63.0, -5.0), None),  # outer vertex of b
+    ((59.0, -3.0), None),  # on the diagonal edge of c
+    ((58.5, -3.5), 'c'),
+    ((50.0, 0.0), None),
+    ((np.nan, np.nan), None),
+]
+
+
+@pytest.fixture(autouse=True)
+def zone_catalog(tmp_path, monkeypatch):
+    """Compile layers into a temporary cache rather than the zones directory."""
+    monkeypatch.setattr(catalog, '_catalog', catalog.ZoneCatalog(str(tmp_path / 'zone_cache')))
+
+
+@pytest.fixture
+def overlapping_zones(tmp_path) -> str:
+    """One-file layer of the _POLYGONS, grouped by the 'zone' column in name order."""
+    rows = [{'zone': name, 'latitude': latitude, 'longitude': longitude}
+            for name, points in _POLYGONS.items() for latitude, longitude in points]
+    path = tmp_path / 'zones.csv'
+    pd.DataFrame(rows).to_csv(path, index=False)
+    return str(path)
+
+
+def _points(latitudes, longitudes) -> pd.DataFrame:
+    return pd.DataFrame({'latitude': np.asarray(latitudes, dtype=np.float64),
+                         'longitude': np.asarray(longitudes, dtype=np.float64)})
+
+
+def _lattice_points(n: int = 3000, seed: int = 0) -> pd.DataFrame:
+    """Random points on a quarter-degree lattice over the _POLYGONS, so many land exactly on edges and vertices."""
+    rng = np.random.default_rng(seed)
+    return _points(rng.integers(57 * 4, 64 * 4, n) / 4, rng.integers(-9 * 4, -1 * 4, n) / 4)
+
+
+def _near_boundary_points(layer, n: int = 2000, seed: int = 0) -> pd.DataFrame:
+    """Points on and just off the boundaries of a layer's polygons, and its vertices."""
+    rng = np.random.default_rng(seed)
+    boundaries = shapely.boundary(layer.geometries)
+    lines = boundaries[rng.integers(0, len(boundaries), n)]
+    on_boundary = shapely.line_interpolate_point(lines, rng.random(n), normalized=True)
+
+    offsets = rng.choice([0, 1e-9, 1e-6, 1e-3], size=(n, 2)) * rng.choice([-1, 1], size=(n, 2))
+    coordinates = shapely.get_coordinates(on_boundary) + offsets
+    vertices = np.concatenate([shapely.get_coordinates(geometry)[:50] for geometry in layer.geometries])
+    coordinates = np.concatenate([coordinates, vertices])
+
+    return _points(coordinates[:, 0], coordinates[:, 1])
+
+
+def _labels(series: pd.Series) -> list:
+    return [None if pd.isna(label) else label for label in series]
+
+
+def test_vectorized_matches_row_wise_on_edges_and_overlap(overlapping_zones):
+    dataframe = _points(*zip(*(point for point, _ in _EDGE_POINTS)))
+    assigner = ZoneAssigner(dataframe, overlapping_zones)
+
+    expected = [zone for _, zone in _EDGE_POINTS]
+    assert _labels(assigner.assign_zones('zone', vectorized=False)) == expected
+    assert _labels(assigner.assign_zones('zone')) == expected
+
+
+def test_vectorized_matches_row_wise_on_lattice(overlapping_zones):
+    assigner = ZoneAssigner(_lattice_points(), overlapping_zones)
+    assert _labels(assigner.assign_zones('zone')) == _labels(assigner.assign_zones('zone', vectorized=False))
+
+
+def test_vectorized_matches_row_wise_near_eez_boundaries():
+    layer = catalog.get_catalog().layer('eez_zones')
+    assigner = ZoneAssigner(_near_boundary_points(layer), 'eez_zones')
+    assert _labels(assigner.assign_zones()) == _labels(assigner.assign_zones(vectorized=False))
+
+
+def test_bitmask_reports_every_containing_polygon(overlapping_zones):
+    dataframe = pd.concat([_points(*zip(*(point for point, _ in _EDGE_POINTS))), _lattice_points(500)])
+    layer = catalog.get_catalog().layer(overlapping_zones, 'zone')
+
+    expected = [sum(1 << k for k, polygon in enumerate(layer.geometries) if Point(latitude, longitude).within(polygon))
+                for latitude, longitude in zip(dataframe['latitude'], dataframe['longitude'])]
+    masks = layer.index.bitmask(dataframe['latitude'], dataframe['longitude'])
+
+    assert masks.tolist() == expected
+
+
+@pytest.mark.parametrize('resolution', [0.25, 0.3])
+def test_grid_matches_exact_near_edges(overlapping_zones, resolution):
+    # A resolution of 0.25 puts cell edges on the polygon edges, 0.3 cuts across them
+    dataframe = pd.concat([_points(*zip(*(point for point, _ in _EDGE_POINTS))), _lattice_points()])
+    layer = catalog.get_catalog().layer(overlapping_zones, 'zone')
+    cell_labels = layer.grid(resolution).lookup(dataframe['latitude'].to_numpy(), dataframe['longitude'].to_numpy())
+    assert (cell_labels == BOUNDARY).any() and (cell_labels == OUTSIDE).any() and (cell_labels >= 0).any()
+
+    assigner = ZoneAssigner(dataframe, overlapping_zones)
+    assert _labels(assigner.assign_zones('zone', grid_resolution=resolution)) == _labels(assigner.assign_zones('zone'))
+
+
+def test_grid_matches_exact_near_eez_boundaries():
+    layer = catalog.get_catalog().layer('eez_zones')
+    rng = np.random.default_rng(1)
+
+    # Points near the boundaries fall in boundary cells, the random ones mostly in zone and outside cells
+    dataframe = pd.concat([_near_boundary_points(layer), _points(rng.uniform(-80, 85, 5000),
+                                                                 rng.uniform(-180, 180, 5000))])
+    cell_labels = layer.grid(0.1).lookup(dataframe['latitude'].to_numpy(), dataframe['longitude'].to_numpy())
+    assert (cell_labels == BOUNDARY).any() and (cell_labels == OUTSIDE).any() and (cell_labels >= 0).any()
+
+    assigner = ZoneAssigner(dataframe, 'eez_zones')
+    assert _labels(assigner.assign_zones(grid_resolution=0.1)) == _labels(assigner.assign_zones())
+
+
+def _crossing_track() -> pd.DataFrame:
+    """
+    A vessel steaming north through a, the overlap and b, then jumping across a time gap into c and back out.
+
+    The edges at latitude 60, 61, 62 and 63 are crossed between anchors, one position lands exactly on an edge.
+    """
+    north = _points(np.linspace(59, 63.5, 451), np.full(451, -6.5))
+    jump = _points(np.linspace(58.2, 58.9, 40), np.linspace(-3.9, -3.0, 40))
+    back = _points(np.linspace(61.5, 61.5, 20), np.linspace(-9, -6.5, 20))
+    return pd.concat([north, jump, back], ignore_index=True)
+
+
+def test_track_mode_matches_exact_across_boundaries_and_gaps(overlapping_zones):
+    dataframe = _crossing_track()
+    assert (dataframe['latitude'] == 60.0).any()
+
+    assigner = ZoneAssigner(dataframe, overlapping_zones)
+    expected = _labels(assigner.assign_zones('zone', track=False))
+    assert set(expected) == {None, 'a', 'b', 'c'}
+    assert _labels(assigner.assign_zones('zone', track=True)) == expected
+    assert _labels(assigner.assign_zones('zone', track=True, grid_resolution=0.25)) == expected
+
+
+@pytest.mark.parametrize('anchor_step', [1, 7, 32])
+def test_classify_track_matches_exact_without_adjacency(overlapping_zones, anchor_step):
+    dataframe = _crossing_track()
+    layer = catalog.get_catalog().layer(overlapping_zones, 'zone')
+    latitudes, longitudes = dataframe['latitude'].to_numpy(), dataframe['longitude'].to_numpy()
+
+    codes = classify_track(latitudes, longitudes, layer.index, layer.grid(0.1), anchor_step)
+    np.testing.assert_array_equal(codes, layer.index.classify(latitudes, longitudes))
+
+
+def test_track_mode_matches_exact_on_ais_tracks():
+    from benchmarks.generators import ais_tracks
+
+    # Synthetic tracks cross the real EEZ boundaries and have gaps of 30 minutes to 2 hours
+    dataframe = ais_tracks(50_000, 2, seed=4)
+    assigner = ZoneAssigner(dataframe, 'eez_zones')
+    expected = _labels(assigner.assign_zones(track=False))
+    assert len(set(expected)) > 2
+    assert _labels(assigner.assign_zones(track=True)) == expected
@@ -43,10 +43,12 @@ def find_trip_arrivals(input_df: pd.DataFrame, vessel_name: str or list[str]) ->
     return input_df
 
 
-def find_trips_nor(year: int, vessel_name: str or list[str]) -> pd.DataFrame:
+def find_trips_nor(year: int, vessel_name: str or list[str], arrivals_path: str = None,
+                   departures_path: str = None) -> pd.DataFrame:
+    # The year's ERS arrival (POR) and departure (DEP) files, unless other files are given
     path = [
-        fr"C:\Program Files (x86)\Fishfacts\catch\norway\ers\elektronisk-rapportering-ers-{year}-ankomstmelding-por.csv",
-        fr"C:\Program Files (x86)\Fishfacts\catch\norway\ers\elektronisk-rapportering-ers-{year}-avgangsmelding-dep.csv"
+        arrivals_path or fr"C:\Program Files (x86)\Fishfacts\catch\norway\ers\elektronisk-rapportering-ers-{year}-ankomstmelding-por.csv",
+        departures_path or fr"C:\Program Files (x86)\Fishfacts\catch\norway\ers\elektronisk-rapportering-ers-{year}-avgangsmelding-dep.csv"
     ]
 
     # read departures and arrivals
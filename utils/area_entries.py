@@ -1,5 +1,10 @@
+import numpy as np
 import pandas as pd
-from shapely.geometry import Point, Polygon
+import shapely
+from shapely.geometry import Polygon
+
+from zoning.catalog import get_catalog
+from zoning.track import classify_track
 
 
 def get_entry_exit_times(dataframe: pd.DataFrame, area: pd.DataFrame) -> pd.DataFrame:
@@ -18,7 +23,9 @@ def get_entry_exit_times(dataframe: pd.DataFrame, area: pd.DataFrame) -> pd.Data
     polygon = Polygon(area[['latitude', 'longitude']].values)
 
     # Determine which points are inside the polygon
-    is_inside = dataframe[['latitude', 'longitude']].apply(lambda x: Point(x).within(polygon), axis=1)
+    is_inside = pd.Series(
+        shapely.contains_xy(polygon, dataframe['latitude'].to_numpy(), dataframe['longitude'].to_numpy()),
+        index=dataframe.index)
 
     # Identify changes in the 'is_inside' status
     inside_change = is_inside.ne(is_inside.shift()).cumsum()
@@ -37,3 +44,117 @@ def get_entry_exit_times(dataframe: pd.DataFrame, area: pd.DataFrame) -> pd.Data
     result_df['elapsed_time'] = result_df['exit_time'] - result_df['entry_time']
 
     return result_df
+
+
+def get_zone_events(dataframe: pd.DataFrame, zones: str = 'eez_zones', group_name: str = None,
+                    vessel_column: str = 'vessel_name', track: bool = True,
+                    crossing_times: bool = False) -> pd.DataFrame:
+    """
+    Return every visit of every vessel to every zone of a zone layer.
+
+    Positions are classified once against the layer, sorted by vessel and time, and consecutive positions of one
+    vessel with the same zone code are run-length encoded into one event.
+
+    :param dataframe: AIS DataFrame with 'timestamp', 'latitude' and 'longitude' columns and optionally a vessel
+                      column. The frame is not modified.
+    :param zones: layer key from zoning.catalog.LAYERS, or a directory/CSV file of zone polygons
+    :param group_name: column to group polygons by in one-file sources (e.g. 'factory')
+    :param vessel_column: column identifying the vessel, the whole frame is one vessel when it is missing
+    :param track: classify along the sorted tracks with zoning.track.classify_track, which skips most exact tests
+    :param crossing_times: use the time the track crosses the zone boundary, interpolated linearly between the
+                           positions on either side, as entry and exit time instead of the first and last position in
+                           the zone. Tracks are taken to run straight between positions. Entries at the start and
+                           exits at the end of a vessel's track keep the time of the position.
+    :return: DataFrame with columns vessel_column, 'zone', 'entry_time', 'exit_time', 'duration' and 'n_points'
+    """
+    layer = get_catalog().layer(zones, group_name)
+
+    # Order positions by vessel and time, leaving the caller's frame untouched
+    if vessel_column in dataframe.columns:
+        vessel_codes, vessels = pd.factorize(dataframe[vessel_column])
+    else:
+        vessel_codes, vessels = np.zeros(len(dataframe), dtype=np.intp), pd.Index([None])
+    timestamps = dataframe['timestamp'].to_numpy()
+    latitudes = dataframe['latitude'].to_numpy(dtype=np.float64)
+    longitudes = dataframe['longitude'].to_numpy(dtype=np.float64)
+
+    # Exports concatenated per vessel are usually sorted already, which saves the sort
+    same_vessel = vessel_codes[1:] == vessel_codes[:-1]
+    is_sorted = np.all((vessel_codes[1:] > vessel_codes[:-1]) | (same_vessel & (timestamps[1:] >= timestamps[:-1])))
+    if not is_sorted:
+        order = np.lexsort((timestamps, vessel_codes))
+        latitudes, longitudes = latitudes[order], longitudes[order]
+        vessel_codes, timestamps = vessel_codes[order], timestamps[order]
+
+    if track:
+        codes = classify_track(latitudes, longitudes, layer.index, layer.grid(), adjacency=layer.adjacency)
+    else:
+        codes = layer.index.classify(latitudes, longitudes)
+
+    # Run-length encode zone codes per vessel
+    run_start = np.ones(len(codes), dtype=bool)
+    run_start[1:] = (codes[1:] != codes[:-1]) | (vessel_codes[1:] != vessel_codes[:-1])
+    starts = np.flatnonzero(run_start)
+    ends = np.append(starts[1:], len(codes)) - 1
+
+    # Runs outside every zone are not events
+    in_zone = codes[starts] >= 0
+    starts, ends = starts[in_zone], ends[in_zone]
+
+    events = pd.DataFrame({
+        vessel_column: vessels.take(vessel_codes[starts]),
+        'zone': layer.index.labels(codes[starts]),
+        'entry_time': timestamps[starts],
+        'exit_time': timestamps[ends],
+        'n_points': ends - starts + 1,
+    })
+
+    if crossing_times:
+        entry_times, exit_times = _crossing_times(layer.index, latitudes, longitudes, timestamps, vessel_codes, codes,
+                                                  starts, ends)
+        events['entry_time'] = events['entry_time'].where(entry_times.isna(), entry_times)
+        events['exit_time'] = events['exit_time'].where(exit_times.isna(), exit_times)
+    events['duration'] = events['exit_time'] - events['entry_time']
+
+    return events[[vessel_column, 'zone', 'entry_time', 'exit_time', 'duration', 'n_points']]
+
+
+def _crossing_times(index, latitudes: np.ndarray, longitudes: np.ndarray, timestamps: np.ndarray,
+                    vessel_codes: np.ndarray, codes: np.ndarray, starts: np.ndarray,
+                    ends: np.ndarray) -> tuple[pd.Series, pd.Series]:
+    """Boundary-crossing entry and exit times of the runs [starts, ends], NaT where there is no crossing to use."""
+    n = len(codes)
+
+    # Only the segments into and out of each run change zone, and only those within one vessel's track count
+    entering = np.flatnonzero((starts > 0) & (vessel_codes[np.maximum(starts - 1, 0)] == vessel_codes[starts]))
+    leaving = np.flatnonzero((ends < n - 1) & (vessel_codes[np.minimum(ends + 1, n - 1)] == vessel_codes[ends]))
+    segment_start = np.concatenate([starts[entering] - 1, ends[leaving]])
+    segment_end = segment_start + 1
+    is_entry = np.arange(len(segment_start)) < len(entering)
+
+    segment, polygon, fraction = index.boundary_crossings(latitudes[segment_start], longitudes[segment_start],
+                                                          latitudes[segment_end], longitudes[segment_end])
+
+    # The zone changes where the segment crosses the boundary of the zone it leaves or the zone it enters
+    relevant = (polygon == codes[segment_start][segment]) | (polygon == codes[segment_end][segment])
+    segment, fraction = segment[relevant], fraction[relevant]
+
+    # Entries happen at the last crossing along the segment, exits at the first
+    last = np.full(len(segment_start), -np.inf)
+    first = np.full(len(segment_start), np.inf)
+    np.maximum.at(last, segment, fraction)
+    np.minimum.at(first, segment, fraction)
+    crossing = np.where(is_entry, last, first)
+    crossed = np.isfinite(crossing)
+
+    start_times = pd.DatetimeIndex(timestamps[segment_start[crossed]])
+    end_times = pd.DatetimeIndex(timestamps[segment_end[crossed]])
+    times = pd.Series(pd.NaT, index=range(len(segment_start)), dtype=start_times.dtype)
+    times[crossed] = start_times + (end_times - start_times) * crossing[crossed]
+
+    entry_times = pd.Series(pd.NaT, index=range(len(starts)), dtype=times.dtype)
+    exit_times = pd.Series(pd.NaT, index=range(len(starts)), dtype=times.dtype)
+    entry_times.iloc[entering] = times[is_entry].to_numpy()
+    exit_times.iloc[leaving] = times[~is_entry].to_numpy()
+
+    return entry_times, exit_times
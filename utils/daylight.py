@@ -1,22 +1,261 @@
-from pandas import DataFrame, Series, to_datetime
-from astral.sun import elevation
-from astral import LocationInfo
+import numpy as np
+import pandas as pd
+from pandas import DataFrame, Series
 
+# Solar elevation (degrees) at which each daylight period starts, sunrise/sunset is at -0.833 like in astral
+DAY_ELEVATION = -0.833
+CIVIL_TWILIGHT_ELEVATION = -6
+NAUTICAL_TWILIGHT_ELEVATION = -12
+ASTRONOMICAL_TWILIGHT_ELEVATION = -18
 
-def calculate_daylight(dataframe: DataFrame) -> Series:
+DAYLIGHT_PERIODS = ['night', 'twilight', 'day']
+DETAILED_DAYLIGHT_PERIODS = ['night', 'astronomical_twilight', 'nautical_twilight', 'civil_twilight', 'day']
+
+_NS_PER_DAY = 86_400 * 10 ** 9
+_UNIX_EPOCH_JULIAN_DAY = 2440587.5
+
+
+def solar_elevation(latitudes, longitudes, timestamps, with_refraction: bool = True) -> np.ndarray:
+    """
+    Calculate the solar elevation for arrays of positions and times with the NOAA solar position algorithm.
+
+    This is the algorithm astral uses, evaluated on whole arrays at once.
+
+    :param latitudes: array-like of latitudes in degrees
+    :param longitudes: array-like of longitudes in degrees
+    :param timestamps: array-like of timestamps, naive timestamps are taken to be UTC as in astral
+    :param with_refraction: adjust the elevation for atmospheric refraction
+    :return: float64 array of solar elevations in degrees, NaN where a value is missing
+    """
+    latitudes = np.clip(np.asarray(latitudes, dtype=np.float64), -89.8, 89.8)
+    longitudes = np.asarray(longitudes, dtype=np.float64)
+    nanoseconds, missing = _utc_nanoseconds(timestamps)
+
+    # Julian century since J2000.0
+    julian_day = nanoseconds / _NS_PER_DAY + _UNIX_EPOCH_JULIAN_DAY
+    t = (julian_day - 2451545.0) / 36525.0
+
+    geom_mean_long_sun = np.radians((280.46646 + t * (36000.76983 + 0.0003032 * t)) % 360)
+    geom_mean_anomaly_sun = np.radians(357.52911 + t * (35999.05029 - 0.0001537 * t))
+    eccentricity = 0.016708634 - t * (0.000042037 + 0.0000001267 * t)
+
+    equation_of_center = np.radians(np.sin(geom_mean_anomaly_sun) * (1.914602 - t * (0.004817 + 0.000014 * t))
+                                    + np.sin(2 * geom_mean_anomaly_sun) * (0.019993 - 0.000101 * t)
+                                    + np.sin(3 * geom_mean_anomaly_sun) * 0.000289)
+    true_long_sun = geom_mean_long_sun + equation_of_center
+
+    omega = np.radians(125.04 - 1934.136 * t)
+    apparent_long_sun = true_long_sun - np.radians(0.00569 + 0.00478 * np.sin(omega))
+
+    seconds = 21.448 - t * (46.815 + t * (0.00059 - t * 0.001813))
+    mean_obliquity = 23.0 + (26.0 + seconds / 60.0) / 60.0
+    obliquity = np.radians(mean_obliquity + 0.00256 * np.cos(omega))
+
+    declination = np.arcsin(np.sin(obliquity) * np.sin(apparent_long_sun))
+
+    # Equation of time in minutes
+    y = np.tan(obliquity / 2) ** 2
+    equation_of_time = 4 * np.degrees(y * np.sin(2 * geom_mean_long_sun)
+                                      - 2 * eccentricity * np.sin(geom_mean_anomaly_sun)
+                                      + 4 * eccentricity * y * np.sin(geom_mean_anomaly_sun)
+                                      * np.cos(2 * geom_mean_long_sun)
+                                      - 0.5 * y * y * np.sin(4 * geom_mean_long_sun)
+                                      - 1.25 * eccentricity * eccentricity * np.sin(2 * geom_mean_anomaly_sun))
+
+    # True solar time in minutes and the hour angle of the sun
+    utc_minutes = (nanoseconds % _NS_PER_DAY) / 60e9
+    true_solar_time = (utc_minutes + equation_of_time + 4.0 * longitudes) % 1440
+    hour_angle = np.radians(true_solar_time / 4.0 - 180.0)
+
+    phi = np.radians(latitudes)
+    cos_zenith = np.sin(phi) * np.sin(declination) + np.cos(phi) * np.cos(declination) * np.cos(hour_angle)
+    elevations = 90.0 - np.degrees(np.arccos(np.clip(cos_zenith, -1.0, 1.0)))
+
+    if with_refraction:
+        elevations += _refraction(elevations)
+
+    elevations[missing] = np.nan
+
+    return elevations
+
+
+class SolarElevationCache:
+    """
+    Memoized solar elevations keyed on rounded position and time bucket.
+
+    Elevations are computed once per (latitude, longitude, time) bucket, at the bucket's centre, and kept in a hashed
+    index for later lookups. Repeated queries, e.g. several analyses over the same season of AIS data or many
+    vessels in the same area, are answered without recomputation. The rounding costs accuracy: with the default
+    0.01 degree and 20 second buckets elevations differ from solar_elevation by up to about 0.08 degree, at low
+    latitudes with the sun near the horizon, which keeps them within 0.1 degree of astral. Coarser buckets give more
+    cache hits but larger errors, about 0.21 degree with 1 minute buckets.
+
+    :param position_resolution: size of the latitude/longitude buckets in degrees
+    :param time_resolution: length of the time buckets, as accepted by pandas.Timedelta
+    :param max_entries: the cache is emptied when it would grow beyond this number of buckets
+    """
+
+    def __init__(self, position_resolution: float = 0.01, time_resolution: str = '20s',
+                 max_entries: int = 50_000_000):
+        self.position_resolution = position_resolution
+        self.time_resolution = pd.Timedelta(time_resolution).value
+        self.max_entries = max_entries
+
+        self._latitude_cells = int(np.ceil(180 / position_resolution)) + 1
+        self._longitude_cells = int(np.ceil(360 / position_resolution)) + 1
+
+        self.keys = pd.Index([], dtype=np.int64)
+        self.values = np.empty(0)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def elevation(self, latitudes, longitudes, timestamps) -> np.ndarray:
+        """Return the solar elevation of the bucket of every position and time, computing only unseen buckets."""
+        latitudes = np.asarray(latitudes, dtype=np.float64)
+        longitudes = np.asarray(longitudes, dtype=np.float64)
+        nanoseconds, missing = _utc_nanoseconds(timestamps)
+        missing |= ~np.isfinite(latitudes) | ~np.isfinite(longitudes)
+
+        elevations = np.full(len(latitudes), np.nan)
+        valid = np.flatnonzero(~missing)
+        if len(valid) == 0:
+            return elevations
+        keys = self._keys(latitudes[valid], longitudes[valid], nanoseconds[valid])
+
+        # Compute the buckets that are not cached yet, once each
+        position = self.keys.get_indexer(keys)
+        new_keys = np.unique(keys[position < 0])
+
+        if len(new_keys):
+            if len(self.keys) + len(new_keys) > self.max_entries:
+                # Start over with the buckets of this query only
+                self.clear()
+                new_keys = np.unique(keys)
+
+            self.keys = self.keys.append(pd.Index(new_keys))
+            self.values = np.concatenate([self.values, self._compute(new_keys)])
+            position = self.keys.get_indexer(keys)
+
+        elevations[valid] = self.values[position]
+
+        return elevations
+
+    def clear(self) -> None:
+        """Forget all cached elevations."""
+        self.keys = pd.Index([], dtype=np.int64)
+        self.values = np.empty(0)
+
+    def _keys(self, latitudes: np.ndarray, longitudes: np.ndarray, nanoseconds: np.ndarray) -> np.ndarray:
+        latitude_cells = np.round((latitudes + 90) / self.position_resolution).astype(np.int64)
+        longitude_cells = np.round(((longitudes + 180) % 360) / self.position_resolution).astype(np.int64)
+        time_buckets = nanoseconds // self.time_resolution
+
+        cells = self._latitude_cells * self._longitude_cells
+        if len(time_buckets) and (np.abs(time_buckets).max() + 1) * cells >= 2 ** 62:
+            raise ValueError('Position and time resolution are too fine to key the cache, use coarser buckets.')
+
+        return (time_buckets * self._longitude_cells + longitude_cells) * self._latitude_cells + latitude_cells
+
+    def _compute(self, keys: np.ndarray) -> np.ndarray:
+        # Elevation at the centre of each bucket
+        latitude_cells = keys % self._latitude_cells
+        longitude_cells = (keys // self._latitude_cells) % self._longitude_cells
+        time_buckets = keys // (self._latitude_cells * self._longitude_cells)
+
+        latitudes = latitude_cells * self.position_resolution - 90
+        longitudes = longitude_cells * self.position_resolution - 180
+        timestamps = pd.to_datetime(time_buckets * self.time_resolution + self.time_resolution // 2, utc=True)
+
+        return solar_elevation(latitudes, longitudes, timestamps)
+
+
+def calculate_daylight(dataframe: DataFrame, cache: SolarElevationCache = None) -> Series:
     """
     Calculate the solar elevation for each row in the DataFrame and return a Series.
 
     :param dataframe: A DataFrame containing timestamp, latitude and longitude columns.
+    :param cache: optional SolarElevationCache to look bucketed elevations up in instead of computing every row
     :return: A Series with the solar elevation in degrees for each row in the DataFrame.
     """
-    dataframe = dataframe.copy()
+    if cache is None:
+        elevations = solar_elevation(dataframe['latitude'], dataframe['longitude'], dataframe['timestamp'])
+    else:
+        elevations = cache.elevation(dataframe['latitude'], dataframe['longitude'], dataframe['timestamp'])
+
+    return Series(elevations, index=dataframe.index)
+
+
+def calculate_daylight_period(dataframe: DataFrame, detailed: bool = False,
+                              cache: SolarElevationCache = None) -> Series:
+    """
+    Classify each row of the DataFrame as day, twilight or night from the solar elevation.
+
+    :param dataframe: A DataFrame containing timestamp, latitude and longitude columns, or a precomputed
+                      "solar_elevation" column.
+    :param detailed: split twilight into civil, nautical and astronomical twilight
+    :param cache: optional SolarElevationCache used when the elevation has to be computed
+    :return: A categorical Series with the categories of DAYLIGHT_PERIODS (DETAILED_DAYLIGHT_PERIODS when detailed),
+             ordered from night to day
+    """
+    if 'solar_elevation' in dataframe.columns:
+        elevations = dataframe['solar_elevation'].to_numpy(dtype=np.float64)
+    else:
+        elevations = calculate_daylight(dataframe, cache).to_numpy()
+
+    return Series(daylight_period(elevations, detailed), index=dataframe.index)
+
+
+def daylight_period(elevations, detailed: bool = False) -> pd.Categorical:
+    """Return the ordered daylight period of each solar elevation, missing where the elevation is missing."""
+    elevations = np.asarray(elevations, dtype=np.float64)
+
+    if detailed:
+        thresholds = [ASTRONOMICAL_TWILIGHT_ELEVATION, NAUTICAL_TWILIGHT_ELEVATION, CIVIL_TWILIGHT_ELEVATION,
+                      DAY_ELEVATION]
+        categories = DETAILED_DAYLIGHT_PERIODS
+    else:
+        thresholds = [ASTRONOMICAL_TWILIGHT_ELEVATION, DAY_ELEVATION]
+        categories = DAYLIGHT_PERIODS
+
+    codes = np.searchsorted(thresholds, elevations, side='right')
+    codes[np.isnan(elevations)] = -1
+
+    return pd.Categorical.from_codes(codes, categories=categories, ordered=True)
+
+
+def _utc_nanoseconds(timestamps) -> tuple[np.ndarray, np.ndarray]:
+    """Return nanoseconds since the Unix epoch in UTC and a mask of missing timestamps."""
+    timestamps = pd.DatetimeIndex(pd.to_datetime(timestamps, utc=True)).as_unit('ns')
+    missing = np.asarray(timestamps.isna())
+    return np.where(missing, 0, timestamps.asi8), missing
+
+
+def _refraction(elevations: np.ndarray) -> np.ndarray:
+    """Atmospheric refraction in degrees at the given true solar elevations, as in astral."""
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        te = np.tan(np.radians(elevations))
+        high = 58.1 / te - 0.07 / te ** 3 + 0.000086 / te ** 5
+        low = 1735.0 + elevations * (-518.2 + elevations * (103.4 + elevations * (-12.79 + elevations * 0.711)))
+        below = -20.774 / te
+
+    correction = np.where(elevations > 5.0, high, np.where(elevations > -0.575, low, below))
+    correction[elevations >= 85.0] = 0
+
+    return correction / 3600.0
+
 
-    def get_solar_elevation(row):
-        location = LocationInfo(latitude=row['latitude'], longitude=row['longitude'])
-        start_time = to_datetime(row['timestamp'])
-        solar_elevation = elevation(location.observer, start_time)
-        return solar_elevation
+if __name__ == '__main__':
+    # Accuracy against astral is checked in tests/test_daylight.py, this times a season of one position a minute
+    from time import time
 
-    # Apply the get_solar_elevation function to each row and return the resulting Series
-    return dataframe.apply(get_solar_elevation, axis=1)
+    season_df = DataFrame({
+        'latitude': np.full(10 ** 6, 62.0),
+        'longitude': np.full(10 ** 6, -7.0),
+        'timestamp': pd.date_range('2023-06-15', periods=10 ** 6, freq='1min'),
+    })
+    start = time()
+    season_df['solar_elevation'] = calculate_daylight(season_df)
+    season_df['daylight'] = calculate_daylight_period(season_df)
+    print(f'1M rows in {time() - start:.2f} s')
+    print(season_df['daylight'].value_counts())
@@ -1,6 +1,8 @@
-from nautical_calculations.basic import get_distance
+import numpy as np
 from pandas import DataFrame, Series
 
+from utils.geodesy import KM_TO_NM, haversine
+
 
 def calculate_distance(dataframe: DataFrame) -> Series:
     """
@@ -8,13 +10,22 @@ def calculate_distance(dataframe: DataFrame) -> Series:
     :param dataframe: A pandas DataFrame containing columns "latitude" and "longitude"
     :return: A pandas Series containing the distances in nautical miles between each row of the input data frame
     """
-    dataframe = dataframe.copy()
+    distances = segment_distances(dataframe['latitude'].to_numpy(dtype=np.float64),
+                                  dataframe['longitude'].to_numpy(dtype=np.float64))
+
+    return Series(distances, index=dataframe.index)
+
+
+def segment_distances(latitudes: np.ndarray, longitudes: np.ndarray) -> np.ndarray:
+    """
+    Calculate the distance from the previous position to every position of a track.
 
-    dataframe['previous_latitude'] = dataframe['latitude'].shift()
-    dataframe['previous_longitude'] = dataframe['longitude'].shift()
+    :param latitudes: array of latitudes in degrees
+    :param longitudes: array of longitudes in degrees
+    :return: float64 array of distances in nautical miles, NaN for the first position
+    """
+    # The first row has no previous position
+    distances = np.full(len(latitudes), np.nan)
+    distances[1:] = haversine(latitudes[1:], longitudes[1:], latitudes[:-1], longitudes[:-1]) * KM_TO_NM
 
-    return dataframe.apply(
-        lambda row: get_distance(row['latitude'],
-                                 row['longitude'],
-                                 row['previous_latitude'],
-                                 row['previous_longitude']) * 0.539956803, axis=1)  # conversion from km to nm
+    return distances
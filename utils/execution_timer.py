@@ -1,4 +1,10 @@
+import atexit
+import json
+import math
+import os
+import threading
 import time
+import tracemalloc
 from functools import wraps
 
 
@@ -37,3 +43,252 @@ def timeit(func):
         return result
     return wrapper
 
+
+class Span:
+    """
+    One timed call of a profiled block, returned by Profiler.span.
+
+    :param profiler: the profiler the span reports to
+    :param name: name of the span, nested spans are reported under their parent's path, e.g. 'assign_zones/classify'
+    """
+
+    def __init__(self, profiler, name: str):
+        self.profiler = profiler
+        self.name = name
+        self.rows = 0
+        self.path = None
+        self.start = None
+        self.memory_start = 0
+        self.memory_peak = 0
+
+    def count(self, rows: int):
+        """Add rows to the number of rows the span processed."""
+        self.rows += rows
+
+    def __enter__(self):
+        self.profiler._enter(self)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.profiler._exit(self)
+        return False
+
+
+class _DisabledSpan:
+    """Stand-in returned while profiling is off, doing nothing."""
+
+    rows = 0
+
+    def count(self, rows: int):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+_DISABLED_SPAN = _DisabledSpan()
+
+
+class Profiler:
+    """
+    Registry of timings for named, nested spans of a pipeline.
+
+    Spans are opened with the span context manager or the profile decorator. Every span path records the number of
+    calls, the total, mean and 95th percentile wall time, the rows processed and rows per second and, when memory
+    tracing is on, the peak tracemalloc memory above the memory in use when the span started.
+
+    Profiling is off until enable is called (or the FISHFACTS_PROFILE environment variable is set, its value being the
+    path of the report written at exit). While off, spans and decorated functions cost one attribute check.
+
+    Example:
+        profiler.enable(memory=True, report_path='profile.json')
+
+        @profiler.profile(rows=len)
+        def read_data(path):
+            ...
+
+        with profiler.span('assign_zones') as span:
+            span.count(len(df))
+            ...
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.memory = False
+        self._stats = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._report_path = None
+        self._registered = False
+
+        # Whether enable started tracemalloc, tracing the caller started is left running by disable
+        self._started_tracing = False
+
+    def enable(self, memory: bool = False, report_path: str = None):
+        """
+        Turn profiling on.
+
+        :param memory: trace peak memory with tracemalloc, which slows allocation-heavy code down considerably
+        :param report_path: write a report to this path at exit, JSON when it ends with '.json' and text otherwise;
+                            '-' prints the text report
+        """
+        self.enabled = True
+        self.memory = memory
+        if memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+
+        if report_path is not None:
+            self._report_path = report_path
+            if not self._registered:
+                atexit.register(self._dump_at_exit)
+                self._registered = True
+
+    def disable(self):
+        """Turn profiling off, keeping what was recorded."""
+        self.enabled = False
+        if self._started_tracing and tracemalloc.is_tracing():
+            tracemalloc.stop()
+        self._started_tracing = False
+        self.memory = False
+
+    def reset(self):
+        """Forget all recorded spans."""
+        with self._lock:
+            self._stats.clear()
+
+    def span(self, name: str):
+        """Return a context manager timing the enclosed block as span name, nested under any open span."""
+        if not self.enabled:
+            return _DISABLED_SPAN
+        return Span(self, name)
+
+    def profile(self, name: str = None, rows=None):
+        """
+        Decorator timing every call of a function as a span.
+
+        :param name: span name, the function name by default
+        :param rows: optional callable returning the number of rows processed from the function's result, e.g. len
+        """
+        def decorator(func):
+            span_name = name or func.__name__
+
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                with Span(self, span_name) as span:
+                    result = func(*args, **kwargs)
+                    if rows is not None and result is not None:
+                        span.count(rows(result))
+                return result
+            return wrapper
+        return decorator
+
+    def count(self, rows: int):
+        """Add rows to the innermost open span of the current thread, if any."""
+        if self.enabled:
+            stack = self._stack()
+            if stack:
+                stack[-1].count(rows)
+
+    def _stack(self) -> list:
+        if not hasattr(self._local, 'stack'):
+            self._local.stack = []
+        return self._local.stack
+
+    def _enter(self, span: Span):
+        stack = self._stack()
+        span.path = f'{stack[-1].path}/{span.name}' if stack else span.name
+
+        if self.memory:
+            current, peak = tracemalloc.get_traced_memory()
+            # The parent keeps the peak reached so far, then the peak is reset to measure this span alone
+            if stack:
+                stack[-1].memory_peak = max(stack[-1].memory_peak, peak)
+            tracemalloc.reset_peak()
+            span.memory_start, span.memory_peak = current, current
+
+        stack.append(span)
+        span.start = time.perf_counter()
+
+    def _exit(self, span: Span):
+        elapsed = time.perf_counter() - span.start
+        stack = self._stack()
+        stack.pop()
+
+        memory = None
+        if self.memory:
+            span.memory_peak = max(span.memory_peak, tracemalloc.get_traced_memory()[1])
+            memory = span.memory_peak - span.memory_start
+            if stack:
+                stack[-1].memory_peak = max(stack[-1].memory_peak, span.memory_peak)
+
+        with self._lock:
+            stats = self._stats.setdefault(span.path, {'calls': 0, 'times': [], 'rows': 0, 'peak_memory': None})
+            stats['calls'] += 1
+            stats['times'].append(elapsed)
+            stats['rows'] += span.rows
+            if memory is not None:
+                stats['peak_memory'] = max(stats['peak_memory'] or 0, memory)
+
+    def summary(self) -> dict:
+        """
+        Return the statistics of every span path.
+
+        :return: dict from span path to calls, total, mean and p95 seconds, rows, rows_per_second and peak_memory
+                 (bytes, None when memory was not traced), in the order the spans were first opened
+        """
+        with self._lock:
+            summary = {}
+            for path, stats in self._stats.items():
+                times = sorted(stats['times'])
+                total = sum(times)
+                summary[path] = {
+                    'calls': stats['calls'],
+                    'total': total,
+                    'mean': total / len(times),
+                    'p95': times[max(math.ceil(0.95 * len(times)) - 1, 0)],
+                    'rows': stats['rows'],
+                    'rows_per_second': stats['rows'] / total if stats['rows'] and total > 0 else None,
+                    'peak_memory': stats['peak_memory'],
+                }
+            return summary
+
+    def report(self) -> str:
+        """Return the statistics as a text table, nested spans indented under their parent."""
+        lines = [f'{"span":<40} {"calls":>7} {"total s":>10} {"mean s":>10} {"p95 s":>10} {"rows":>12} '
+                 f'{"rows/s":>12} {"peak MB":>9}']
+        for path, stats in sorted(self.summary().items()):
+            depth = path.count('/')
+            name = '  ' * depth + path.rsplit('/', 1)[-1]
+            rows_per_second = f'{stats["rows_per_second"]:.0f}' if stats['rows_per_second'] else '-'
+            memory = f'{stats["peak_memory"] / 1e6:.1f}' if stats['peak_memory'] is not None else '-'
+            lines.append(f'{name:<40} {stats["calls"]:>7} {stats["total"]:>10.4f} {stats["mean"]:>10.4f} '
+                         f'{stats["p95"]:>10.4f} {stats["rows"] or "-":>12} {rows_per_second:>12} {memory:>9}')
+        return '\n'.join(lines)
+
+    def dump(self, path: str = None):
+        """Write the report to path, JSON when it ends with '.json' and text otherwise, or print it when no path."""
+        if path is None or path == '-':
+            print(self.report())
+        elif path.endswith('.json'):
+            with open(path, 'w') as f:
+                json.dump(self.summary(), f, indent=2)
+        else:
+            with open(path, 'w') as f:
+                f.write(self.report() + '\n')
+
+    def _dump_at_exit(self):
+        if self._stats:
+            self.dump(self._report_path)
+
+
+# Shared registry used by the instrumented entry points
+profiler = Profiler()
+
+if os.environ.get('FISHFACTS_PROFILE'):
+    profiler.enable(report_path=os.environ['FISHFACTS_PROFILE'])
@@ -1,46 +1,218 @@
+import numpy as np
+import pandas as pd
 from pandas import DataFrame, Timedelta
 
+from utils.kernels import kernel
+from zoning.catalog import get_catalog
 
-def find_stops(dataframe: DataFrame, min_stop_duration_minutes: int) -> DataFrame:
-    """Find every stop a vessel makes that lasts longer than specified time in minutes."""
+# Zone layers stops are attributed to, the first one wins when a stop is equally close to both (a factory quay
+# usually lies inside a harbor polygon)
+STOP_LOCATION_LAYERS = {'factory': 'factories', 'harbor': 'harbors'}
 
-    # Speed and time threshold.
-    speed_threshold = 0.1
+
+def find_stops(dataframe: DataFrame, min_stop_duration_minutes: int, speed_threshold: float = 0.1,
+               window: str = '5min', vessel_column: str = 'vessel_name', attribute_locations: bool = True,
+               max_location_distance: float = 1.0) -> DataFrame:
+    """
+    Find every stop a vessel makes that lasts longer than specified time in minutes.
+
+    Speeds are smoothed with a trailing time window per vessel to avoid spikes in data, and every run of positions
+    whose smoothed speed is at or below the speed threshold is a stop. A stop ends at the first position after it,
+    or at the last position of the track if the vessel is still stopped there. The input frame is not modified.
+
+    :param dataframe: AIS DataFrame with 'timestamp', 'latitude', 'longitude' and 'speed' columns and optionally a
+                      vessel column
+    :param min_stop_duration_minutes: shortest stop to report
+    :param speed_threshold: highest smoothed speed in knots that counts as stopped
+    :param window: length of the smoothing window, as accepted by pandas.Timedelta
+    :param vessel_column: column identifying the vessel, the whole frame is one vessel when it is missing
+    :param attribute_locations: attribute every stop to the nearest harbor or factory polygon
+    :param max_location_distance: stops farther than this (nm) from every harbor and factory get no location
+    :return: DataFrame with one row per stop and columns 'stop_start', 'stop_end', 'duration', 'mean_latitude',
+             'mean_longitude' and 'n_points', preceded by the vessel column when there is one and followed by
+             'location', 'location_type' and 'location_distance_nm' when attributing locations
+    """
     min_stop_duration = Timedelta(minutes=min_stop_duration_minutes)
 
-    # Calculate mean rolling speed to avoid spikes in data
-    dataframe['rolling_speed'] = dataframe['speed'].rolling(window=5).mean()
+    has_vessels = vessel_column in dataframe.columns
+    if has_vessels:
+        vessel_codes, vessels = pd.factorize(dataframe[vessel_column])
+    else:
+        vessel_codes, vessels = np.zeros(len(dataframe), dtype=np.intp), pd.Index([None])
+    timestamps = pd.DatetimeIndex(dataframe['timestamp'])
+    times = timestamps.as_unit('us').asi8
+    speeds = dataframe['speed'].to_numpy(dtype=np.float64)
+    latitudes = dataframe['latitude'].to_numpy(dtype=np.float64)
+    longitudes = dataframe['longitude'].to_numpy(dtype=np.float64)
+
+    # Positions without a timestamp cannot be placed in a window, the rest is ordered by vessel and time
+    rows = np.flatnonzero(~timestamps.isna())
+    order = rows[np.lexsort((times[rows], vessel_codes[rows]))]
+    vessel_codes, times, speeds = vessel_codes[order], times[order], speeds[order]
+    latitudes, longitudes, timestamps = latitudes[order], longitudes[order], timestamps[order]
+
+    starts, lasts = stop_runs(speeds, times, vessel_codes, Timedelta(window).value // 1000, speed_threshold)
+
+    # The stop lasts until the vessel's next position, if there is one
+    same_vessel = vessel_codes[1:] == vessel_codes[:-1]
+    has_next = np.append(same_vessel, False)[lasts]
+    ends = np.where(has_next, lasts + 1, lasts)
+
+    durations = timestamps[ends] - timestamps[starts]
+    long_enough = np.asarray(durations >= min_stop_duration)
+    starts, lasts, ends = starts[long_enough], lasts[long_enough], ends[long_enough]
+
+    stops = DataFrame({
+        'stop_start': timestamps[starts],
+        'stop_end': timestamps[ends],
+        'duration': durations[long_enough],
+        'mean_latitude': _run_mean(latitudes, starts, lasts),
+        'mean_longitude': _run_mean(longitudes, starts, lasts),
+        'n_points': lasts - starts + 1,
+    })
+    if has_vessels:
+        stops.insert(0, vessel_column, vessels.take(vessel_codes[starts]))
+
+    if attribute_locations:
+        locations, location_types, location_distances = attribute_stop_locations(
+            stops['mean_latitude'].to_numpy(), stops['mean_longitude'].to_numpy(), max_location_distance)
+        stops['location'] = locations
+        stops['location_type'] = location_types
+        stops['location_distance_nm'] = location_distances
+
+    return stops
+
+
+def attribute_stop_locations(latitudes: np.ndarray, longitudes: np.ndarray,
+                             max_distance: float = 1.0) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Find the nearest harbor or factory polygon of each position.
+
+    :param latitudes: array of latitudes
+    :param longitudes: array of longitudes
+    :param max_distance: positions farther than this (nm) from every polygon get no location
+    :return: tuple of object arrays with the location name and type ('factory' or 'harbor', None when there is no
+             location) and a float array with the distance to the nearest polygon in nm, 0 inside a polygon
+    """
+    locations = np.full(len(latitudes), None, dtype=object)
+    location_types = np.full(len(latitudes), None, dtype=object)
+    location_distances = np.full(len(latitudes), np.inf)
+
+    for location_type, layer_name in STOP_LOCATION_LAYERS.items():
+        layer = get_catalog().layer(layer_name)
+        codes, distances = layer.proximity.nearest(latitudes, longitudes)
+
+        closer = (codes >= 0) & (distances < location_distances)
+        locations[closer] = layer.index.labels(codes[closer])
+        location_types[closer] = location_type
+        location_distances[closer] = distances[closer]
+
+    too_far = ~(location_distances <= max_distance)
+    locations[too_far] = None
+    location_types[too_far] = None
+    location_distances[~np.isfinite(location_distances)] = np.nan
+
+    return locations, location_types, location_distances
+
+
+def _stop_runs_loop(speeds: np.ndarray, times: np.ndarray, groups: np.ndarray, window: int,
+                    speed_threshold: float) -> tuple:
+    n = len(speeds)
+    starts = np.empty(n, dtype=np.int64)
+    lasts = np.empty(n, dtype=np.int64)
+    if n == 0:
+        return starts, lasts
+
+    # Prefix sums as in _rolling_mean, so the means are bit for bit the same
+    sums = np.zeros(n + 1)
+    counts = np.zeros(n + 1, dtype=np.int64)
+    for i in range(n):
+        valid = not np.isnan(speeds[i])
+        sums[i + 1] = sums[i] + (speeds[i] if valid else 0.0)
+        counts[i + 1] = counts[i] + valid
+
+    runs = 0
+    window_start = 0
+    stopped = False
+    for i in range(n):
+        new_group = i == 0 or groups[i] != groups[i - 1]
+        if new_group:
+            window_start = i
+        while times[window_start] <= times[i] - window:
+            window_start += 1
+
+        previous_stopped = stopped and not new_group
+        stopped = (sums[i + 1] - sums[window_start]) / (counts[i + 1] - counts[window_start]) <= speed_threshold
+        if stopped and previous_stopped:
+            lasts[runs - 1] = i
+        elif stopped:
+            starts[runs], lasts[runs] = i, i
+            runs += 1
+
+    return starts[:runs], lasts[:runs]
+
+
+@kernel(_stop_runs_loop)
+def stop_runs(speeds: np.ndarray, times: np.ndarray, groups: np.ndarray, window: int,
+              speed_threshold: float) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Find the runs of positions where a vessel is stopped, i.e. its speed smoothed over a trailing time window is at
+    or below the threshold.
+
+    :param speeds: float64 array of speeds, sorted by group and time
+    :param times: int64 array of times
+    :param groups: integer array of group (vessel) codes
+    :param window: length of the trailing window (t - window, t], in the unit of times
+    :param speed_threshold: highest smoothed speed that counts as stopped
+    :return: tuple of int64 arrays with the first and the last position of every run
+    """
+    is_stopped = _rolling_mean(speeds, times, groups, window) <= speed_threshold
+
+    # Run-length encode stopped positions per group
+    same_group = groups[1:] == groups[:-1]
+    continues = np.append(is_stopped[:-1] & is_stopped[1:] & same_group, False)
+    starts = np.flatnonzero(is_stopped & ~np.append(False, continues[:-1]))
+    lasts = np.flatnonzero(is_stopped & ~continues)
+
+    return starts.astype(np.int64), lasts.astype(np.int64)
 
-    # Find all rows that are below or equal to speed threshold.
-    dataframe['is_stopped'] = dataframe['rolling_speed'] <= speed_threshold
 
-    # Find starts and stops of port stops.
-    dataframe['stop_start'] = (dataframe['is_stopped'] & ~dataframe['is_stopped'].shift(1).fillna(False))
-    dataframe['stop_end'] = (~dataframe['is_stopped'] & dataframe['is_stopped'].shift(1).fillna(False))
+def _rolling_mean(values: np.ndarray, times: np.ndarray, groups: np.ndarray, window: int) -> np.ndarray:
+    """Mean of the non-missing values in the trailing window (t - window, t] of the same group, for sorted data."""
+    if len(values) == 0:
+        return np.empty(0)
 
-    # Find index of every stop and start of port stops.
-    stop_starts = dataframe[dataframe['stop_start']].index
-    stop_ends = dataframe[dataframe['stop_end']].index
+    # Groups numbered 0, 1, 2, ... in order, whatever their codes
+    group_ranks = np.concatenate([[0], np.cumsum(groups[1:] != groups[:-1])])
 
-    stops = []
+    span = int(times.max()) - int(times.min())
+    if (int(group_ranks[-1]) + 1) * (span + window + 1) < 2 ** 63:
+        # One sortable key for group and time, with groups further apart than any window
+        keys = group_ranks * (span + window + 1) + (times - times.min())
+        window_starts = np.searchsorted(keys, keys - window, side='right')
+    else:
+        # The key above would overflow, rank the times instead so it stays below n², the window then starts at the
+        # first position of the group later than t - window
+        unique_times, time_ranks = np.unique(times, return_inverse=True)
+        stride = len(unique_times) + 1
+        keys = group_ranks * stride + time_ranks
+        window_ranks = np.searchsorted(unique_times, times - window, side='right')
+        window_starts = np.searchsorted(keys, group_ranks * stride + window_ranks, side='left')
 
-    for start, end in zip(stop_starts, stop_ends):
-        # Calculate duration of the stop
-        stop_duration = dataframe.loc[end, 'timestamp'] - dataframe.loc[start, 'timestamp']
+    valid = ~np.isnan(values)
+    sums = np.concatenate([[0.0], np.cumsum(np.where(valid, values, 0.0))])
+    counts = np.concatenate([[0], np.cumsum(valid)])
+    window_ends = np.arange(1, len(values) + 1)
 
-        if stop_duration >= min_stop_duration:
-            mean_lat = dataframe.loc[start:end, 'latitude'].mean()
-            mean_lon = dataframe.loc[start:end, 'longitude'].mean()
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return (sums[window_ends] - sums[window_starts]) / (counts[window_ends] - counts[window_starts])
 
-            # Only keep stop that are longer than x minutes
-            stops.append({
-                'stop_start': dataframe.loc[start, 'timestamp'],
-                'stop_end': dataframe.loc[end, 'timestamp'],
-                'duration': stop_duration,
-                'mean_latitude': mean_lat,
-                'mean_longitude': mean_lon
-            })
 
-    stops_df = DataFrame(stops)
+def _run_mean(values: np.ndarray, starts: np.ndarray, lasts: np.ndarray) -> np.ndarray:
+    """Mean of the non-missing values of each run [start, last]."""
+    valid = ~np.isnan(values)
+    sums = np.concatenate([[0.0], np.cumsum(np.where(valid, values, 0.0))])
+    counts = np.concatenate([[0], np.cumsum(valid)])
 
-    return stops_df
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return (sums[lasts + 1] - sums[starts]) / (counts[lasts + 1] - counts[starts])
@@ -0,0 +1,144 @@
+import numpy as np
+
+# Mean earth radius, as used by nautical_calculations.basic.get_distance
+EARTH_RADIUS_KM = 6371
+
+# Unit conversions from kilometres
+KM_TO_NM = 0.539956803
+KM_TO_M = 1000
+
+EARTH_RADIUS_NM = EARTH_RADIUS_KM * KM_TO_NM
+
+# Number of pairs processed at a time, small enough for the temporaries to stay in cache
+_BLOCK_SIZE = 65_536
+
+
+def haversine(latitude1, longitude1, latitude2, longitude2, radius: float = EARTH_RADIUS_KM):
+    """
+    Calculate the great-circle distance between pairs of coordinates.
+
+    :param latitude1: latitude(s) of the first points in degrees
+    :param longitude1: longitude(s) of the first points in degrees
+    :param latitude2: latitude(s) of the second points in degrees
+    :param longitude2: longitude(s) of the second points in degrees
+    :param radius: earth radius, which sets the unit of the result (km by default, EARTH_RADIUS_NM for nm)
+    :return: distances with the broadcast shape of the inputs (a float for scalar inputs), NaN where a coordinate is
+             missing
+    """
+    latitude1, longitude1, latitude2, longitude2, shape = _flatten(latitude1, longitude1, latitude2, longitude2)
+    distances = np.empty(len(latitude1))
+
+    for start in range(0, len(latitude1), _BLOCK_SIZE):
+        stop = start + _BLOCK_SIZE
+        phi1 = np.radians(latitude1[start:stop])
+        phi2 = np.radians(latitude2[start:stop])
+
+        # sin²(Δλ/2) · cos φ1 · cos φ2, computed in place to keep the number of temporaries down
+        a = np.radians(longitude2[start:stop] - longitude1[start:stop])
+        a *= 0.5
+        np.sin(a, out=a)
+        a *= a
+        a *= np.cos(phi1)
+        a *= np.cos(phi2)
+
+        # + sin²(Δφ/2)
+        half_delta = np.subtract(phi2, phi1, out=phi2)
+        half_delta *= 0.5
+        np.sin(half_delta, out=half_delta)
+        half_delta *= half_delta
+        a += half_delta
+
+        # 2R · asin(√a), clipped against rounding just above 1 for antipodal points
+        np.sqrt(a, out=a)
+        np.minimum(a, 1, out=a)
+        np.arcsin(a, out=a)
+        a *= 2 * radius
+        distances[start:stop] = a
+
+    return _reshape(distances, shape)
+
+
+def initial_bearing(latitude1, longitude1, latitude2, longitude2):
+    """
+    Calculate the initial great-circle bearing from the first to the second points.
+
+    :return: bearings in degrees clockwise from north in [0, 360), with the broadcast shape of the inputs
+    """
+    latitude1, longitude1, latitude2, longitude2, shape = _flatten(latitude1, longitude1, latitude2, longitude2)
+    phi1, phi2 = np.radians(latitude1), np.radians(latitude2)
+    delta_lambda = np.radians(longitude2 - longitude1)
+
+    y = np.sin(delta_lambda) * np.cos(phi2)
+    x = np.cos(phi1) * np.sin(phi2) - np.sin(phi1) * np.cos(phi2) * np.cos(delta_lambda)
+
+    return _reshape(np.degrees(np.arctan2(y, x)) % 360, shape)
+
+
+def destination_point(latitude, longitude, bearing, distance, radius: float = EARTH_RADIUS_KM):
+    """
+    Calculate the point reached by following a great circle from a start point with a given initial bearing.
+
+    :param latitude: start latitude(s) in degrees
+    :param longitude: start longitude(s) in degrees
+    :param bearing: initial bearing(s) in degrees clockwise from north
+    :param distance: distance(s) travelled, in the unit of radius (km by default)
+    :param radius: earth radius
+    :return: tuple of (latitudes, longitudes) in degrees, longitudes normalised to [-180, 180)
+    """
+    latitude, longitude, bearing, distance, shape = _flatten(latitude, longitude, bearing, distance)
+    phi1, lambda1, theta = np.radians(latitude), np.radians(longitude), np.radians(bearing)
+    delta = distance / radius
+
+    sin_phi2 = np.sin(phi1) * np.cos(delta) + np.cos(phi1) * np.sin(delta) * np.cos(theta)
+    phi2 = np.arcsin(np.clip(sin_phi2, -1, 1))
+    lambda2 = lambda1 + np.arctan2(np.sin(theta) * np.sin(delta) * np.cos(phi1),
+                                   np.cos(delta) - np.sin(phi1) * sin_phi2)
+
+    longitude2 = (np.degrees(lambda2) + 180) % 360 - 180
+
+    return _reshape(np.degrees(phi2), shape), _reshape(longitude2, shape)
+
+
+def intermediate_point(latitude1, longitude1, latitude2, longitude2, fraction):
+    """
+    Calculate the point a fraction of the way along the great circle from the first to the second points.
+
+    :param fraction: fraction(s) of the distance travelled, 0 at the first and 1 at the second points
+    :return: tuple of (latitudes, longitudes) in degrees with the broadcast shape of the inputs, longitudes in
+             [-180, 180]
+    """
+    latitude1, longitude1, latitude2, longitude2, fraction, shape = _flatten(latitude1, longitude1, latitude2,
+                                                                             longitude2, fraction)
+    phi1, lambda1 = np.radians(latitude1), np.radians(longitude1)
+    phi2, lambda2 = np.radians(latitude2), np.radians(longitude2)
+
+    # Unit vectors of both points
+    x1, y1, z1 = np.cos(phi1) * np.cos(lambda1), np.cos(phi1) * np.sin(lambda1), np.sin(phi1)
+    x2, y2, z2 = np.cos(phi2) * np.cos(lambda2), np.cos(phi2) * np.sin(lambda2), np.sin(phi2)
+
+    # Angle between them from the cross and dot products, accurate for the short steps between AIS positions
+    cross = np.sqrt((y1 * z2 - z1 * y2) ** 2 + (z1 * x2 - x1 * z2) ** 2 + (x1 * y2 - y1 * x2) ** 2)
+    delta = np.arctan2(cross, x1 * x2 + y1 * y2 + z1 * z2)
+
+    # Spherical linear interpolation, which becomes linear as the points coincide
+    sin_delta = np.sin(delta)
+    moving = sin_delta > 0
+    divisor = np.where(moving, sin_delta, 1)
+    a = np.where(moving, np.sin((1 - fraction) * delta) / divisor, 1 - fraction)
+    b = np.where(moving, np.sin(fraction * delta) / divisor, fraction)
+
+    x, y, z = a * x1 + b * x2, a * y1 + b * y2, a * z1 + b * z2
+    latitude = np.degrees(np.arctan2(z, np.hypot(x, y)))
+    longitude = np.degrees(np.arctan2(y, x))
+
+    return _reshape(latitude, shape), _reshape(longitude, shape)
+
+
+def _flatten(*arrays) -> tuple:
+    """Broadcast the inputs to float64 arrays of one shape and return them flattened, followed by that shape."""
+    arrays = np.broadcast_arrays(*(np.asarray(array, dtype=np.float64) for array in arrays))
+    return (*(np.ravel(array) for array in arrays), arrays[0].shape)
+
+
+def _reshape(values: np.ndarray, shape: tuple):
+    return values.reshape(shape) if shape else float(values[0])
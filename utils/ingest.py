@@ -0,0 +1,157 @@
+import importlib.util
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+# Sidecar formats: uncompressed Feather is memory-mapped on read, Parquet is smaller on disk
+SIDECAR_FORMATS = ('feather', 'parquet')
+
+# Version of the sidecar layout, sidecars written with another one are rebuilt
+_VERSION = 1
+
+# Schema metadata key recording the source a sidecar was converted from
+_METADATA_KEY = b'fishfacts_source'
+
+_COMPACT_FLOATS = ('latitude', 'longitude', 'speed')
+
+
+def arrow_available() -> bool:
+    """Return whether pyarrow, which reads and writes the sidecars, is installed."""
+    return importlib.util.find_spec('pyarrow') is not None
+
+
+def read_ais(path: str, sidecar: str = 'feather', zero_copy: bool = False, refresh: bool = False) -> pd.DataFrame:
+    """
+    Read a Fishfacts AIS export (.xlsx, .xls or .csv) through a columnar sidecar file.
+
+    The first read parses the export, compacts its columns (see compact_ais) and writes them to a sidecar next to
+    it, later reads load the sidecar instead. The sidecar records the size and modification time of the export and
+    is rebuilt when either changes. Without pyarrow, or when the folder is not writable, the export is parsed every
+    time.
+
+    :param path: path of the AIS export
+    :param sidecar: sidecar format from SIDECAR_FORMATS
+    :param zero_copy: return the numeric columns as read-only views of the sidecar's data (of the memory-mapped file
+                      for Feather) instead of copies, for code that does not modify the frame in place
+    :param refresh: rebuild the sidecar even when it is up to date
+    :return: DataFrame with the columns of the export
+    """
+    if sidecar not in SIDECAR_FORMATS:
+        raise ValueError(f'Unknown sidecar format {sidecar!r}, expected one of {SIDECAR_FORMATS}.')
+
+    stat = os.stat(path)
+    source = {'version': _VERSION, 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+    if not arrow_available():
+        return compact_ais(_read_export(path))
+
+    cache_path = sidecar_path(path, sidecar)
+    if not refresh:
+        dataframe = _read_sidecar(cache_path, sidecar, source, zero_copy)
+        if dataframe is not None:
+            return dataframe
+
+    dataframe = compact_ais(_read_export(path))
+    _write_sidecar(cache_path, sidecar, source, dataframe)
+    return dataframe
+
+
+def compact_ais(dataframe: pd.DataFrame) -> pd.DataFrame:
+    """
+    Convert the AIS columns of a frame to compact types, leaving the other columns as they are.
+
+    'timestamp' becomes datetime64[ns] (int64 nanoseconds), 'latitude', 'longitude' and 'speed' float32 and
+    'heading' int16 when all headings are whole numbers, float32 otherwise. float32 keeps coordinates to about a
+    metre.
+    """
+    columns = {}
+    if 'timestamp' in dataframe.columns:
+        timestamps = pd.to_datetime(dataframe['timestamp'])
+        columns['timestamp'] = timestamps.dt.as_unit('ns')
+    for name in _COMPACT_FLOATS:
+        if name in dataframe.columns:
+            columns[name] = dataframe[name].astype(np.float32)
+    if 'heading' in dataframe.columns:
+        heading = dataframe['heading'].to_numpy(dtype=np.float64)
+        whole = (np.isfinite(heading).all() and np.array_equal(heading, np.round(heading))
+                 and np.abs(heading).max(initial=0) <= np.iinfo(np.int16).max)
+        columns['heading'] = dataframe['heading'].astype(np.int16 if whole else np.float32)
+
+    return dataframe.assign(**columns)
+
+
+def sidecar_path(path: str, sidecar: str = 'feather') -> str:
+    """Return the path of the sidecar of an AIS export, a hidden file in the same folder."""
+    directory, name = os.path.split(os.path.abspath(path))
+    return os.path.join(directory, f'.{name}.{sidecar}')
+
+
+def _read_export(path: str) -> pd.DataFrame:
+    if path.lower().endswith('.csv'):
+        return pd.read_csv(path)
+    return pd.read_excel(path)
+
+
+def _read_sidecar(cache_path: str, sidecar: str, source: dict, zero_copy: bool) -> pd.DataFrame | None:
+    """Load a sidecar, returning None when it is missing, unreadable or out of date."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    try:
+        if sidecar == 'feather':
+            # The schema comes first, the columns are only read from the memory map when the sidecar is current
+            reader = pa.ipc.open_file(pa.memory_map(cache_path))
+            if not _is_current(reader.schema, source):
+                return None
+            table = reader.read_all()
+        else:
+            if not _is_current(pq.read_schema(cache_path), source):
+                return None
+            table = pq.read_table(cache_path, memory_map=True)
+    except (OSError, pa.ArrowInvalid):
+        return None
+
+    # Numeric columns are read-only views of the Arrow buffers, copied unless the caller will not modify them
+    dataframe = table.to_pandas(split_blocks=True)
+    return dataframe if zero_copy else dataframe.copy()
+
+
+def _is_current(schema, source: dict) -> bool:
+    metadata = schema.metadata or {}
+    try:
+        return json.loads(metadata.get(_METADATA_KEY, b'null')) == source
+    except ValueError:
+        return False
+
+
+def _write_sidecar(cache_path: str, sidecar: str, source: dict, dataframe: pd.DataFrame):
+    """Write a sidecar, replacing any previous one atomically."""
+    import pyarrow as pa
+    import pyarrow.feather as feather
+    import pyarrow.parquet as pq
+
+    tmp_path = f'{cache_path}.{os.getpid()}.tmp'
+    try:
+        table = pa.Table.from_pandas(dataframe, preserve_index=False)
+        table = table.replace_schema_metadata({**(table.schema.metadata or {}),
+                                               _METADATA_KEY: json.dumps(source).encode('utf-8')})
+        if sidecar == 'feather':
+            feather.write_feather(table, tmp_path, compression='uncompressed')
+        else:
+            pq.write_table(table, tmp_path)
+        os.replace(tmp_path, cache_path)
+    except (OSError, pa.ArrowException):
+        # A read-only folder, or a column Arrow cannot store, only costs parsing the export again next time
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+r"""
+# EXAMPLE
+if __name__ == '__main__':
+    path = r"C:\Users\tokit\OneDrive\Desktop\Sild_23_24\AIS\Faroe Islands\Raw\vessel_9_Finnur Fríði_20231015T0000-20240101T0000.xlsx"
+    df = read_ais(path)  # parses the export and writes .vessel_9_Finnur Fríði_....xlsx.feather next to it
+    df = read_ais(path)  # reads the sidecar
+    print(df.dtypes)
+"""
@@ -0,0 +1,89 @@
+import importlib.util
+import os
+from functools import wraps
+
+# Backends a kernel can run on: vectorized NumPy, or the kernel's plain loop compiled by numba
+BACKENDS = ('numpy', 'numba')
+
+_backend = None
+
+# Helper functions called from loop implementations, registered with numba before the first kernel is compiled
+_jitable = []
+
+
+def numba_available() -> bool:
+    """Return whether numba is installed."""
+    return importlib.util.find_spec('numba') is not None
+
+
+def get_backend() -> str:
+    """
+    Return the backend kernels run on.
+
+    Unless set with set_backend, it is taken from the FISHFACTS_KERNELS environment variable, and otherwise 'numba'
+    when numba is installed and 'numpy' when it is not.
+    """
+    global _backend
+    if _backend is None:
+        set_backend(os.environ.get('FISHFACTS_KERNELS') or ('numba' if numba_available() else 'numpy'))
+    return _backend
+
+
+def set_backend(name: str):
+    """
+    Select the backend all kernels run on.
+
+    :param name: 'numpy' or 'numba'
+    """
+    global _backend
+    if name not in BACKENDS:
+        raise ValueError(f'Unknown kernel backend {name!r}, expected one of {BACKENDS}.')
+    if name == 'numba' and not numba_available():
+        raise ImportError('The numba kernel backend needs numba, install it or use the numpy backend.')
+    _backend = name
+
+
+def jitable(func):
+    """
+    Decorator for helper functions that loop implementations call, e.g. a formula shared with the NumPy version.
+
+    The function stays an ordinary Python function and is compiled along with the kernels calling it.
+    """
+    _jitable.append(func)
+    return func
+
+
+def kernel(loop):
+    """
+    Decorator turning a NumPy function into a kernel that runs either it or an equivalent plain loop.
+
+    The loop version takes the same arguments and returns the same result, written as explicit loops over arrays so
+    numba can compile it. It is compiled on its first call with the numba backend and cached on disk.
+
+    :param loop: loop implementation of the decorated function
+    """
+    def decorator(vectorized):
+        compiled = []
+
+        @wraps(vectorized)
+        def dispatch(*args):
+            if get_backend() == 'numpy':
+                return vectorized(*args)
+            if not compiled:
+                compiled.append(_compile(loop))
+            return compiled[0](*args)
+
+        dispatch.vectorized = vectorized
+        dispatch.loop = loop
+        return dispatch
+    return decorator
+
+
+def _compile(loop):
+    from numba import njit
+    from numba.extending import register_jitable
+
+    while _jitable:
+        register_jitable(_jitable.pop())
+
+    return njit(cache=True, nogil=True, error_model='numpy')(loop)
@@ -0,0 +1,105 @@
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+
+from utils.geodesy import KM_TO_NM, haversine, initial_bearing
+
+# Number of segments processed at a time, small enough for the temporaries to stay in cache
+_BLOCK_SIZE = 65_536
+
+_NS_PER_HOUR = 3.6e12
+
+
+def calculate_kinematics(dataframe: DataFrame, vessel_column: str = 'vessel_name') -> DataFrame:
+    """
+    Calculate the kinematics of every segment between consecutive positions of each vessel in one pass.
+
+    Every value belongs to the segment arriving at a row, so the first row of each vessel has NaN (NaT) everywhere,
+    the same convention as calculate_distance. Acceleration and turn rate compare the segment with the one before
+    it and are NaN for the first two rows of each vessel.
+
+    The columns are read as NumPy arrays and the segments processed in blocks written straight into the result
+    columns, so apart from the result only a few block-sized temporaries (and an ordering array when the rows of a
+    vessel are not contiguous) are allocated.
+
+    :param dataframe: DataFrame with 'timestamp', 'latitude' and 'longitude', sorted by time within each vessel
+    :param vessel_column: column identifying the vessel, the whole frame is one vessel when it is missing
+    :return: DataFrame with the index of the input and the columns
+             timedelta: time since the previous position (timedelta64)
+             distance: great-circle distance from the previous position in nautical miles
+             mean_speed: distance / time in knots, NaN when no time passed
+             acceleration: change of mean_speed from the previous segment in knots per minute
+             bearing: initial bearing from the previous position in degrees, NaN when the vessel did not move
+             turn_rate: change of bearing from the previous segment along the shorter arc in degrees per minute
+    """
+    n = len(dataframe)
+    latitudes = dataframe['latitude'].to_numpy(dtype=np.float64)
+    longitudes = dataframe['longitude'].to_numpy(dtype=np.float64)
+    timestamps = pd.DatetimeIndex(pd.to_datetime(dataframe['timestamp'], utc=True)).as_unit('ns')
+    nanoseconds, missing_times = timestamps.asi8, np.asarray(timestamps.isna())
+
+    if vessel_column in dataframe.columns:
+        vessel_codes, _ = pd.factorize(dataframe[vessel_column])
+        order = _vessel_order(vessel_codes)
+    else:
+        vessel_codes, order = None, None
+
+    timedelta = np.full(n, np.iinfo(np.int64).min, dtype=np.int64)
+    distance, mean_speed, acceleration, bearing, turn_rate = (np.full(n, np.nan) for _ in range(5))
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for start in range(1, n, _BLOCK_SIZE):
+            stop = min(start + _BLOCK_SIZE, n)
+
+            # Rows of the block and the previous row of the same vessel, as slices when rows are already grouped
+            if order is None:
+                current, previous = slice(start, stop), slice(start - 1, stop - 1)
+            else:
+                current, previous = order[start:stop], order[start - 1:stop - 1]
+
+            valid = ~missing_times[current] & ~missing_times[previous]
+            if vessel_codes is not None:
+                valid &= vessel_codes[current] == vessel_codes[previous]
+
+            steps = np.where(valid, nanoseconds[current] - nanoseconds[previous], np.iinfo(np.int64).min)
+            hours = np.where(valid, steps / _NS_PER_HOUR, np.nan)
+            timedelta[current] = steps
+
+            lat, lon = latitudes[current], longitudes[current]
+            previous_lat, previous_lon = latitudes[previous], longitudes[previous]
+            segment_distance = np.where(valid, haversine(previous_lat, previous_lon, lat, lon) * KM_TO_NM, np.nan)
+            segment_speed = np.where(hours > 0, segment_distance / hours, np.nan)
+            segment_bearing = np.where(segment_distance > 0, initial_bearing(previous_lat, previous_lon, lat, lon),
+                                       np.nan)
+
+            distance[current] = segment_distance
+            mean_speed[current] = segment_speed
+            bearing[current] = segment_bearing
+
+            # The previous segment is in the result already, from this block or the one before it
+            minutes = hours * 60
+            acceleration[current] = (segment_speed - mean_speed[previous]) / minutes
+            turn_rate[current] = ((segment_bearing - bearing[previous] + 180) % 360 - 180) / minutes
+
+    return DataFrame({'timedelta': timedelta.view('timedelta64[ns]'), 'distance': distance, 'mean_speed': mean_speed,
+                      'acceleration': acceleration, 'bearing': bearing, 'turn_rate': turn_rate},
+                     index=dataframe.index, copy=False)
+
+
+def _vessel_order(vessel_codes: np.ndarray) -> np.ndarray | None:
+    """Return the row order that groups each vessel's rows keeping their order, None when they are grouped already."""
+    changes = np.count_nonzero(vessel_codes[1:] != vessel_codes[:-1])
+    if changes <= len(np.unique(vessel_codes)) - 1:
+        return None
+    return np.argsort(vessel_codes, kind='stable')
+
+
+r"""
+# EXAMPLE
+if __name__ == '__main__':
+    from utils.ingest import read_ais
+    path = r"C:\Users\tokit\OneDrive\Desktop\Rapportir\Sæson rapportir\Makrelur 2023\AIS\Iceland\Raw\vessel_313_Jón Kjartansson SU111_20230615T0000-20230915T0000.xlsx"
+    df = read_ais(path)
+    kinematics = calculate_kinematics(df)
+    print(kinematics.describe())
+"""
@@ -1,5 +1,11 @@
+import os
+
+import numpy as np
+import pandas as pd
 from pandas import DataFrame, Series
-from utils.distance import calculate_distance
+from utils.distance import segment_distances
+
+_NS_PER_HOUR = 3.6e12
 
 
 def calculate_mean_speed_between_points(dataframe: DataFrame) -> Series:
@@ -8,22 +14,44 @@ def calculate_mean_speed_between_points(dataframe: DataFrame) -> Series:
 
     :param dataframe: A pandas DataFrame containing columns "timedelta" and "distance"
     :return: A pandas Series with mean speed in knots
+
+    For all segment kinematics of several vessels at once, use utils.kinematics.calculate_kinematics.
     """
 
-    dataframe = dataframe.copy()
+    # Use the columns when they are there, without copying the frame to add them
+    if 'distance' in dataframe.columns:
+        distances = dataframe['distance'].to_numpy(dtype=np.float64)
+    else:
+        distances = segment_distances(dataframe['latitude'].to_numpy(dtype=np.float64),
+                                      dataframe['longitude'].to_numpy(dtype=np.float64))
+
+    if 'timedelta' in dataframe.columns:
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mean_speed = distances / (dataframe['timedelta'].dt.total_seconds().to_numpy(dtype=np.float64) / 3600)
+    else:
+        mean_speed = mean_speeds(pd.DatetimeIndex(dataframe['timestamp']).as_unit('ns').asi8, distances)
 
-    # Check if necessary columns are in input data frame
-    if 'timedelta' not in dataframe.columns:
-        dataframe['timedelta'] = dataframe['timestamp'].diff()
+    return Series(mean_speed, index=dataframe.index, name='mean_speed')
 
-    if 'distance' not in dataframe.columns:
-        dataframe['distance'] = calculate_distance(dataframe)
 
-    dataframe['timedelta'] = (dataframe['timedelta'].dt.total_seconds() / 3600)
-    dataframe['mean_speed'] = dataframe['distance'] / dataframe['timedelta']
+def mean_speeds(times: np.ndarray, distances: np.ndarray) -> np.ndarray:
+    """
+    Calculate the mean speed over the segment leading up to every position of a track.
+
+    :param times: int64 array of times in nanoseconds, the minimum int64 (NaT) where missing
+    :param distances: array of distances in nautical miles from the previous position, as from segment_distances
+    :return: float64 array of speeds in knots, NaN for the first position and next to missing times, inf where no
+             time passed
+    """
+    hours = np.full(len(times), np.nan)
+    hours[1:] = np.diff(times) / _NS_PER_HOUR
+
+    missing = times == np.iinfo(np.int64).min
+    hours[1:][missing[1:] | missing[:-1]] = np.nan
 
-    return dataframe['mean_speed']
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return distances / hours
 
 
 if __name__ == '__main__':
-    print(f'Run {str(__file__).split('\\')[-1]}')
+    print(f'Run {os.path.basename(__file__)}')
@@ -1,53 +1,146 @@
+import numpy as np
+import pandas as pd
 from pandas import Series
 
+from utils.geodesy import initial_bearing
+from utils.kernels import kernel
 
-def replace_heading_error(heading_values: Series) -> Series:
+# AIS code for "heading not available"
+HEADING_NOT_AVAILABLE = 511
+
+
+def replace_heading_error(heading_values: Series, latitudes: Series = None, longitudes: Series = None,
+                          vessel_ids: Series = None) -> Series:
     """
     Fix heading error code 511 by adding values in a linear fashion between the non-error points
 
+    Headings are interpolated along the shorter arc, so a gap between 350 and 10 passes through 0 and not 180.
+    Leading and trailing gaps take the first and last valid heading. Missing values (NaN) are treated like 511.
+
     :params:
         heading_values as integers
+        latitudes, longitudes: optional positions of the same rows. Missing headings of rows where the vessel moved
+            are then filled with the course over ground from the previous position (the next one for a track's first
+            row) instead, interpolation is only used where the vessel did not move.
+        vessel_ids: optional vessel of every row, gaps are never filled across two vessels' tracks
 
     Returns:
         heading_values_fixed (pandas Series):
-            Series of integers with fixed headings
+            Series of integers with fixed headings, 511 where a vessel has no valid heading at all
 
     Example:
         Input:  [349, 336, 511, 511, 511, 511, 511, 174, 174]
         Output: [349, 336, 309, 282, 255, 228, 201, 174, 174]
+
+        Input:  [350, 511, 511, 511, 10]
+        Output: [350, 355, 0, 5, 10]
+    """
+    values = heading_values.to_numpy(dtype=np.float64)
+    n = len(values)
+    missing = (values == HEADING_NOT_AVAILABLE) | np.isnan(values)
+    if vessel_ids is None:
+        groups = np.zeros(n, dtype=np.intp)
+    else:
+        groups, _ = pd.factorize(vessel_ids)
+
+    filled, fillable = fill_heading_gaps(values, missing, groups)
+
+    if latitudes is not None and longitudes is not None:
+        course, moved = _course_over_ground(latitudes.to_numpy(dtype=np.float64),
+                                            longitudes.to_numpy(dtype=np.float64), groups)
+        filled = np.where(moved, course, filled)
+        fillable |= missing & moved
+
+    heading_values_fixed = values.copy()
+    heading_values_fixed[fillable] = np.round(filled[fillable]) % 360
+    heading_values_fixed[missing & ~fillable] = HEADING_NOT_AVAILABLE
+
+    return Series(heading_values_fixed.astype(np.int64), index=heading_values.index, name=heading_values.name)
+
+
+def _fill_heading_gaps_loop(values: np.ndarray, missing: np.ndarray, groups: np.ndarray) -> tuple:
+    n = len(values)
+    filled = np.full(n, np.nan)
+    fillable = np.zeros(n, dtype=np.bool_)
+
+    # Nearest valid heading before every row in a forward pass, after it in a backward pass
+    left = np.empty(n, dtype=np.int64)
+    last = -1
+    for i in range(n):
+        if not missing[i]:
+            last = i
+        left[i] = last
+
+    right = n
+    for i in range(n - 1, -1, -1):
+        if not missing[i]:
+            right = i
+            continue
+
+        left_ok = left[i] >= 0 and groups[left[i]] == groups[i]
+        right_ok = right < n and groups[right] == groups[i]
+        if left_ok and right_ok:
+            arc = (values[right] - values[left[i]] + 180) % 360 - 180
+            filled[i] = values[left[i]] + arc * ((i - left[i]) / (right - left[i]))
+        elif left_ok:
+            filled[i] = values[left[i]]
+        elif right_ok:
+            filled[i] = values[right]
+        fillable[i] = left_ok or right_ok
+
+    return filled, fillable
+
+
+@kernel(_fill_heading_gaps_loop)
+def fill_heading_gaps(values: np.ndarray, missing: np.ndarray, groups: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
     """
-    heading_values_fixed = heading_values.copy()  # Make a copy to avoid modifying the original Series
+    Interpolate headings across gaps of missing values along the shorter arc, within each group.
+
+    :param values: float64 array of headings in degrees
+    :param missing: bool array, True where the heading is missing
+    :param groups: integer array of group (vessel) codes, gaps are never filled across two groups
+    :return: tuple of the filled headings (NaN where not fillable, not yet rounded or wrapped to [0, 360)) and a bool
+             array of the missing rows that could be filled
+    """
+    n = len(values)
+
+    # Nearest valid heading before and after every row, within the same vessel's track
+    positions = np.arange(n)
+    left = np.maximum.accumulate(np.where(missing, -1, positions))
+    right = np.minimum.accumulate(np.where(missing, n, positions)[::-1])[::-1]
+    left_ok = (left >= 0) & (groups[np.maximum(left, 0)] == groups)
+    right_ok = (right < n) & (groups[np.minimum(right, n - 1)] == groups)
+    left_values, right_values = values[np.maximum(left, 0)], values[np.minimum(right, n - 1)]
 
-    # Find indices with error values
-    error_indices = heading_values_fixed[heading_values_fixed == 511].index
+    # Signed difference along the shorter arc, in [-180, 180)
+    arc = (right_values - left_values + 180) % 360 - 180
+    with np.errstate(invalid='ignore', divide='ignore'):
+        proportion = (positions - left) / (right - left)
 
-    # Replace error values using linear interpolation
-    for index in error_indices:
-        left_index = index - 1
-        right_index = index + 1
+    fillable = missing & (left_ok | right_ok)
+    filled = np.where(left_ok & right_ok, left_values + arc * proportion,
+                      np.where(left_ok, left_values, right_values))
 
-        # Find the nearest correct values
-        while heading_values_fixed.iloc[left_index] == 511:
-            left_index -= 1
-        while right_index < len(heading_values_fixed) and heading_values_fixed.iloc[right_index] == 511:
-            right_index += 1
+    return np.where(fillable, filled, np.nan), fillable
 
-        # Perform linear interpolation
-        left_value = heading_values_fixed.iloc[left_index]
 
-        if right_index != len(heading_values_fixed):
-            right_value = heading_values_fixed.iloc[right_index]
-        else:
-            back_index = left_index
-            while back_index == 511:
-                back_index -= 1
-            right_value = heading_values_fixed.iloc[back_index]
+def _course_over_ground(latitudes: np.ndarray, longitudes: np.ndarray,
+                        groups: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Course over ground of every row from its previous position, and whether the vessel moved to get there."""
+    n = len(latitudes)
+    course = np.full(n, np.nan)
+    if n < 2:
+        return course, np.zeros(n, dtype=bool)
 
-        difference = right_index - left_index
+    segment_course = initial_bearing(latitudes[:-1], longitudes[:-1], latitudes[1:], longitudes[1:])
+    segment_moved = (groups[:-1] == groups[1:]) & ((latitudes[:-1] != latitudes[1:])
+                                                   | (longitudes[:-1] != longitudes[1:]))
+    segment_moved &= np.isfinite(segment_course)
 
-        for i in range(left_index + 1, right_index):
-            proportion = (i - left_index) / difference
-            interpolated_value = round(left_value + (right_value - left_value) * proportion)
-            heading_values_fixed.iloc[i] = interpolated_value
+    # Row i takes the segment arriving at it, the first row of a track the segment leaving it
+    course[1:] = np.where(segment_moved, segment_course, np.nan)
+    first_of_track = np.append(True, groups[1:] != groups[:-1])[:-1]
+    leaving = np.flatnonzero(first_of_track & segment_moved)
+    course[leaving] = segment_course[leaving]
 
-    return heading_values_fixed
+    return course, ~np.isnan(course)
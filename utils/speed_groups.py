@@ -1,6 +1,10 @@
 from math import ceil
-from pandas import DataFrame, cut
+from pandas import DataFrame
 import numpy as np
+import pandas as pd
+
+# Time steps of this many hours or more are gaps in the track and do not count towards any speed (15 min)
+MAX_TIME_STEP_HOURS = 0.25
 
 
 def speed_groups(dataframe: DataFrame, interval: float) -> DataFrame:
@@ -11,36 +15,114 @@ def speed_groups(dataframe: DataFrame, interval: float) -> DataFrame:
     :param interval:
     :return:
     """
+    # The frame is neither copied nor sorted, speed_group_hours works on its columns as arrays
+    timestamps = pd.DatetimeIndex(pd.to_datetime(dataframe['timestamp'])).as_unit('ns')
+    speeds = dataframe['speed'].to_numpy(dtype=np.float64)
 
-    dataframe.sort_values(by='timestamp', inplace=True)
+    # Find top speed and create bins
+    top_speed = ceil(np.nanmax(speeds))
+    speed_bins = np.arange(0.5, top_speed, interval)
 
-    # Find top speed
-    top_speed = ceil(dataframe['speed'].max())
+    hours = speed_group_hours(timestamps.asi8, speeds, speed_bins)
 
-    # Create bins
-    speed_bins = np.arange(0.5, top_speed, interval)
+    bins = pd.CategoricalIndex(pd.IntervalIndex.from_breaks(speed_bins, closed='left'), name='speed_group')
+    return pd.Series(hours, index=bins, name='time_diff')
+
+
+def speed_group_hours(times: np.ndarray, speeds: np.ndarray, speed_bins: np.ndarray) -> np.ndarray:
+    """
+    Sum the hours a track spent in each speed group.
+
+    The time step leading up to a position counts towards the speed at that position, steps of MAX_TIME_STEP_HOURS
+    or more are gaps and not counted.
+
+    :param times: int64 array of times in nanoseconds in any order, the minimum int64 (NaT) where missing
+    :param speeds: array of speeds in knots
+    :param speed_bins: edges of the left-closed speed groups
+    :return: float64 array with the hours spent in every group
+    """
+    missing = times == np.iinfo(np.int64).min
+    if missing.any():
+        times, speeds = times[~missing], speeds[~missing]
+
+    # Sorting is skipped for tracks in time order, the usual case
+    if np.any(times[1:] < times[:-1]):
+        order = np.argsort(times, kind='stable')
+        times, speeds = times[order], speeds[order]
+
+    n_bins = max(len(speed_bins) - 1, 0)
+    hours = np.diff(times) / 3.6e12
+    speed_codes = np.searchsorted(speed_bins, speeds[1:], side='right') - 1
+    counted = (hours < MAX_TIME_STEP_HOURS) & (speed_codes >= 0) & (speed_codes < n_bins)
 
-    # Cut dataframe by speed bins and calculate the time spent in that speed
-    dataframe['speed_group'] = cut(dataframe['speed'], bins=speed_bins, right=False)
-    dataframe['time_diff'] = dataframe['timestamp'].diff().dt.total_seconds() / 3600
-    dataframe = dataframe[dataframe['time_diff'] < 0.25]  # Filter out large time gaps (15 min)
-    dataframe.dropna(subset=['time_diff'], inplace=True)
+    return np.bincount(speed_codes[counted], weights=hours[counted], minlength=n_bins)
 
-    # Sum time spent in each speed bin by grouping
-    time_spent_in_each_group = dataframe.groupby('speed_group')['time_diff'].sum()
 
-    return time_spent_in_each_group
+def speed_profiles(dataframe: DataFrame, interval: float, max_speed: float = None, min_speed: float = 0.5,
+                   vessel_column: str = 'vessel_name') -> DataFrame:
+    """
+    Return the hours and percentage of time every vessel of a fleet spent in each speed group.
+
+    All vessels share the same speed bins, so the rows can be compared with each other, e.g. as input for clustering.
+    As in speed_groups, the time step leading up to a position counts towards the speed at that position and steps
+    of 15 minutes or more are left out.
+
+    :param dataframe: DataFrame with 'timestamp', 'speed' and vessel_column, in any order
+    :param interval: width of the speed bins in knots
+    :param max_speed: upper end of the last bin, by default the top speed of the fleet rounded up
+    :param min_speed: lower end of the first bin, slower positions are not counted
+    :param vessel_column: column identifying the vessel
+    :return: DataFrame with a row per vessel and a column per speed bin under both 'hours' and 'percentage'
+    """
+    vessel_codes, vessels = pd.factorize(dataframe[vessel_column], sort=True)
+    speeds = dataframe['speed'].to_numpy(dtype=np.float64)
+    timestamps = pd.DatetimeIndex(pd.to_datetime(dataframe['timestamp'], utc=True)).as_unit('ns')
+    nanoseconds = timestamps.asi8
+
+    if max_speed is None:
+        max_speed = ceil(np.nanmax(speeds, initial=min_speed))
+    n_bins = max(ceil((max_speed - min_speed) / interval - 1e-9), 1)
+    speed_bins = min_speed + interval * np.arange(n_bins + 1)
+
+    # Sort by vessel and time, then every row but a vessel's first gets the time step leading up to it
+    # Two stable argsorts are several times faster than np.lexsort on shuffled rows
+    order = np.argsort(nanoseconds, kind='stable')
+    order = order[np.argsort(vessel_codes[order], kind='stable')]
+    order = order[(vessel_codes[order] >= 0) & ~np.asarray(timestamps.isna())[order]]
+    vessel_codes, speeds, nanoseconds = vessel_codes[order], speeds[order], nanoseconds[order]
+    hours = np.diff(nanoseconds) / 3.6e12
+    same_vessel = vessel_codes[1:] == vessel_codes[:-1]
+    vessel_codes, speeds = vessel_codes[1:], speeds[1:]
+
+    # Left-closed bins, the same as cut(..., right=False)
+    speed_codes = np.searchsorted(speed_bins, speeds, side='right') - 1
+    counted = same_vessel & (hours < MAX_TIME_STEP_HOURS) & (speed_codes >= 0) & (speed_codes < n_bins)
+
+    # One weighted histogram over (vessel, speed bin) pairs for the whole fleet
+    cells = vessel_codes[counted] * n_bins + speed_codes[counted]
+    hours = np.bincount(cells, weights=hours[counted], minlength=len(vessels) * n_bins).reshape(len(vessels), n_bins)
+
+    total = hours.sum(axis=1, keepdims=True)
+    percentage = np.divide(hours * 100, total, out=np.zeros_like(hours), where=total > 0)
+
+    bins = pd.IntervalIndex.from_breaks(speed_bins, closed='left')
+    return pd.concat({'hours': DataFrame(hours, index=vessels, columns=bins),
+                      'percentage': DataFrame(percentage, index=vessels, columns=bins)}, axis=1)
 
 
 r"""
 # EXAMPLE WITH PLOT
 if __name__ == '__main__':
-    from pandas import read_excel
     import matplotlib.pyplot as plt
+    from utils.ingest import read_ais
     path = r"C:\Users\tokit\OneDrive\Desktop\Rapportir\Sæson rapportir\Makrelur 2023\AIS\Iceland\Raw\vessel_313_Jón Kjartansson SU111_20230615T0000-20230915T0000.xlsx"
-    df = read_excel(path)
+    df = read_ais(path)
     speed_group = speed_groups(df, 0.2)
 
+    # Fleet profiles on shared bins, one row per vessel
+    profiles = speed_profiles(df, 0.2)
+    print(profiles['percentage'].round(1))
+
     speed_group.plot(kind='bar', color='blue', edgecolor='black')
     plt.xticks(rotation=45, ha='right')
 
@@ -0,0 +1,236 @@
+import numpy as np
+import pandas as pd
+from pandas import DataFrame, Timedelta, Timestamp
+
+from utils.daylight import daylight_period, solar_elevation
+from utils.distance import segment_distances
+from utils.find_individual_stops import stop_runs
+from utils.mean_speed import mean_speeds
+from utils.speed_groups import speed_group_hours
+
+# Optional columns, kept in the dtype they are read with (float32 and int16 from utils.ingest.read_ais)
+_OPTIONAL = {'speed': 'speeds', 'heading': 'headings'}
+
+
+class Track:
+    """
+    Positions of one vessel as contiguous NumPy arrays, sorted by time.
+
+    Times are int64 nanoseconds since the Unix epoch in UTC, the time zone of the source timestamps is kept for
+    converting back. Slicing a track by position or by time window returns a track of views on the same arrays, so
+    no data is copied, except for slices with a step, which are copied to keep the arrays contiguous. The methods
+    run the array cores of the utils functions directly, without building a frame.
+
+    :param times: int64 nanoseconds since the epoch (UTC), sorted
+    :param latitudes: latitudes in degrees
+    :param longitudes: longitudes in degrees
+    :param speeds: speeds in knots, optional
+    :param headings: headings in degrees, optional
+    :param vessel: name or other key of the vessel
+    :param tz: time zone of the timestamps, None for naive timestamps
+    """
+
+    __slots__ = ('times', 'latitudes', 'longitudes', 'speeds', 'headings', 'vessel', 'tz')
+
+    def __init__(self, times: np.ndarray, latitudes: np.ndarray, longitudes: np.ndarray, speeds: np.ndarray = None,
+                 headings: np.ndarray = None, vessel=None, tz=None):
+        self.times = np.ascontiguousarray(times, dtype=np.int64)
+        self.latitudes = np.ascontiguousarray(latitudes)
+        self.longitudes = np.ascontiguousarray(longitudes)
+        self.speeds = None if speeds is None else np.ascontiguousarray(speeds)
+        self.headings = None if headings is None else np.ascontiguousarray(headings)
+        self.vessel = vessel
+        self.tz = tz
+
+        for array in (self.latitudes, self.longitudes, self.speeds, self.headings):
+            if array is not None and len(array) != len(self.times):
+                raise ValueError('All arrays of a track must have the same length.')
+        if np.any(self.times[1:] < self.times[:-1]):
+            raise ValueError('Track times must be sorted, use Track.from_dataframe for unsorted positions.')
+
+    @classmethod
+    def from_dataframe(cls, dataframe: DataFrame, vessel=None):
+        """
+        Make a track from the 'timestamp', 'latitude', 'longitude' and optionally 'speed' and 'heading' columns.
+
+        Columns are taken as they are where possible, positions without a timestamp are dropped and the rest is
+        sorted by time only when it is not in order already.
+
+        :param dataframe: AIS DataFrame of one vessel
+        :param vessel: name of the vessel
+        :return: Track
+        """
+        timestamps = pd.DatetimeIndex(dataframe['timestamp'])
+        arrays = {name: dataframe[column].to_numpy() for column, name in _OPTIONAL.items()
+                  if column in dataframe.columns}
+
+        return cls._from_arrays(timestamps, dataframe['latitude'].to_numpy(), dataframe['longitude'].to_numpy(),
+                                arrays, vessel)
+
+    @classmethod
+    def by_vessel(cls, dataframe: DataFrame, vessel_column: str = 'vessel_name') -> dict:
+        """
+        Split a fleet's AIS DataFrame into one track per vessel.
+
+        The columns are reordered by vessel once and every track holds views on that copy.
+
+        :param dataframe: AIS DataFrame with vessel_column, in any order
+        :param vessel_column: column identifying the vessel
+        :return: dict of vessel to Track, in order of first appearance
+        """
+        vessel_codes, vessels = pd.factorize(dataframe[vessel_column])
+        order = np.argsort(vessel_codes, kind='stable')
+        order = order[vessel_codes[order] >= 0]
+        bounds = np.searchsorted(vessel_codes[order], np.arange(len(vessels) + 1))
+
+        timestamps = pd.DatetimeIndex(dataframe['timestamp'])[order]
+        latitudes = dataframe['latitude'].to_numpy()[order]
+        longitudes = dataframe['longitude'].to_numpy()[order]
+        arrays = {name: dataframe[column].to_numpy()[order] for column, name in _OPTIONAL.items()
+                  if column in dataframe.columns}
+
+        tracks = {}
+        for k, vessel in enumerate(vessels):
+            rows = slice(bounds[k], bounds[k + 1])
+            tracks[vessel] = cls._from_arrays(timestamps[rows], latitudes[rows], longitudes[rows],
+                                              {name: array[rows] for name, array in arrays.items()}, vessel)
+        return tracks
+
+    @classmethod
+    def _from_arrays(cls, timestamps: pd.DatetimeIndex, latitudes: np.ndarray, longitudes: np.ndarray,
+                     arrays: dict, vessel):
+        tz = timestamps.tz
+        times = timestamps.as_unit('ns').asi8
+
+        # Positions without a timestamp cannot be placed on the track
+        missing = np.asarray(timestamps.isna())
+        if missing.any():
+            rows = np.flatnonzero(~missing)
+            times, latitudes, longitudes = times[rows], latitudes[rows], longitudes[rows]
+            arrays = {name: array[rows] for name, array in arrays.items()}
+
+        if np.any(times[1:] < times[:-1]):
+            order = np.argsort(times, kind='stable')
+            times, latitudes, longitudes = times[order], latitudes[order], longitudes[order]
+            arrays = {name: array[order] for name, array in arrays.items()}
+
+        return cls(times, latitudes, longitudes, vessel=vessel, tz=tz, **arrays)
+
+    def to_dataframe(self, vessel_column: str = 'vessel_name') -> DataFrame:
+        """
+        Return the track as an AIS DataFrame, with a copy of the arrays.
+
+        :param vessel_column: column for the vessel, left out when the track has no vessel
+        :return: DataFrame with 'timestamp', 'latitude', 'longitude' and the optional columns of the track
+        """
+        columns = {'timestamp': self.timestamps, 'latitude': self.latitudes, 'longitude': self.longitudes}
+        for column, name in _OPTIONAL.items():
+            if getattr(self, name) is not None:
+                columns[column] = getattr(self, name)
+
+        dataframe = DataFrame(columns, copy=True)
+        if self.vessel is not None:
+            dataframe.insert(0, vessel_column, self.vessel)
+        return dataframe
+
+    @property
+    def timestamps(self) -> pd.DatetimeIndex:
+        """Times of the positions as a DatetimeIndex in the time zone of the source."""
+        timestamps = pd.DatetimeIndex(self.times.view('datetime64[ns]'))
+        return timestamps if self.tz is None else timestamps.tz_localize('UTC').tz_convert(self.tz)
+
+    @property
+    def nbytes(self) -> int:
+        """Memory held by the arrays of the track, or viewed by it."""
+        arrays = (self.times, self.latitudes, self.longitudes, self.speeds, self.headings)
+        return sum(array.nbytes for array in arrays if array is not None)
+
+    def __len__(self) -> int:
+        return len(self.times)
+
+    def __getitem__(self, key: slice):
+        if not isinstance(key, slice):
+            raise TypeError('Tracks are indexed with slices only, e.g. track[100:200].')
+        if key.step is not None and key.step < 1:
+            raise ValueError('Slices of a track must keep its time order.')
+
+        return Track(self.times[key], self.latitudes[key], self.longitudes[key],
+                     None if self.speeds is None else self.speeds[key],
+                     None if self.headings is None else self.headings[key], self.vessel, self.tz)
+
+    def window(self, start=None, end=None):
+        """
+        Return the part of the track from start (inclusive) to end (exclusive) as views, without copying.
+
+        :param start: first time, as accepted by pandas.Timestamp and in the time zone of the track when naive
+        :param end: time the window ends before
+        :return: Track
+        """
+        first = 0 if start is None else np.searchsorted(self.times, self._nanoseconds(start), side='left')
+        stop = len(self) if end is None else np.searchsorted(self.times, self._nanoseconds(end), side='left')
+        return self[first:stop]
+
+    def _nanoseconds(self, time) -> int:
+        time = Timestamp(time)
+        if self.tz is not None:
+            time = time.tz_localize(self.tz) if time.tz is None else time
+            time = time.tz_convert('UTC')
+        elif time.tz is not None:
+            time = time.tz_convert('UTC').tz_localize(None)
+        return time.as_unit('ns').value
+
+    def distances(self) -> np.ndarray:
+        """Distance in nm from the previous position, NaN for the first (see utils.distance.segment_distances)."""
+        return segment_distances(self.latitudes, self.longitudes)
+
+    def mean_speeds(self) -> np.ndarray:
+        """Mean speed in knots over the segment leading up to every position (see utils.mean_speed.mean_speeds)."""
+        return mean_speeds(self.times, self.distances())
+
+    def solar_elevation(self) -> np.ndarray:
+        """Solar elevation in degrees at every position (see utils.daylight.solar_elevation)."""
+        return solar_elevation(self.latitudes, self.longitudes, self.times.view('datetime64[ns]'))
+
+    def daylight_period(self, detailed: bool = False) -> pd.Categorical:
+        """Daylight period at every position (see utils.daylight.daylight_period)."""
+        return daylight_period(self.solar_elevation(), detailed)
+
+    def stop_runs(self, window: str = '5min', speed_threshold: float = 0.1) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Find the runs of positions where the vessel is stopped, as in utils.find_individual_stops.find_stops.
+
+        :param window: length of the smoothing window, as accepted by pandas.Timedelta
+        :param speed_threshold: highest smoothed speed in knots that counts as stopped
+        :return: tuple of int64 arrays with the first and the last position of every run
+        """
+        groups = np.zeros(len(self), dtype=np.intp)
+        return stop_runs(self._float_speeds(), self.times, groups, Timedelta(window).as_unit('ns').value,
+                         speed_threshold)
+
+    def speed_group_hours(self, speed_bins: np.ndarray) -> np.ndarray:
+        """Hours spent in each left-closed speed group (see utils.speed_groups.speed_group_hours)."""
+        return speed_group_hours(self.times, self._float_speeds(), speed_bins)
+
+    def _float_speeds(self) -> np.ndarray:
+        if self.speeds is None:
+            raise ValueError('Track has no speeds')
+        return self.speeds.astype(np.float64, copy=False)
+
+    def __repr__(self) -> str:
+        if len(self) == 0:
+            return f'Track({self.vessel!r}, 0 positions)'
+        timestamps = self.timestamps
+        return f'Track({self.vessel!r}, {len(self)} positions, {timestamps[0]} to {timestamps[-1]})'
+
+
+r"""
+# EXAMPLE
+if __name__ == '__main__':
+    from utils.ingest import read_ais
+    path = r"C:\Users\tokit\OneDrive\Desktop\Sild_23_24\AIS\Faroe Islands\Raw\vessel_9_Finnur Fríði_20231015T0000-20240101T0000.xlsx"
+    track = Track.from_dataframe(read_ais(path), 'Finnur Fríði')
+    november = track.window('2023-11-01', '2023-12-01')  # views, nothing is copied
+    print(november, november.nbytes)
+    print(np.nansum(november.distances()))
+    print(november.speed_group_hours(np.arange(0.5, 15, 0.5)))
+"""
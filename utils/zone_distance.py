@@ -0,0 +1,50 @@
+import numpy as np
+import pandas as pd
+
+from zoning.catalog import get_catalog
+
+
+def distance_to_coast(dataframe: pd.DataFrame, zones: str = 'close_land_geofencing') -> pd.Series:
+    """
+    Calculate the distance from each AIS position to the nearest close-land polygon.
+
+    :param dataframe: A pandas DataFrame containing columns "latitude" and "longitude"
+    :param zones: layer key from zoning.catalog.LAYERS, or a directory/CSV file of land polygons
+    :return: A pandas Series with the distance in nautical miles, 0 inside a polygon and NaN for missing coordinates
+    """
+    distances = get_catalog().layer(zones).proximity.distance(dataframe['latitude'].to_numpy(dtype=np.float64),
+                                                              dataframe['longitude'].to_numpy(dtype=np.float64))
+
+    return pd.Series(distances, index=dataframe.index, name='distance_to_coast')
+
+
+def distance_to_zone_boundary(dataframe: pd.DataFrame, zones: str = 'eez_zones') -> pd.Series:
+    """
+    Calculate the distance from each AIS position to the boundary of the zone it is in.
+
+    With overlapping zones the first matching zone counts, as in ZoneAssigner.assign_zones.
+
+    :param dataframe: A pandas DataFrame containing columns "latitude" and "longitude"
+    :param zones: layer key from zoning.catalog.LAYERS, or a directory/CSV file of zone polygons
+    :return: A pandas Series with the distance in nautical miles, NaN for positions outside every zone
+    """
+    layer = get_catalog().layer(zones)
+    latitudes = dataframe['latitude'].to_numpy(dtype=np.float64)
+    longitudes = dataframe['longitude'].to_numpy(dtype=np.float64)
+
+    codes = layer.index.classify(latitudes, longitudes)
+    distances = layer.proximity.boundary_distance(latitudes, longitudes, codes)
+
+    return pd.Series(distances, index=dataframe.index, name='distance_to_zone_boundary')
+
+
+r"""
+# EXAMPLE
+if __name__ == '__main__':
+    from utils.ingest import read_ais
+    path = r"C:\Users\tokit\OneDrive\Desktop\Sild_23_24\AIS\Faroe Islands\Raw\vessel_9_Finnur Fríði_20231015T0000-20240101T0000.xlsx"
+    df = read_ais(path)
+    df['distance_to_coast'] = distance_to_coast(df)
+    df['distance_to_zone_boundary'] = distance_to_zone_boundary(df)
+    print(df[['timestamp', 'distance_to_coast', 'distance_to_zone_boundary']])
+"""
@@ -1,5 +1,6 @@
 import pandas as pd
-from nautical_calculations.basic import get_distance
+
+from utils.geodesy import KM_TO_M, haversine
 
 
 def merge_df_on_timestamp(dataframe1: pd.DataFrame, dataframe2: pd.DataFrame, time_tolerance_minutes: int = 5) -> pd.DataFrame:
@@ -26,13 +27,13 @@ def merge_df_on_timestamp(dataframe1: pd.DataFrame, dataframe2: pd.DataFrame, ti
 
 def distance_between_vessels(dataframe: pd.DataFrame) -> pd.Series:
     # Calculate the distance between rows in data frame in meters
-    distances = dataframe.apply(
-        lambda row: get_distance(
-            row['latitude_x'],
-            row['longitude_x'],
-            row['latitude_y'],
-            row['longitude_y'],
-        ) * 1000, axis=1
+    distances = pd.Series(
+        haversine(
+            dataframe['latitude_x'].to_numpy(dtype=float),
+            dataframe['longitude_x'].to_numpy(dtype=float),
+            dataframe['latitude_y'].to_numpy(dtype=float),
+            dataframe['longitude_y'].to_numpy(dtype=float),
+        ) * KM_TO_M, index=dataframe.index
     )
 
     # Calculate the rolling minimum to smooth out spikes in distance
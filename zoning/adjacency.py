@@ -0,0 +1,56 @@
+import numpy as np
+import shapely
+from shapely import STRtree
+
+# Polygons closer than this (degrees) are neighbours, zone files do not always share their border vertices exactly
+TOUCH_DISTANCE = 0.01
+
+
+class ZoneAdjacency:
+    """
+    Which polygons of a zone layer share a border or overlap, and how far each polygon is from all the others.
+
+    A position that is in polygon k and moves less than gaps[k] (degrees) can only end up in k, in one of its
+    neighbours or outside every polygon, since every other polygon is at least gaps[k] away from k. Only those
+    polygons need an exact test after the move.
+    """
+
+    def __init__(self, indptr: np.ndarray, indices: np.ndarray, gaps: np.ndarray):
+        self.indptr = indptr
+        self.indices = indices
+        self.gaps = gaps
+
+    def __len__(self):
+        return len(self.gaps)
+
+    @classmethod
+    def build(cls, geometries: np.ndarray, outer: np.ndarray = None, touch_distance: float = TOUCH_DISTANCE):
+        """
+        Find the neighbours of every polygon and its distance to the nearest polygon that is not a neighbour.
+
+        :param geometries: polygons of the layer
+        :param outer: polygons covering the matching geometries with fewer vertices (e.g. a simplified tier's outer
+                      bands), used to bound the gaps from below cheaply. Defaults to the geometries themselves.
+        :param touch_distance: polygons within this distance (degrees) of each other are neighbours
+        :return: ZoneAdjacency
+        """
+        geometries = np.asarray(geometries, dtype=object)
+        outer = geometries if outer is None else np.asarray(outer, dtype=object)
+        n = len(geometries)
+
+        # Neighbour lists in CSR form, every polygon is listed as its own neighbour
+        first, second = STRtree(geometries).query(geometries, predicate='dwithin', distance=touch_distance)
+        order = np.lexsort((second, first))
+        first, indices = first[order], second[order]
+        indptr = np.searchsorted(first, np.arange(n + 1))
+
+        # Distance to the nearest polygon that is not a neighbour, inf when there is none
+        distances = shapely.distance(outer[:, None], outer[None, :]) if n else np.empty((0, 0))
+        distances[first, indices] = np.inf
+        gaps = distances.min(axis=1) if n else np.empty(0)
+
+        return cls(indptr, indices.astype(np.intp), gaps)
+
+    def neighbours(self, k: int) -> np.ndarray:
+        """Return the sorted indices of polygon k and every polygon sharing a border with it or overlapping it."""
+        return self.indices[self.indptr[k]:self.indptr[k + 1]]
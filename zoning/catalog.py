@@ -0,0 +1,387 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import shapely
+from shapely.errors import GEOSException
+from shapely.geometry import Polygon
+
+from zoning.adjacency import ZoneAdjacency
+from zoning.grid import ZoneGrid
+from zoning.proximity import ZoneProximity
+from zoning.simplify import SimplifiedZoneIndex
+from zoning.spatial_index import ZoneIndex
+
+ZONES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'zones')
+CACHE_DIR = os.path.join(ZONES_DIR, '.zone_cache')
+
+# Zone layers shipped in the zones directory: layer key -> (path relative to ZONES_DIR, column to group polygons by)
+LAYERS = {
+    'eez_zones': ('eez_zones', None),
+    'other_zones': ('other_zones', None),
+    'close_land_geofencing': ('close_land_geofencing', None),
+    'harbors': ('harbors/one_file_zones', 'harbor'),
+    'factories': ('factories/fo_factories.csv', 'factory'),
+}
+
+_MAGIC = b'ZCAT1\n'
+_ALIGNMENT = 8
+
+
+class ZoneLayer:
+    """Named polygons of one compiled zone source (a directory of CSV files or one grouped CSV file)."""
+
+    def __init__(self, source: str, group_name: str | None, names: list[str], geometries: np.ndarray,
+                 bounds: np.ndarray, signature: str):
+        self.source = source
+        self.group_name = group_name
+        self.names = names
+        self.geometries = geometries
+        self.bounds = bounds
+        self.signature = signature
+        self.artifact_path = None
+        self._index = None
+        self._proximity = None
+        self._adjacency = None
+        self._grids = {}
+        self._tiers = {}
+
+    def __len__(self):
+        return len(self.names)
+
+    @property
+    def index(self) -> ZoneIndex:
+        """Spatial index over the layer's polygons, built on first use and kept for the lifetime of the layer."""
+        if self._index is None:
+            self._index = ZoneIndex.from_geometries(self.geometries, self.names)
+        return self._index
+
+    @property
+    def proximity(self) -> ZoneProximity:
+        """Nearest-distance queries in nm against the layer's polygons, built on first use."""
+        if self._proximity is None:
+            self._proximity = ZoneProximity(self.geometries)
+        return self._proximity
+
+    @property
+    def adjacency(self) -> ZoneAdjacency:
+        """Neighbour graph of the layer's polygons, cached on disk next to the compiled artifact."""
+        if self._adjacency is not None:
+            return self._adjacency
+
+        adjacency_path = None
+        if self.artifact_path is not None:
+            stem = os.path.splitext(self.artifact_path)[0]
+            adjacency_path = f'{stem}_{self.signature[:12]}.adjacency.npz'
+            layer_prefix = f'{os.path.basename(stem)}_'
+
+        arrays = _load_arrays(adjacency_path, ('indptr', 'indices', 'gaps')) if adjacency_path is not None else None
+
+        if arrays is not None:
+            self._adjacency = ZoneAdjacency(*arrays)
+        else:
+            # Gaps are measured between the outer bands of a coarse tier, a cheap lower bound on the true distances
+            self._adjacency = ZoneAdjacency.build(self.geometries, self.simplified(1000).outer)
+            if adjacency_path is not None:
+                _write_arrays(adjacency_path, layer_prefix, f'{layer_prefix}{self.signature[:12]}', '.adjacency.npz',
+                              indptr=self._adjacency.indptr, indices=self._adjacency.indices,
+                              gaps=self._adjacency.gaps)
+
+        return self._adjacency
+
+    def grid(self, resolution: float = 0.1) -> ZoneGrid:
+        """
+        Lookup grid over the layer's polygons, cached on disk next to the compiled artifact.
+
+        :param resolution: cell size in degrees
+        :return: ZoneGrid for the current version of the layer
+        """
+        if resolution in self._grids:
+            return self._grids[resolution]
+
+        grid_path = None
+        if self.artifact_path is not None:
+            stem = os.path.splitext(self.artifact_path)[0]
+            grid_path = f'{stem}_{self.signature[:12]}_{resolution:g}.grid.npy'
+            layer_prefix = f'{os.path.basename(stem)}_'
+
+        x0, y0, nx, ny = ZoneGrid.extent(self.bounds, resolution)
+        labels = _load_grid(grid_path, (nx, ny)) if grid_path is not None else None
+
+        if labels is not None:
+            grid = ZoneGrid(labels, (x0, y0), resolution)
+        else:
+            grid = ZoneGrid.build(self.geometries, resolution)
+            if grid_path is not None:
+                # Grids of other resolutions for this version are kept, older versions are dropped
+                _write_grid(grid_path, grid.labels, layer_prefix, f'{layer_prefix}{self.signature[:12]}_')
+
+        self._grids[resolution] = grid
+
+        return grid
+
+    def simplified(self, tolerance: float) -> SimplifiedZoneIndex:
+        """
+        Simplified tier of the layer's polygons, cached on disk next to the compiled artifact.
+
+        :param tolerance: simplification tolerance in metres (e.g. one of zoning.simplify.TOLERANCES)
+        :return: SimplifiedZoneIndex, classifying exactly like the layer's index
+        """
+        if tolerance in self._tiers:
+            return self._tiers[tolerance]
+
+        tier_path = None
+        if self.artifact_path is not None:
+            stem = os.path.splitext(self.artifact_path)[0]
+            tier_path = f'{stem}_{self.signature[:12]}_{tolerance:g}m.tier.zcat'
+            layer_prefix = f'{os.path.basename(stem)}_'
+
+        artifact = _load_artifact(tier_path, self.signature) if tier_path is not None else None
+
+        if artifact is not None:
+            # Simplified, inner and outer polygons are stored one after the other
+            header, geometries, _ = artifact
+            simplified, inner, outer = np.split(geometries, 3)
+            tier = SimplifiedZoneIndex(self.geometries, self.names, tolerance, simplified, inner, outer,
+                                       np.array(header['error_bounds'], dtype=np.float64))
+        else:
+            tier = SimplifiedZoneIndex.build(self.geometries, self.names, tolerance)
+            if tier_path is not None:
+                try:
+                    _remove_stale(os.path.dirname(tier_path), layer_prefix, f'{layer_prefix}{self.signature[:12]}_',
+                                  '.tier.zcat')
+                except OSError:
+                    pass
+                _write_artifact(tier_path, {'signature': self.signature, 'tolerance': tolerance,
+                                            'error_bounds': tier.error_bounds.tolist()},
+                                np.concatenate([tier.simplified, tier.inner, tier.outer]))
+
+        self._tiers[tolerance] = tier
+
+        return tier
+
+
+class ZoneCatalog:
+    """
+    In-process cache of compiled zone layers.
+
+    Every layer is compiled once into a binary artifact in the cache directory holding the polygons as WKB together
+    with their bounds and names. The artifact is memory-mapped on load and rebuilt when the size or modification
+    time of any source CSV changes. Use get_catalog() to share one instance between zoning and plotting.
+    """
+
+    def __init__(self, cache_dir: str = CACHE_DIR):
+        self.cache_dir = cache_dir
+        self._layers = {}
+
+    def layer(self, path: str, group_name: str = None) -> ZoneLayer:
+        """
+        Return the compiled layer for a layer key from LAYERS, a directory of polygon CSV files or a single CSV file.
+
+        :param path: layer key (e.g. 'eez_zones') or path to a directory or CSV file
+        :param group_name: column to group polygons by in one-file sources (e.g. 'factory')
+        :return: ZoneLayer with the polygons in the same order ZoneAssigner reads them
+        """
+        if path in LAYERS and not os.path.exists(path):
+            relative_path, default_group = LAYERS[path]
+            path = os.path.join(ZONES_DIR, relative_path)
+            group_name = group_name or default_group
+
+        source = os.path.abspath(path)
+        files = _source_files(source)
+        signature = _signature(files, group_name)
+
+        cached = self._layers.get((source, group_name))
+        if cached is not None and cached.signature == signature:
+            return cached
+
+        artifact_path = self.artifact_path(source, group_name)
+        artifact = _load_artifact(artifact_path, signature)
+        if artifact is not None:
+            header, geometries, bounds = artifact
+            layer = ZoneLayer(source, group_name, header['names'], geometries, bounds, signature)
+        else:
+            layer = _compile_layer(source, files, group_name, signature)
+            _write_artifact(artifact_path, {'source': source, 'group_name': group_name, 'signature': signature,
+                                            'names': layer.names}, layer.geometries)
+
+        layer.artifact_path = artifact_path
+        self._layers[(source, group_name)] = layer
+
+        return layer
+
+    def artifact_path(self, source: str, group_name: str = None) -> str:
+        """Return the path of the compiled artifact for a zone source."""
+        key = hashlib.sha1(f'{source}|{group_name}'.encode('utf-8')).hexdigest()[:12]
+        name = os.path.splitext(os.path.basename(source))[0]
+        return os.path.join(self.cache_dir, f'{name}_{key}.zcat')
+
+    def clear(self) -> None:
+        """Forget all layers loaded in this process (artifacts on disk are kept)."""
+        self._layers.clear()
+
+
+_catalog = None
+
+
+def get_catalog() -> ZoneCatalog:
+    """Return the process-wide zone catalog."""
+    global _catalog
+    if _catalog is None:
+        _catalog = ZoneCatalog()
+    return _catalog
+
+
+def _source_files(source: str) -> list[str]:
+    # Keep the directory listing order, it decides which polygon wins when zones overlap
+    if os.path.isfile(source):
+        return [source]
+    elif os.path.isdir(source):
+        return [os.path.join(source, file_name) for file_name in os.listdir(source) if file_name.endswith('.csv')]
+    raise FileNotFoundError(f'No zone file or directory at {source}')
+
+
+def _signature(files: list[str], group_name: str | None) -> str:
+    stats = [(os.path.basename(file), os.stat(file).st_size, os.stat(file).st_mtime_ns) for file in files]
+    return hashlib.sha1(json.dumps([group_name, stats]).encode('utf-8')).hexdigest()
+
+
+def _compile_layer(source: str, files: list[str], group_name: str | None, signature: str) -> ZoneLayer:
+    names = []
+    polygons = []
+
+    for file in files:
+        polygon_df = pd.read_csv(file)
+
+        if group_name is None:
+            names.append(os.path.splitext(os.path.basename(file))[0])
+            polygons.append(Polygon(zip(polygon_df['latitude'], polygon_df['longitude'])))
+        else:
+            for polygon_name, group in polygon_df.groupby(group_name):
+                names.append(str(polygon_name))
+                polygons.append(Polygon(zip(group['latitude'], group['longitude'])))
+
+    geometries = np.array(polygons, dtype=object)
+    bounds = shapely.bounds(geometries).reshape(-1, 4)
+
+    return ZoneLayer(source, group_name, names, geometries, bounds, signature)
+
+
+def _write_artifact(artifact_path: str, header: dict, geometries: np.ndarray) -> None:
+    """Write header + bounds + WKB offsets + WKB blob, replacing any previous artifact atomically."""
+    wkb = shapely.to_wkb(geometries) if len(geometries) else np.array([], dtype=object)
+    offsets = np.zeros(len(wkb) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(item) for item in wkb])
+    bounds = shapely.bounds(geometries).reshape(-1, 4).astype(np.float64)
+
+    header = json.dumps({**header, 'count': len(geometries)}).encode('utf-8')
+
+    try:
+        os.makedirs(os.path.dirname(artifact_path), exist_ok=True)
+        tmp_path = f'{artifact_path}.{os.getpid()}.tmp'
+
+        with open(tmp_path, 'wb') as file:
+            file.write(_MAGIC)
+            file.write(np.int64(len(header)).tobytes())
+            file.write(header)
+            file.write(b'\0' * (-file.tell() % _ALIGNMENT))
+            file.write(bounds.tobytes())
+            file.write(offsets.tobytes())
+            file.write(b''.join(wkb))
+
+        os.replace(tmp_path, artifact_path)
+    except OSError:
+        # A read-only zones directory only costs a recompile next time
+        pass
+
+
+def _load_grid(grid_path: str, shape: tuple[int, int]) -> np.ndarray | None:
+    """Memory-map a cached grid, returning None when it is missing or does not fit the layer."""
+    try:
+        labels = np.load(grid_path, mmap_mode='r')
+    except (OSError, ValueError):
+        return None
+    return labels if labels.shape == shape else None
+
+
+def _write_grid(grid_path: str, labels: np.ndarray, layer_prefix: str, version_prefix: str) -> None:
+    """Save a grid atomically and remove grids built from older versions of the same layer."""
+    try:
+        _remove_stale(os.path.dirname(grid_path), layer_prefix, version_prefix, '.grid.npy')
+
+        tmp_path = f'{grid_path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as file:
+            np.save(file, labels)
+        os.replace(tmp_path, grid_path)
+    except OSError:
+        pass
+
+
+def _load_arrays(path: str, keys: tuple[str, ...]) -> tuple[np.ndarray, ...] | None:
+    """Load the named arrays of a cached .npz file, returning None when it is missing or incomplete."""
+    try:
+        with np.load(path) as data:
+            return tuple(data[key] for key in keys)
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def _write_arrays(path: str, layer_prefix: str, version_prefix: str, suffix: str, **arrays: np.ndarray) -> None:
+    """Save arrays atomically to an .npz file and remove files with the same suffix from older versions."""
+    try:
+        _remove_stale(os.path.dirname(path), layer_prefix, version_prefix, suffix)
+
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as file:
+            np.savez(file, **arrays)
+        os.replace(tmp_path, path)
+    except OSError:
+        pass
+
+
+def _remove_stale(cache_dir: str, layer_prefix: str, version_prefix: str, suffix: str) -> None:
+    """Remove cached files derived from older versions of a layer."""
+    for file_name in os.listdir(cache_dir):
+        stale = file_name.startswith(layer_prefix) and not file_name.startswith(version_prefix)
+        if stale and file_name.endswith(suffix):
+            os.remove(os.path.join(cache_dir, file_name))
+
+
+def _load_artifact(artifact_path: str, signature: str) -> tuple[dict, np.ndarray, np.ndarray] | None:
+    """Memory-map a compiled artifact, returning (header, geometries, bounds) or None when missing, corrupt or stale."""
+    try:
+        data = np.memmap(artifact_path, dtype=np.uint8, mode='r')
+    except (OSError, ValueError):
+        return None
+
+    if data[:len(_MAGIC)].tobytes() != _MAGIC:
+        return None
+
+    # A truncated or garbled artifact fails somewhere in parsing, it is rebuilt like a missing one
+    try:
+        position = len(_MAGIC)
+        header_length = int(data[position:position + 8].view(np.int64)[0])
+        position += 8
+        header = json.loads(data[position:position + header_length].tobytes())
+        position += header_length
+        position += -position % _ALIGNMENT
+
+        if header['signature'] != signature:
+            return None
+
+        n = header['count']
+        # Copy the small arrays out so the mapping can be released and the artifact replaced while the layer is alive
+        bounds = np.array(data[position:position + n * 32].view(np.float64).reshape(n, 4))
+        position += n * 32
+        offsets = data[position:position + (n + 1) * 8].view(np.int64)
+        position += (n + 1) * 8
+        blob = data[position:]
+
+        wkb = np.array([blob[offsets[i]:offsets[i + 1]].tobytes() for i in range(n)], dtype=object)
+        geometries = shapely.from_wkb(wkb) if n else np.array([], dtype=object)
+    except (ValueError, KeyError, IndexError, TypeError, GEOSException):
+        return None
+
+    return header, geometries, bounds
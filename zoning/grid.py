@@ -0,0 +1,149 @@
+import numpy as np
+import shapely
+from scipy.ndimage import distance_transform_cdt
+
+# Cell labels besides zone codes
+OUTSIDE = -1
+BOUNDARY = -2
+
+# Cells are grown by this margin (degrees) before being tested, so floating point error when binning a point can
+# never put it in a neighbouring cell whose label does not hold for it
+_CELL_MARGIN = 1e-9
+
+# Number of cell geometries created at a time while building a grid
+_CELLS_PER_BLOCK = 250_000
+
+
+class ZoneGrid:
+    """
+    Regular latitude/longitude raster over a zone layer for constant-time zone lookup.
+
+    Every cell is labelled with the code of the zone that contains it entirely, OUTSIDE when no zone touches it or
+    BOUNDARY when it crosses a zone edge. Points in labelled cells are answered with one array index, only points in
+    boundary cells are passed on to the exact polygon test of the layer's ZoneIndex.
+    """
+
+    def __init__(self, labels: np.ndarray, origin: tuple[float, float], resolution: float):
+        self.labels = labels
+        self.origin = origin
+        self.resolution = resolution
+        self._clearance = None
+
+    @staticmethod
+    def extent(bounds: np.ndarray, resolution: float) -> tuple[float, float, int, int]:
+        """Return the grid origin and shape (x0, y0, nx, ny) covering the given polygon bounds."""
+        if len(bounds) == 0:
+            return 0.0, 0.0, 0, 0
+        x0 = np.floor(bounds[:, 0].min() / resolution) * resolution
+        y0 = np.floor(bounds[:, 1].min() / resolution) * resolution
+        nx = int((bounds[:, 2].max() - x0) // resolution) + 1
+        ny = int((bounds[:, 3].max() - y0) // resolution) + 1
+        return x0, y0, nx, ny
+
+    @classmethod
+    def build(cls, geometries: np.ndarray, resolution: float):
+        """
+        Label every grid cell against the polygons, respecting the first-match order of the polygon list.
+
+        :param geometries: array of (prepared) polygons with latitude as x and longitude as y
+        :param resolution: cell size in degrees
+        :return: ZoneGrid
+        """
+        bounds = shapely.bounds(geometries).reshape(-1, 4)
+        x0, y0, nx, ny = cls.extent(bounds, resolution)
+        labels = np.full((nx, ny), OUTSIDE, dtype=np.int16)
+        decided = np.zeros((nx, ny), dtype=bool)
+
+        shapely.prepare(geometries)
+
+        for k, geometry in enumerate(geometries):
+            # Rows of cells overlapping the polygon's bounding box
+            xmin, ymin, xmax, ymax = bounds[k] + [-_CELL_MARGIN, -_CELL_MARGIN, _CELL_MARGIN, _CELL_MARGIN]
+            i0, j0 = max(int((xmin - x0) // resolution), 0), max(int((ymin - y0) // resolution), 0)
+            i1, j1 = min(int((xmax - x0) // resolution) + 1, nx), min(int((ymax - y0) // resolution) + 1, ny)
+
+            # Label the box in blocks of rows to bound the number of cell geometries alive at once
+            rows_per_block = max(_CELLS_PER_BLOCK // max(j1 - j0, 1), 1)
+            for row in range(i0, i1, rows_per_block):
+                i, j = np.meshgrid(np.arange(row, min(row + rows_per_block, i1)), np.arange(j0, j1), indexing='ij')
+                i, j = i.ravel(), j.ravel()
+
+                # A cell already claimed by an earlier polygon keeps its label
+                open_cells = ~decided[i, j]
+                i, j = i[open_cells], j[open_cells]
+
+                cells = shapely.box(x0 + i * resolution - _CELL_MARGIN, y0 + j * resolution - _CELL_MARGIN,
+                                    x0 + (i + 1) * resolution + _CELL_MARGIN, y0 + (j + 1) * resolution + _CELL_MARGIN)
+
+                touching = shapely.intersects(geometry, cells)
+                inside = shapely.contains_properly(geometry, cells[touching])
+
+                labels[i[touching], j[touching]] = np.where(inside, k, BOUNDARY)
+                decided[i[touching], j[touching]] = True
+
+        return cls(labels, (x0, y0), resolution)
+
+    def lookup(self, latitudes: np.ndarray, longitudes: np.ndarray) -> np.ndarray:
+        """Return the cell label of each point, OUTSIDE for points outside the grid or with missing coordinates."""
+        nx, ny = self.labels.shape
+        with np.errstate(invalid='ignore'):
+            i = np.floor((latitudes - self.origin[0]) / self.resolution)
+            j = np.floor((longitudes - self.origin[1]) / self.resolution)
+
+        on_grid = (i >= 0) & (i < nx) & (j >= 0) & (j < ny)
+        cell_labels = np.full(len(latitudes), OUTSIDE, dtype=np.int32)
+        cell_labels[on_grid] = self.labels[i[on_grid].astype(np.intp), j[on_grid].astype(np.intp)]
+
+        return cell_labels
+
+    def clearance(self, latitudes: np.ndarray, longitudes: np.ndarray) -> np.ndarray:
+        """
+        Return a lower bound, in degrees, on the distance from each point to the nearest boundary cell.
+
+        Neighbouring cells that are not boundary cells always carry the same label, so the zone of a point cannot
+        change within this distance. Points in boundary cells get 0, points with missing coordinates NaN.
+        """
+        nx, ny = self.labels.shape
+        if self._clearance is None:
+            # Chessboard distance in cells from every cell to the nearest boundary cell
+            boundary = np.asarray(self.labels) == BOUNDARY
+            if boundary.any():
+                self._clearance = distance_transform_cdt(~boundary, metric='chessboard').astype(np.int32)
+            else:
+                self._clearance = np.full((nx, ny), max(nx, ny) + 1, dtype=np.int32)
+
+        with np.errstate(invalid='ignore'):
+            i = np.floor((latitudes - self.origin[0]) / self.resolution)
+            j = np.floor((longitudes - self.origin[1]) / self.resolution)
+
+            # Off the grid there are no zones, so the gap to the grid is a lower bound
+            gap_x = np.maximum(np.maximum(self.origin[0] - latitudes, latitudes - (self.origin[0] + nx * self.resolution)), 0)
+            gap_y = np.maximum(np.maximum(self.origin[1] - longitudes, longitudes - (self.origin[1] + ny * self.resolution)), 0)
+            distances = np.maximum(gap_x, gap_y)
+
+        on_grid = (i >= 0) & (i < nx) & (j >= 0) & (j < ny)
+        cells = self._clearance[i[on_grid].astype(np.intp), j[on_grid].astype(np.intp)]
+
+        # A boundary cell k cells away is separated from the point's cell by k - 1 whole cells
+        distances[on_grid] = np.maximum(cells - 1, 0) * self.resolution
+
+        return distances
+
+    def classify(self, latitudes, longitudes, index) -> np.ndarray:
+        """
+        Return the code of the first polygon containing each point, -1 where no polygon contains it.
+
+        :param latitudes: array-like of latitudes
+        :param longitudes: array-like of longitudes
+        :param index: ZoneIndex of the same polygons, used for points in boundary cells
+        :return: int32 array of zone codes
+        """
+        latitudes = np.asarray(latitudes, dtype=np.float64)
+        longitudes = np.asarray(longitudes, dtype=np.float64)
+
+        codes = self.lookup(latitudes, longitudes)
+
+        boundary = np.flatnonzero(codes == BOUNDARY)
+        codes[boundary] = index.classify(latitudes[boundary], longitudes[boundary])
+
+        return codes
@@ -0,0 +1,174 @@
+import numpy as np
+import shapely
+from scipy.spatial import cKDTree
+
+from utils.geodesy import EARTH_RADIUS_NM
+
+# Longest edge (degrees) kept when densifying polygon boundaries, distances are within half of it (~0.15 nm)
+MAX_SEGMENT_LENGTH = 0.005
+
+# Sliding-midpoint trees answer queries far from the boundary (open sea) several times faster than median splits
+_TREE_OPTIONS = {'leafsize': 32, 'balanced_tree': False, 'compact_nodes': False}
+
+
+class ZoneProximity:
+    """
+    Nearest-distance queries in nautical miles against the polygons of a zone layer.
+
+    Polygon boundaries are densified and their vertices projected to unit vectors on the sphere, where the straight
+    (chord) distance orders points exactly like the great-circle distance, at any range and latitude. The nearest
+    vertex of every point is found with one bulk KD-tree query, then the great-circle distance to the two boundary
+    edges meeting at that vertex refines it. The result is never below the true distance to the boundary and at most
+    half of MAX_SEGMENT_LENGTH above it.
+    """
+
+    def __init__(self, geometries: np.ndarray):
+        self.geometries = np.array(geometries, dtype=object)
+        shapely.prepare(self.geometries)
+
+        (self.vertices, self.next_vertex, self.previous_vertex,
+         self.vertex_polygons) = _boundary_vertices(self.geometries)
+        self.tree = cKDTree(self.vertices, **_TREE_OPTIONS)
+
+        # Per-polygon trees, built on first use by boundary_distance
+        self._polygon_trees = {}
+
+    def distance(self, latitudes, longitudes) -> np.ndarray:
+        """
+        Return the distance in nm from each point to the nearest polygon, 0 for points inside a polygon.
+
+        :param latitudes: array-like of latitudes
+        :param longitudes: array-like of longitudes
+        :return: float64 array of distances, NaN for missing coordinates and inf when there are no polygons
+        """
+        return self.nearest(latitudes, longitudes)[1]
+
+    def nearest(self, latitudes, longitudes) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Return the nearest polygon of each point and the distance to it in nm.
+
+        :param latitudes: array-like of latitudes
+        :param longitudes: array-like of longitudes
+        :return: tuple of an int32 array of polygon indices (the first containing polygon for points inside one, -1
+                 for missing coordinates or no polygons) and a float64 array of distances as returned by distance
+        """
+        latitudes = np.asarray(latitudes, dtype=np.float64)
+        longitudes = np.asarray(longitudes, dtype=np.float64)
+        codes = np.full(len(latitudes), -1, dtype=np.int32)
+        distances = np.full(len(latitudes), np.nan)
+
+        finite = np.flatnonzero(np.isfinite(latitudes) & np.isfinite(longitudes))
+        if len(self.vertices) == 0:
+            distances[finite] = np.inf
+            return codes, distances
+
+        # Points inside a polygon are at distance 0, the others are as far as the nearest boundary
+        inside = np.zeros(len(finite), dtype=bool)
+        for k, polygon in enumerate(self.geometries):
+            contained = ~inside & shapely.contains_xy(polygon, latitudes[finite], longitudes[finite])
+            codes[finite[contained]] = k
+            inside |= contained
+        distances[finite[inside]] = 0
+
+        outside = finite[~inside]
+        points = unit_vectors(latitudes[outside], longitudes[outside])
+        _, nearest = self.tree.query(points)
+        codes[outside] = self.vertex_polygons[nearest]
+        distances[outside] = _refine(points, nearest, self.vertices, self.next_vertex, self.previous_vertex)
+
+        return codes, distances
+
+    def boundary_distance(self, latitudes, longitudes, codes) -> np.ndarray:
+        """
+        Return the distance in nm from each point to the boundary of a given polygon, typically the zone it is in.
+
+        :param latitudes: array-like of latitudes
+        :param longitudes: array-like of longitudes
+        :param codes: array-like of polygon indices, one per point; -1 for none
+        :return: float64 array of distances, NaN for missing coordinates and points without a polygon
+        """
+        latitudes = np.asarray(latitudes, dtype=np.float64)
+        longitudes = np.asarray(longitudes, dtype=np.float64)
+        codes = np.asarray(codes)
+        distances = np.full(len(latitudes), np.nan)
+
+        valid = np.isfinite(latitudes) & np.isfinite(longitudes) & (codes >= 0)
+
+        # One bulk query per polygon over the points assigned to it
+        for k in np.unique(codes[valid]):
+            idx = np.flatnonzero(valid & (codes == k))
+            tree, vertices, next_vertex, previous_vertex = self._polygon_tree(k)
+
+            points = unit_vectors(latitudes[idx], longitudes[idx])
+            _, nearest = tree.query(points)
+            distances[idx] = _refine(points, nearest, vertices, next_vertex, previous_vertex)
+
+        return distances
+
+    def _polygon_tree(self, k: int) -> tuple:
+        if k not in self._polygon_trees:
+            vertices, next_vertex, previous_vertex, _ = _boundary_vertices(self.geometries[k:k + 1])
+            self._polygon_trees[k] = cKDTree(vertices, **_TREE_OPTIONS), vertices, next_vertex, previous_vertex
+        return self._polygon_trees[k]
+
+
+def unit_vectors(latitudes: np.ndarray, longitudes: np.ndarray) -> np.ndarray:
+    """Return the (n, 3) unit vectors on the sphere of the given latitudes and longitudes."""
+    latitudes, longitudes = np.radians(latitudes), np.radians(longitudes)
+    cos_latitudes = np.cos(latitudes)
+    return np.column_stack([cos_latitudes * np.cos(longitudes), cos_latitudes * np.sin(longitudes),
+                            np.sin(latitudes)])
+
+
+def _boundary_vertices(geometries: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Densify the rings of all polygons and return their vertices as unit vectors, with the index of the next and the
+    previous vertex along the same ring and the index of the polygon they belong to.
+    """
+    rings, polygon_index = shapely.get_rings(shapely.segmentize(geometries, MAX_SEGMENT_LENGTH), return_index=True)
+    coordinates, ring_index = shapely.get_coordinates(rings, return_index=True)
+
+    # Drop the closing coordinate of every ring, the ring wraps around through next/previous instead
+    last_of_ring = np.append(ring_index[1:] != ring_index[:-1], True)
+    coordinates, ring_index = coordinates[~last_of_ring], ring_index[~last_of_ring]
+
+    starts = np.flatnonzero(np.append(True, ring_index[1:] != ring_index[:-1]))
+    lengths = np.diff(np.append(starts, len(ring_index)))
+    ring_start, ring_length = np.repeat(starts, lengths), np.repeat(lengths, lengths)
+    position = np.arange(len(ring_index)) - ring_start
+
+    next_vertex = ring_start + (position + 1) % ring_length
+    previous_vertex = ring_start + (position - 1) % ring_length
+
+    return unit_vectors(coordinates[:, 0], coordinates[:, 1]), next_vertex, previous_vertex, polygon_index[ring_index]
+
+
+def _refine(points: np.ndarray, nearest: np.ndarray, vertices: np.ndarray, next_vertex: np.ndarray,
+            previous_vertex: np.ndarray) -> np.ndarray:
+    """Great-circle distance in nm from each point to the two boundary edges meeting at its nearest vertex."""
+    angles = np.minimum(_edge_angle(points, vertices[nearest], vertices[next_vertex[nearest]]),
+                        _edge_angle(points, vertices[previous_vertex[nearest]], vertices[nearest]))
+    return angles * EARTH_RADIUS_NM
+
+
+def _edge_angle(points: np.ndarray, starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+    """Angular distance in radians from each point to the great-circle arc between its start and end vector."""
+    normals = np.cross(starts, ends)
+    norms = np.linalg.norm(normals, axis=1)
+    degenerate = norms == 0
+    normals[~degenerate] /= norms[~degenerate, None]
+
+    # The foot of the perpendicular is on the arc when it lies between the start and the end vector
+    offsets = np.einsum('ij,ij->i', points, normals)
+    feet = points - offsets[:, None] * normals
+    on_arc = (~degenerate
+              & (np.einsum('ij,ij->i', np.cross(starts, feet), normals) >= 0)
+              & (np.einsum('ij,ij->i', np.cross(feet, ends), normals) >= 0))
+
+    endpoint_angles = np.minimum(_angle(points, starts), _angle(points, ends))
+    return np.where(on_arc, np.arcsin(np.clip(np.abs(offsets), 0, 1)), endpoint_angles)
+
+
+def _angle(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    # Chord length to angle, well conditioned for small angles
+    return 2 * np.arcsin(np.clip(np.linalg.norm(a - b, axis=1) / 2, 0, 1))
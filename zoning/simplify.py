@@ -0,0 +1,94 @@
+import numpy as np
+import shapely
+
+from zoning.spatial_index import ZoneIndex
+
+# Upper bound on the length of one degree of latitude or longitude in metres
+METRES_PER_DEGREE = 111_694
+
+# Tolerances (metres) of the simplified tiers kept for every layer
+TOLERANCES = (100, 500, 1000, 5000)
+
+# Bands are widened by this factor until the containment checks hold
+_GROWTH = 1.5
+_MAX_ATTEMPTS = 8
+
+
+class SimplifiedZoneIndex(ZoneIndex):
+    """
+    Zone index that tests points against simplified polygons and only falls back to the full polygon near edges.
+
+    For every polygon the tier keeps the simplified polygon together with an inner and an outer polygon: the
+    simplified polygon shrunk and grown by a band of width error_bounds[k]. The bands are verified at build time so
+    that inner is covered by the original polygon and outer covers it. A point inside inner is therefore within the
+    original polygon, a point outside outer is not, and only points in the band between them need the exact test.
+    Classification stays identical to ZoneIndex.
+
+    error_bounds[k] (metres) bounds how far the simplified edge of polygon k lies from the original one: the
+    original edge and every point whose inside/outside answer differs between the two polygons lie within it.
+    """
+
+    def __init__(self, geometries: np.ndarray, names: list[str], tolerance: float, simplified: np.ndarray,
+                 inner: np.ndarray, outer: np.ndarray, error_bounds: np.ndarray):
+        self._build(names, geometries, 1_000_000)
+        self.tolerance = tolerance
+        self.simplified = simplified
+        self.inner = inner
+        self.outer = outer
+        self.error_bounds = error_bounds
+
+        shapely.prepare(self.inner)
+        shapely.prepare(self.outer)
+
+    @classmethod
+    def build(cls, geometries: np.ndarray, names: list[str], tolerance: float):
+        """
+        Simplify every polygon with the given tolerance in metres and derive verified inner and outer bands.
+
+        :param geometries: original polygons with latitude as x and longitude as y
+        :param names: polygon names
+        :param tolerance: simplification tolerance in metres
+        :return: SimplifiedZoneIndex
+        """
+        tolerance_degrees = tolerance / METRES_PER_DEGREE
+        simplified = shapely.simplify(geometries, tolerance_degrees, preserve_topology=True)
+
+        inner = np.empty(len(geometries), dtype=object)
+        outer = np.empty(len(geometries), dtype=object)
+        error_bounds = np.empty(len(geometries))
+
+        shapely.prepare(geometries)
+        for k, (geometry, simple) in enumerate(zip(geometries, simplified)):
+            # The simplifier does not always keep within its tolerance, so the band is widened until it holds
+            band = tolerance_degrees * 1.01
+            for _ in range(_MAX_ATTEMPTS):
+                inner[k] = shapely.buffer(simple, -band)
+                outer[k] = shapely.buffer(simple, band)
+                # Small polygons shrink to nothing, which leaves every point near them to the exact test
+                inner_holds = shapely.is_empty(inner[k]) or shapely.covers(geometry, inner[k])
+                if inner_holds and shapely.covers(outer[k], geometry):
+                    break
+                band *= _GROWTH
+            else:
+                # Give up on the tier for this polygon: every point in its envelope gets the exact test
+                inner[k] = shapely.Polygon()
+                outer[k] = shapely.box(*shapely.bounds(geometry))
+                band = np.inf
+
+            error_bounds[k] = band * METRES_PER_DEGREE
+
+        return cls(geometries, names, tolerance, simplified, inner, outer, error_bounds)
+
+    def _contains(self, k: int, latitudes: np.ndarray, longitudes: np.ndarray) -> np.ndarray:
+        inside = np.zeros(len(latitudes), dtype=bool)
+
+        # Outside the outer band the point is outside the original polygon
+        near = np.flatnonzero(shapely.contains_xy(self.outer[k], latitudes, longitudes))
+
+        # Inside the inner band it is inside, in between the full polygon decides
+        deep = shapely.contains_xy(self.inner[k], latitudes[near], longitudes[near])
+        inside[near[deep]] = True
+        edge = near[~deep]
+        inside[edge] = shapely.contains_xy(self.geometries[k], latitudes[edge], longitudes[edge])
+
+        return inside
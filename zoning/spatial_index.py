@@ -0,0 +1,223 @@
+import numpy as np
+import shapely
+from shapely import STRtree
+
+
+class ZoneIndex:
+    """
+    Spatial index over a list of named polygons for classifying coordinate arrays in bulk.
+
+    Polygons are prepared once and stored in an STRtree. Points are processed in chunks: the tree is queried with
+    the envelope of each chunk to find candidate polygons, and each candidate is tested with the vectorized
+    shapely.contains_xy predicate on the points inside its bounding box. Coordinates follow the convention used by
+    the zone files, i.e. x is latitude and y is longitude.
+
+    The result for every point is the first polygon (in list order) that contains it, which is the same answer
+    ZoneAssigner.which_zone gives.
+    """
+
+    def __init__(self, polygons: list, chunk_size: int = 1_000_000):
+        self._build([polygon.name for polygon in polygons], [polygon.polygon for polygon in polygons], chunk_size)
+
+    @classmethod
+    def from_geometries(cls, geometries, names: list[str], chunk_size: int = 1_000_000):
+        """Build an index from an array of polygons and a matching list of names."""
+        index = cls.__new__(cls)
+        index._build(names, geometries, chunk_size)
+        return index
+
+    def _build(self, names: list[str], geometries, chunk_size: int):
+        self.names = list(names)
+        self.geometries = np.array(geometries, dtype=object)
+        self.bounds = shapely.bounds(self.geometries).reshape(-1, 4)
+        self.chunk_size = chunk_size
+
+        shapely.prepare(self.geometries)
+        self.tree = STRtree(self.geometries)
+
+        # Lookup table from zone code to label, code -1 (no zone) maps to None
+        self._labels = np.array(self.names + [None], dtype=object)
+
+        # Tree over the individual boundary segments, built on first use by boundary_distance and boundary_crossings
+        self._segment_tree = None
+
+    def __len__(self):
+        return len(self.names)
+
+    def candidates(self, latitudes: np.ndarray, longitudes: np.ndarray) -> np.ndarray:
+        """Return the sorted indices of polygons whose envelope intersects the envelope of the given points."""
+        finite = np.isfinite(latitudes) & np.isfinite(longitudes)
+        if not finite.any():
+            return np.empty(0, dtype=np.intp)
+
+        envelope = shapely.box(latitudes[finite].min(), longitudes[finite].min(),
+                               latitudes[finite].max(), longitudes[finite].max())
+
+        return np.sort(self.tree.query(envelope))
+
+    def classify(self, latitudes, longitudes, allowed: np.ndarray = None) -> np.ndarray:
+        """
+        Return the code of the first polygon containing each point.
+
+        :param latitudes: array-like of latitudes
+        :param longitudes: array-like of longitudes
+        :param allowed: sorted polygon indices to test, when the caller knows no other polygon can contain the points
+        :return: int32 array of polygon indices, -1 where the point is not within any polygon
+        """
+        latitudes = np.asarray(latitudes, dtype=np.float64)
+        longitudes = np.asarray(longitudes, dtype=np.float64)
+        codes = np.full(len(latitudes), -1, dtype=np.int32)
+
+        for start in range(0, len(latitudes), self.chunk_size):
+            stop = start + self.chunk_size
+            codes[start:stop] = self._classify_chunk(latitudes[start:stop], longitudes[start:stop], allowed)
+
+        return codes
+
+    def _classify_chunk(self, latitudes: np.ndarray, longitudes: np.ndarray, allowed: np.ndarray = None) -> np.ndarray:
+        codes = np.full(len(latitudes), -1, dtype=np.int32)
+        unassigned = np.ones(len(latitudes), dtype=bool)
+
+        candidates = self.candidates(latitudes, longitudes)
+        if allowed is not None:
+            candidates = np.intersect1d(candidates, allowed)
+
+        # Candidates are visited in list order so the first match wins, as in ZoneAssigner.which_zone
+        for k in candidates:
+            xmin, ymin, xmax, ymax = self.bounds[k]
+
+            # Points on or outside the bounding box can never be within the polygon
+            idx = np.flatnonzero(unassigned
+                                 & (latitudes > xmin) & (latitudes < xmax)
+                                 & (longitudes > ymin) & (longitudes < ymax))
+            if len(idx) == 0:
+                continue
+
+            inside = idx[self._contains(k, latitudes[idx], longitudes[idx])]
+            codes[inside] = k
+            unassigned[inside] = False
+
+        return codes
+
+    def _contains(self, k: int, latitudes: np.ndarray, longitudes: np.ndarray) -> np.ndarray:
+        """Return whether polygon k contains each point."""
+        return shapely.contains_xy(self.geometries[k], latitudes, longitudes)
+
+    def bitmask(self, latitudes, longitudes) -> np.ndarray:
+        """
+        Return every polygon containing each point as a bitmask, bit k being set when polygon k contains the point.
+
+        Unlike classify, overlapping polygons (e.g. the neafc_* and joined_* areas) are all reported.
+
+        :param latitudes: array-like of latitudes
+        :param longitudes: array-like of longitudes
+        :return: uint64 array of bitmasks, 0 where the point is not within any polygon
+        """
+        if len(self) > 64:
+            raise ValueError(f'A bitmask can hold at most 64 polygons, the index has {len(self)}.')
+
+        latitudes = np.asarray(latitudes, dtype=np.float64)
+        longitudes = np.asarray(longitudes, dtype=np.float64)
+        masks = np.zeros(len(latitudes), dtype=np.uint64)
+
+        for start in range(0, len(latitudes), self.chunk_size):
+            lat, lon = latitudes[start:start + self.chunk_size], longitudes[start:start + self.chunk_size]
+            chunk_masks = masks[start:start + self.chunk_size]
+
+            for k in self.candidates(lat, lon):
+                xmin, ymin, xmax, ymax = self.bounds[k]
+                idx = np.flatnonzero((lat > xmin) & (lat < xmax) & (lon > ymin) & (lon < ymax))
+                inside = idx[self._contains(k, lat[idx], lon[idx])]
+                chunk_masks[inside] |= np.uint64(1 << k)
+
+        return masks
+
+    def boundary_distance(self, latitudes, longitudes) -> np.ndarray:
+        """
+        Return the distance in degrees from each point to the nearest polygon boundary of the index.
+
+        The zone of a point cannot differ from the zone of any other point closer to it than this distance, which
+        is what lets track assignment skip exact tests.
+
+        :param latitudes: array-like of latitudes
+        :param longitudes: array-like of longitudes
+        :return: float64 array of distances, NaN for points with missing coordinates and inf for an empty index
+        """
+        latitudes = np.asarray(latitudes, dtype=np.float64)
+        longitudes = np.asarray(longitudes, dtype=np.float64)
+        distances = np.full(len(latitudes), np.nan)
+
+        finite = np.flatnonzero(np.isfinite(latitudes) & np.isfinite(longitudes))
+        if len(self) == 0:
+            distances[finite] = np.inf
+            return distances
+
+        self._build_segment_tree()
+        points = shapely.points(latitudes[finite], longitudes[finite])
+        _, nearest_distances = self._segment_tree.query_nearest(points, return_distance=True, all_matches=False)
+        distances[finite] = nearest_distances
+
+        return distances
+
+    def boundary_crossings(self, start_latitudes, start_longitudes, end_latitudes, end_longitudes) -> tuple:
+        """
+        Find every point where the straight segments between start and end positions cross a polygon boundary.
+
+        :param start_latitudes: array-like of segment start latitudes
+        :param start_longitudes: array-like of segment start longitudes
+        :param end_latitudes: array-like of segment end latitudes
+        :param end_longitudes: array-like of segment end longitudes
+        :return: tuple of arrays (segment, polygon, fraction), one entry per crossing: the index of the segment, the
+                 polygon whose boundary it crosses and the position of the crossing along the segment, from 0 at the
+                 start to 1 at the end. Segments with missing coordinates never cross.
+        """
+        starts = np.column_stack([start_latitudes, start_longitudes]).astype(np.float64)
+        ends = np.column_stack([end_latitudes, end_longitudes]).astype(np.float64)
+        finite = np.flatnonzero(np.isfinite(starts).all(axis=1) & np.isfinite(ends).all(axis=1))
+        if len(self) == 0 or len(finite) == 0:
+            return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp), np.empty(0)
+
+        self._build_segment_tree()
+        lines = shapely.linestrings(np.stack([starts[finite], ends[finite]], axis=1))
+        segment, edge = self._segment_tree.query(lines, predicate='intersects')
+        segment = finite[segment]
+
+        # Solve start + t * direction = edge start + u * edge direction for t
+        direction = ends[segment] - starts[segment]
+        edge_start = self._segment_coordinates[edge, 0]
+        edge_direction = self._segment_coordinates[edge, 1] - edge_start
+        offset = edge_start - starts[segment]
+        denominator = direction[:, 0] * edge_direction[:, 1] - direction[:, 1] * edge_direction[:, 0]
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            fraction = (offset[:, 0] * edge_direction[:, 1] - offset[:, 1] * edge_direction[:, 0]) / denominator
+
+            # Segments running along an edge touch it from its nearest point on
+            along = denominator == 0
+            length = np.einsum('ij,ij->i', direction[along], direction[along])
+            fraction[along] = np.einsum('ij,ij->i', offset[along], direction[along]) / length
+
+        fraction = np.clip(np.nan_to_num(fraction), 0, 1)
+
+        return segment, self._segment_polygons[edge], fraction
+
+    def _build_segment_tree(self):
+        if self._segment_tree is None:
+            self._segment_coordinates, self._segment_polygons = _boundary_segments(self.geometries)
+            self._segment_tree = STRtree(shapely.linestrings(self._segment_coordinates))
+
+    def labels(self, codes: np.ndarray) -> np.ndarray:
+        """Translate zone codes into an object array of polygon names (None for no zone)."""
+        return self._labels[np.asarray(codes)]
+
+
+def _boundary_segments(geometries: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Split the rings of all polygons into segments, returning their (n, 2, 2) coordinates and polygon indices."""
+    rings, polygon_index = shapely.get_rings(geometries, return_index=True)
+    coordinates, ring_index = shapely.get_coordinates(rings, return_index=True)
+
+    # Consecutive coordinates of the same ring form a segment
+    same_ring = ring_index[1:] == ring_index[:-1]
+    starts, ends = coordinates[:-1][same_ring], coordinates[1:][same_ring]
+
+    return np.stack([starts, ends], axis=1), polygon_index[ring_index[:-1][same_ring]]
@@ -0,0 +1,140 @@
+import numpy as np
+
+from utils.kernels import kernel
+from zoning.adjacency import ZoneAdjacency
+from zoning.grid import ZoneGrid
+from zoning.spatial_index import ZoneIndex
+
+
+def classify_track(latitudes, longitudes, index: ZoneIndex, grid: ZoneGrid, anchor_step: int = 32,
+                   adjacency: ZoneAdjacency = None) -> np.ndarray:
+    """
+    Classify consecutive positions of a track, running exact polygon tests only where the zone may have changed.
+
+    Every anchor_step-th position is an anchor. Its zone is looked up exactly and its distance D to the nearest zone
+    boundary is bounded from below, using the grid's clearance away from boundary cells and the exact distance to
+    the nearest boundary segment inside them. No boundary lies within D of the anchor, so every position closer than
+    D to it has the anchor's zone. The other positions are checked against the anchors before and after them and only
+    those outside both discs get an exact test. The bound uses the actual displacement from the anchor rather than
+    maximum speed times elapsed time, so it is tighter and stays exact across speed spikes and position jumps.
+
+    With an adjacency graph, a position that did leave its anchor's zone is only tested against that zone and its
+    neighbours, as long as it is closer to the anchor than any other polygon is to the zone.
+
+    The result is identical to ZoneIndex.classify on the same coordinates.
+
+    :param latitudes: array-like of latitudes in track order
+    :param longitudes: array-like of longitudes in track order
+    :param index: ZoneIndex of the zone layer
+    :param grid: ZoneGrid of the same layer
+    :param anchor_step: number of positions between anchors
+    :param adjacency: ZoneAdjacency of the same layer, restricting the exact tests to neighbouring zones
+    :return: int32 array of zone codes, -1 where no polygon contains the position
+    """
+    latitudes = np.asarray(latitudes, dtype=np.float64)
+    longitudes = np.asarray(longitudes, dtype=np.float64)
+    n = len(latitudes)
+    if n == 0:
+        return np.empty(0, dtype=np.int32)
+
+    # Anchors at every anchor_step-th position plus the last one
+    anchors = np.append(np.arange(0, n, anchor_step), n - 1)
+    anchor_lat, anchor_lon = latitudes[anchors], longitudes[anchors]
+    anchor_codes = grid.classify(anchor_lat, anchor_lon, index)
+
+    # Radius of the boundary-free disc around each anchor, exact where the grid gives no clearance
+    anchor_radius = grid.clearance(anchor_lat, anchor_lon)
+    near_boundary = np.flatnonzero(anchor_radius == 0)
+    anchor_radius[near_boundary] = index.boundary_distance(anchor_lat[near_boundary], anchor_lon[near_boundary])
+
+    # Positions within the boundary-free disc of the anchor before or after them take its zone
+    squared_radius = np.where(anchor_radius > 0, anchor_radius, 0) ** 2
+    codes, decided = anchor_discs(latitudes, longitudes, anchor_lat, anchor_lon, squared_radius, anchor_codes,
+                                  anchor_step)
+
+    # Anchor before every position, for the adjacency bound
+    row_anchor = np.arange(n) // anchor_step
+
+    # Exact test for positions that may have crossed a boundary
+    undecided = np.flatnonzero(~decided)
+    if adjacency is None or len(adjacency) == 0:
+        codes[undecided] = index.classify(latitudes[undecided], longitudes[undecided])
+        return codes
+
+    previous = row_anchor[undecided]
+    zone = anchor_codes[previous]
+    with np.errstate(invalid='ignore'):
+        displacement = np.hypot(latitudes[undecided] - anchor_lat[previous],
+                                longitudes[undecided] - anchor_lon[previous])
+        near_zone = (zone >= 0) & (displacement < adjacency.gaps[np.maximum(zone, 0)])
+
+    # Positions that left a zone by less than its gap are tested against the zone and its neighbours only
+    for k in np.unique(zone[near_zone]):
+        idx = undecided[near_zone & (zone == k)]
+        codes[idx] = index.classify(latitudes[idx], longitudes[idx], adjacency.neighbours(k))
+
+    # Positions coming from open sea, or that moved farther, may be in any zone
+    idx = undecided[~near_zone]
+    codes[idx] = index.classify(latitudes[idx], longitudes[idx])
+
+    return codes
+
+
+def _anchor_discs_loop(latitudes, longitudes, anchor_lat, anchor_lon, squared_radius, anchor_codes, anchor_step):
+    n = len(latitudes)
+    codes = np.full(n, -1, dtype=np.int32)
+    decided = np.zeros(n, dtype=np.bool_)
+
+    for i in range(n):
+        # The anchor before the position, then the one after it
+        for a in (i // anchor_step, i // anchor_step + 1):
+            d_lat, d_lon = latitudes[i] - anchor_lat[a], longitudes[i] - anchor_lon[a]
+            if d_lat * d_lat + d_lon * d_lon < squared_radius[a]:
+                codes[i], decided[i] = anchor_codes[a], True
+                break
+
+    return codes, decided
+
+
+@kernel(_anchor_discs_loop)
+def anchor_discs(latitudes: np.ndarray, longitudes: np.ndarray, anchor_lat: np.ndarray, anchor_lon: np.ndarray,
+                 squared_radius: np.ndarray, anchor_codes: np.ndarray, anchor_step: int) -> tuple:
+    """
+    Give every position the zone of the anchor before or after it when it lies within that anchor's boundary-free
+    disc.
+
+    :param latitudes: float64 array of latitudes in track order
+    :param longitudes: float64 array of longitudes
+    :param anchor_lat: float64 array of anchor latitudes, anchor k being position k * anchor_step plus the last one
+    :param anchor_lon: float64 array of anchor longitudes
+    :param squared_radius: float64 array of squared disc radii, 0 for no disc
+    :param anchor_codes: int32 array of anchor zone codes
+    :param anchor_step: number of positions between anchors
+    :return: tuple of an int32 array of zone codes (-1 where undecided) and a bool array of the decided positions
+    """
+    n = len(latitudes)
+    rows = len(anchor_lat) - 1
+
+    # Lay the track out as one row per anchor interval, padded with NaN (never inside a disc) to whole rows
+    padded_lat = np.full(rows * anchor_step, np.nan)
+    padded_lon = np.full(rows * anchor_step, np.nan)
+    padded_lat[:n], padded_lon[:n] = latitudes, longitudes
+    padded_lat, padded_lon = padded_lat.reshape(rows, anchor_step), padded_lon.reshape(rows, anchor_step)
+
+    # Check every position against the anchor before it
+    with np.errstate(invalid='ignore'):
+        inside_disc = ((padded_lat - anchor_lat[:-1, None]) ** 2 + (padded_lon - anchor_lon[:-1, None]) ** 2
+                       < squared_radius[:-1, None])
+    codes = np.where(inside_disc, anchor_codes[:-1, None], -1).astype(np.int32)
+
+    # Then the undecided positions of the remaining rows against the anchor after them
+    open_rows = np.flatnonzero(~inside_disc.all(axis=1))
+    with np.errstate(invalid='ignore'):
+        inside_next = (~inside_disc[open_rows]
+                       & ((padded_lat[open_rows] - anchor_lat[open_rows + 1, None]) ** 2
+                          + (padded_lon[open_rows] - anchor_lon[open_rows + 1, None]) ** 2
+                          < squared_radius[open_rows + 1, None]))
+    codes[open_rows] = np.where(inside_next, anchor_codes[open_rows + 1, None], codes[open_rows])
+    inside_disc[open_rows] |= inside_next
+
+    return codes.ravel()[:n], inside_disc.ravel()[:n]
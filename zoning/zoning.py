@@ -1,7 +1,11 @@
+import numpy as np
 import pandas as pd
 from shapely.geometry import Point, Polygon
 import os
 from time import time
+from zoning.catalog import ZoneLayer, get_catalog
+from zoning.track import classify_track
+from utils.execution_timer import profiler
 
 
 class NamedPolygon:
@@ -10,6 +14,23 @@ class NamedPolygon:
         self.name = name
 
 
+class ZoneLayerSpec:
+    """
+    One zone column to assign with assign_zone_layers.
+
+    :param column: name of the output column
+    :param path: layer key from zoning.catalog.LAYERS, or a directory/CSV file as accepted by ZoneAssigner
+    :param group_name: column to group polygons by in one-file sources (e.g. 'factory')
+    :param multiple: report every containing polygon as a bitmask instead of the first match
+    """
+
+    def __init__(self, column: str, path: str, group_name: str = None, multiple: bool = False):
+        self.column = column
+        self.path = path
+        self.group_name = group_name
+        self.multiple = multiple
+
+
 class ZoneAssigner:
     def __init__(self, ais_df, polygon_path):
         self.ais_df = ais_df
@@ -21,27 +42,21 @@ class ZoneAssigner:
             if point.within(polygon.polygon):
                 return polygon.name
 
+    def get_layer(self, group_name: str = None) -> ZoneLayer:
+        # Directories hold one polygon per CSV file, single files are grouped by group_name
+        if os.path.isfile(self.polygon_path):
+            return get_catalog().layer(self.polygon_path, group_name)
+        return get_catalog().layer(self.polygon_path)
+
     def get_polygons_from_dir(self):
-        polygons = []
-        for file_name in os.listdir(self.polygon_path):
-            if file_name.endswith('.csv'):
-                file_path = os.path.join(self.polygon_path, file_name)
-                polygon = self.read_polygon_from_csv(file_path)
-                polygons.append(polygon)
-        return polygons
+        return self.named_polygons(get_catalog().layer(self.polygon_path))
 
     def get_polygons_from_file(self, group_name):
-        polygons = []
-        polygon_df = pd.read_csv(self.polygon_path)
+        return self.named_polygons(get_catalog().layer(self.polygon_path, group_name))
 
-        grouped = polygon_df.groupby(group_name)
-
-        for polygon_name, group in grouped:
-            coordinates = zip(group['latitude'], group['longitude'])
-            polygon = NamedPolygon(Polygon(coordinates), str(polygon_name))
-            polygons.append(polygon)
-
-        return polygons
+    @staticmethod
+    def named_polygons(layer: ZoneLayer) -> list[NamedPolygon]:
+        return [NamedPolygon(polygon, name) for polygon, name in zip(layer.geometries, layer.names)]
 
     @staticmethod
     def read_polygon_from_csv(csv_file_path):
@@ -56,26 +71,112 @@ class ZoneAssigner:
 
         return polygon
 
-    def assign_zones(self, group_name: str = None):
-        if os.path.isfile(self.polygon_path):
-            polygons = self.get_polygons_from_file(group_name)
-        elif os.path.isdir(self.polygon_path):
-            polygons = self.get_polygons_from_dir()
-
-        return self.ais_df.apply(
-            lambda row: self.which_zone(Point(row['latitude'], row['longitude']), polygons), axis=1)
+    @profiler.profile(rows=len)
+    def assign_zones(self, group_name: str = None, vectorized: bool = True, grid_resolution: float = None,
+                     track: bool = False, tolerance: float = None):
+        layer = self.get_layer(group_name)
+
+        # A simplified tier (tolerance in metres) tests most points against far fewer vertices, with the same result
+        index = layer.index if tolerance is None else layer.simplified(tolerance)
+
+        # Row-wise reference implementation
+        if not vectorized:
+            polygons = self.named_polygons(layer)
+            return self.ais_df.apply(
+                lambda row: self.which_zone(Point(row['latitude'], row['longitude']), polygons), axis=1)
+
+        latitudes = self.ais_df['latitude'].to_numpy()
+        longitudes = self.ais_df['longitude'].to_numpy()
+
+        # Classify all coordinates in bulk, optionally looking up interior points in the layer's grid first or
+        # skipping tests along the track where rows are consecutive positions of one vessel
+        with profiler.span('classify'):
+            if track:
+                codes = classify_track(latitudes, longitudes, index, layer.grid(grid_resolution or 0.1),
+                                       adjacency=layer.adjacency)
+            elif grid_resolution is None:
+                codes = index.classify(latitudes, longitudes)
+            else:
+                codes = layer.grid(grid_resolution).classify(latitudes, longitudes, index)
+
+        return pd.Series(index.labels(codes), index=self.ais_df.index, dtype=object)
+
+
+def assign_zone_layers(ais_df: pd.DataFrame, layers: list[ZoneLayerSpec], codes: bool = False,
+                       grid_resolution: float = None) -> pd.DataFrame:
+    """
+    Assign several zone layers to an AIS data frame in one pass.
+
+    Coordinates are extracted and prefiltered once: points outside the bounds of every layer, or with missing
+    coordinates, are never tested. Each layer then only sees the points inside its own bounds.
+
+    :param ais_df: DataFrame with 'latitude' and 'longitude' columns
+    :param layers: list of ZoneLayerSpec, one per output column
+    :param codes: return int16 zone codes (index into the layer's names, -1 for no zone) instead of Categoricals
+    :param grid_resolution: use each layer's lookup grid with this cell size in degrees (first-match layers only)
+    :return: DataFrame with one column per layer, aligned with ais_df's index. Layers with multiple=True are
+             uint64 bitmasks where bit k stands for the layer's k-th polygon.
+    """
+    latitudes = ais_df['latitude'].to_numpy(dtype=np.float64)
+    longitudes = ais_df['longitude'].to_numpy(dtype=np.float64)
+
+    compiled = [get_catalog().layer(spec.path, spec.group_name) for spec in layers]
+
+    # Shared prefilter: only points with coordinates inside the union of all layer bounds are candidates
+    candidates = np.flatnonzero(np.isfinite(latitudes) & np.isfinite(longitudes))
+    if compiled and candidates.size:
+        bounds = np.vstack([layer.bounds for layer in compiled])
+        lat, lon = latitudes[candidates], longitudes[candidates]
+        candidates = candidates[(lat > bounds[:, 0].min()) & (lat < bounds[:, 2].max())
+                                & (lon > bounds[:, 1].min()) & (lon < bounds[:, 3].max())]
+    lat, lon = latitudes[candidates], longitudes[candidates]
+
+    columns = {}
+    for spec, layer in zip(layers, compiled):
+        # Narrow the shared candidates down to the layer's own bounds
+        in_layer = np.zeros(len(candidates), dtype=bool)
+        if len(layer):
+            in_layer = ((lat > layer.bounds[:, 0].min()) & (lat < layer.bounds[:, 2].max())
+                        & (lon > layer.bounds[:, 1].min()) & (lon < layer.bounds[:, 3].max()))
+        idx = candidates[in_layer]
+
+        if spec.multiple:
+            values = np.zeros(len(ais_df), dtype=np.uint64)
+            values[idx] = layer.index.bitmask(lat[in_layer], lon[in_layer])
+            columns[spec.column] = values
+            continue
+
+        zone_codes = np.full(len(ais_df), -1, dtype=np.int16)
+        if grid_resolution is None:
+            zone_codes[idx] = layer.index.classify(lat[in_layer], lon[in_layer])
+        else:
+            zone_codes[idx] = layer.grid(grid_resolution).classify(lat[in_layer], lon[in_layer], layer.index)
+
+        columns[spec.column] = zone_codes if codes else _zone_categorical(zone_codes, layer.names)
+
+    return pd.DataFrame(columns, index=ais_df.index)
+
+
+def _zone_categorical(zone_codes: np.ndarray, names: list[str]) -> pd.Categorical:
+    # Polygons sharing a name share a category
+    categories = list(dict.fromkeys(names))
+    code_map = np.array([categories.index(name) for name in names] + [-1], dtype=np.int16)
+    return pd.Categorical.from_codes(code_map[zone_codes], categories=categories)
 
 
 # Example use
 r"""
 if __name__ == "__main__":
     import os
+    from utils.ingest import read_ais
     path = r"C:\Users\tokit\OneDrive\Desktop\Klaksvíkskip"
     for file in os.listdir(path):
+        if not file.endswith('.xlsx'):
+            continue
         file_path = os.path.join(path, file)
         harbors_dir = r'../zones/harbors'
         factory_path = r'../zones/factories/fo_factories.csv'
-        df = pd.read_excel(file_path)
+        df = read_ais(file_path)
 
         df['harbor'] = ZoneAssigner(df, harbors_dir).assign_zones()
         df['factory'] = ZoneAssigner(df, factory_path).assign_zones('factory')